@@ -0,0 +1,65 @@
+"""
+Encoder backend benchmark: throughput and cosine drift against the PyTorch reference.
+
+    python bench/bench_encoders.py                 # texts from the DB (library + trending)
+    python bench/bench_encoders.py --synthetic 2000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from encoders import BACKENDS, get_encoder
+from manhwa_rec import MAX_DESC_CHARS, MODEL_NAME, Recommender
+
+WORDS = ("hunter dungeon regression martial sect villainess academy tower system "
+         "murim reincarnated duke necromancer player guild gate raid sword mage").split()
+
+def synthetic_texts(n: int, seed: int = 0):
+    """Title — description — genres strings with a realistic spread of lengths."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        title = " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 6)))
+        desc = " ".join(rng.choice(WORDS) for _ in range(rng.choice([0, 20, 60, 150, 350])))
+        out.append(f"{title} — {desc[:MAX_DESC_CHARS]} — Genres: Action, Fantasy")
+    return out
+
+def db_texts():
+    rec = Recommender()
+    return rec.library["text"].tolist() + rec.trending["text"].tolist()
+
+def run(backend: str, texts, repeats: int):
+    enc = get_encoder(backend, MODEL_NAME)
+    enc.encode(texts[:8])  # warm-up (graph init, thread pools)
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        emb = enc.encode(texts)
+        best = min(best, time.perf_counter() - t0)
+    return emb, best
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--synthetic", type=int, default=0, help="use N synthetic texts instead of the DB")
+    ap.add_argument("--backends", default=",".join(BACKENDS))
+    ap.add_argument("--repeats", type=int, default=3)
+    args = ap.parse_args()
+
+    texts = synthetic_texts(args.synthetic) if args.synthetic else db_texts()
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    backends.sort(key=lambda b: b != "torch")  # torch first: it is the reference
+    print(f"{len(texts)} texts, model {MODEL_NAME}")
+
+    ref, _ = run("torch", texts, 1) if "torch" not in backends else (None, None)
+    print(f"{'backend':<10} {'texts/s':>9} {'sec':>7} {'cos mean':>9} {'cos min':>8}")
+    for b in backends:
+        emb, sec = run(b, texts, args.repeats)
+        if ref is None:
+            ref = emb
+        cos = np.sum(emb * ref, axis=1)  # both L2-normalized
+        print(f"{b:<10} {len(texts) / sec:>9.1f} {sec:>7.2f} {cos.mean():>9.5f} {cos.min():>8.5f}")
@@ -0,0 +1,127 @@
+"""
+manhwa_meta upsert timings: legacy per-row UPDATE-then-INSERT vs the set-based bulk path.
+
+Runs against a THROWAWAY schema (its manhwa_meta table is dropped and recreated):
+
+    BENCH_MYSQL_DB=manhwa_bench python bench/bench_meta_upsert.py --sizes 100,1000,10000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+if not os.getenv("BENCH_MYSQL_DB"):
+    raise SystemExit("Set BENCH_MYSQL_DB to a scratch database; its manhwa_meta table is recreated.")
+os.environ["MYSQL_DB"] = os.environ["BENCH_MYSQL_DB"]  # before db.py reads .env
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import connection
+from mirror_mysql import ensure_manhwa_meta_columns, upsert_manhwa_meta
+
+SERIES_DDL = """
+CREATE TABLE IF NOT EXISTS series (
+  id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+  title VARCHAR(255) NOT NULL,
+  canonical VARCHAR(255) NOT NULL,
+  UNIQUE KEY uq_series_canonical (canonical)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+# The table as it was before the unique key / content_hash migration
+LEGACY_DDL = """
+CREATE TABLE manhwa_meta (
+  id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+  search_title   VARCHAR(255) NULL,
+  anilist_id     INT NULL,
+  display        VARCHAR(255) NULL,
+  status         VARCHAR(64) NULL,
+  chapters_total INT NULL,
+  genres         JSON NULL,
+  description    MEDIUMTEXT NULL,
+  updated_at     TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  KEY idx_meta_anilist_id (anilist_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+def legacy_upsert(meta_rows):
+    """The per-row UPDATE-then-INSERT upsert_manhwa_meta() replaced (two round trips per new row)."""
+    with connection() as conn:
+        cur = conn.cursor()
+        legacy_rows(cur, meta_rows)
+        conn.commit()
+        cur.close()
+
+def legacy_rows(cur, meta_rows):
+    for m in meta_rows:
+        search_title = (m.get("search") or m.get("display") or "").strip()
+        if not search_title:
+            continue
+        args = ((m.get("display") or "")[:255], (m.get("status") or "")[:64], m.get("chapters"),
+                json.dumps(m.get("genres") or []), m.get("description") or "", m.get("anilist_id"))
+        cur.execute("""
+            UPDATE manhwa_meta
+               SET display = %s, status = %s, chapters_total = %s, genres = CAST(%s AS JSON),
+                   description = %s, anilist_id = COALESCE(%s, anilist_id), updated_at = CURRENT_TIMESTAMP
+             WHERE search_title = %s
+        """, args + (search_title,))
+        if cur.rowcount == 0:
+            cur.execute("""
+                INSERT INTO manhwa_meta
+                    (search_title, anilist_id, display, status, chapters_total, genres, description, updated_at)
+                VALUES (%s,%s,%s,%s,%s,CAST(%s AS JSON),%s, CURRENT_TIMESTAMP)
+            """, (search_title, args[5]) + args[:5])
+
+def reset_table(migrated: bool):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS manhwa_meta")
+        cur.execute(SERIES_DDL)  # migrated manhwa_meta links to it
+        cur.execute(LEGACY_DDL)
+        conn.commit()
+        cur.close()
+    if migrated:
+        ensure_manhwa_meta_columns()
+
+def synthetic_rows(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    genres = ["Action", "Fantasy", "Romance", "Drama", "Comedy", "Martial Arts"]
+    return [{
+        "search": f"Bench Title {i}",
+        "display": f"Bench Title {i}",
+        "anilist_id": 100000 + i,
+        "status": rng.choice(["RELEASING", "FINISHED"]),
+        "chapters": rng.choice([None, rng.randint(10, 300)]),
+        "genres": rng.sample(genres, 2),
+        "description": "lorem ipsum " * rng.randint(10, 80),
+    } for i in range(n)]
+
+def touch(rows, frac: float, seed: int = 1):
+    """Copy of rows with `frac` of them changed (as a daily refresh would)."""
+    rng = random.Random(seed)
+    out = [dict(r) for r in rows]
+    for r in rng.sample(out, int(len(out) * frac)):
+        r["chapters"] = (r["chapters"] or 0) + 1
+    return out
+
+def timed(fn, rows):
+    t0 = time.perf_counter()
+    fn(rows)
+    return time.perf_counter() - t0
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100,1000,10000")
+    args = ap.parse_args()
+
+    print(f"{'rows':>6} {'path':<7} {'insert':>8} {'same':>8} {'10% chg':>8}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        rows = synthetic_rows(n)
+        changed = touch(rows, 0.10)
+        for name, fn, migrated in (("legacy", legacy_upsert, False), ("bulk", upsert_manhwa_meta, True)):
+            reset_table(migrated)
+            cold = timed(fn, rows)
+            same = timed(fn, rows)
+            chg = timed(fn, changed)
+            print(f"{n:>6} {name:<7} {cold:>8.3f} {same:>8.3f} {chg:>8.3f}")
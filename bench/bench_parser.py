@@ -0,0 +1,175 @@
+"""
+extract_title_and_chapter regression check + benchmark.
+
+1. Checks the hand-picked golden set (parser_golden.jsonl) and the newest versioned corpus
+   (parser_corpus_v<N>.jsonl: synthetic filenames, captions and adversarial backtracking
+   inputs) for exact (title, chapter, channel) and canonicalize_title(title) values.
+2. Reports per-call latency (p50 / p99 / max, memo bypassed) and throughput per input kind;
+   fails if any call exceeds --max-ms.
+3. Compares parses/sec with the previous implementation (regexes compiled per call).
+
+Exits non-zero on any mismatch or budget violation.
+
+    python bench/bench_parser.py
+    python bench/bench_parser.py --corpus bench/parser_corpus_v1.jsonl --max-ms 5
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mirror_mysql import (
+    CHANNEL_BETWEEN_ANY, EXPL_CH, LEADING_BRACKET_NUM, MULTISPACE, TRAILING_BARE_NUM,
+    canonicalize_title, extract_title_and_chapter,
+)
+
+# As it was before the (?<!\s) guard
+LEGACY_TRAILING_TAGS = re.compile(r"\s*[\(\[]\s*(?:eng|raw|hd|scan|color|clean|repack|v\d+|part\s*\d+)\s*[\)\]]\s*$", re.I)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN = os.path.join(BENCH_DIR, "parser_golden.jsonl")
+
+def legacy_extract_title_and_chapter(stem: str, filename: Optional[str] = None):
+    """The parser before the compiled / memoized fast path, kept verbatim for comparison."""
+    s = stem.replace("_", " ").replace(".", " ").strip()
+    channel = None
+    if filename:
+        m = CHANNEL_BETWEEN_ANY.search(filename)
+        if m:
+            channel = m.group(1).strip()
+            variants = {channel, channel.replace("_", " ")}
+            for ch in variants:
+                s = re.sub(rf"\s*@{re.escape(ch)}\s*$", " ", s, flags=re.I)
+                s = re.sub(rf"\s*@{re.escape(ch)}\b",  " ", s, flags=re.I)
+
+    s = re.sub(r"\s*@[\w _-]+$", " ", s, flags=re.I)
+
+    chapter = None
+    m = LEADING_BRACKET_NUM.match(s)
+    if m:
+        try: chapter = float(m.group(1))
+        except ValueError: chapter = None
+        s = m.group(2)
+
+    if chapter is None:
+        m = EXPL_CH.search(s)
+        if m:
+            try: chapter = float(m.group(1))
+            except ValueError: chapter = None
+            s = EXPL_CH.sub("", s)
+
+    if chapter is None:
+        m = TRAILING_BARE_NUM.search(s)
+        if m:
+            try: chapter = float(m.group(1))
+            except ValueError: chapter = None
+            s = TRAILING_BARE_NUM.sub("", s)
+
+    s = LEGACY_TRAILING_TAGS.sub("", s)
+    s = MULTISPACE.sub(" ", s).strip(" -–_:")
+    return s or stem, chapter, channel
+
+def load_golden(path: str = GOLDEN):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def latest_corpus() -> str:
+    paths = glob.glob(os.path.join(BENCH_DIR, "parser_corpus_v*.jsonl"))
+    return max(paths, key=lambda p: int(p.rsplit("_v", 1)[1].split(".")[0]))
+
+def load_corpus(path: str):
+    """Returns: (header, rows); the first line is {"version", "seed", "count"}."""
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        rows = [json.loads(line) for line in f if line.strip()]
+    if header.get("count") != len(rows):
+        raise SystemExit(f"{path}: header says {header.get('count')} cases, file has {len(rows)}")
+    return header, rows
+
+def check(parse, rows) -> int:
+    bad = 0
+    for r in rows:
+        got = list(parse(r["stem"], r["filename"]))
+        if got != r["expected"]:
+            bad += 1
+            print(f"  ✗ {r['stem'][:80]!r}: expected {r['expected']}, got {got}")
+        elif "canonical" in r and canonicalize_title(got[0]) != r["canonical"]:
+            bad += 1
+            print(f"  ✗ {r['stem'][:80]!r}: canonical {canonicalize_title(got[0])!r} != {r['canonical']!r}")
+    return bad
+
+def latencies_us(parse, inputs, rounds: int = 5):
+    """Best-of-`rounds` wall time per call, in microseconds (min filters scheduler noise)."""
+    best = [float("inf")] * len(inputs)
+    clock = time.perf_counter_ns
+    for _ in range(rounds):
+        for i, (stem, filename) in enumerate(inputs):
+            t0 = clock()
+            parse(stem, filename)
+            dt = clock() - t0
+            if dt < best[i]:
+                best[i] = dt
+    return [ns / 1000.0 for ns in best]
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+def rate(parse, inputs, repeat: int, before=None) -> float:
+    best = float("inf")
+    for _ in range(3):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for stem, filename in inputs:
+                parse(stem, filename)
+        best = min(best, time.perf_counter() - t0)
+    return len(inputs) * repeat / best
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", default=None, help="corpus file (default: newest parser_corpus_v*.jsonl)")
+    ap.add_argument("--max-ms", type=float, default=5.0, help="fail if any single call takes longer")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    # ----- correctness -----
+    golden = load_golden()
+    header, corpus = load_corpus(args.corpus or latest_corpus())
+    bad_golden = check(extract_title_and_chapter, golden)
+    bad_corpus = check(extract_title_and_chapter, corpus)
+    print(f"golden set: {len(golden)} inputs, {bad_golden} mismatch(es)")
+    print(f"corpus v{header['version']}: {len(corpus)} inputs, {bad_corpus} mismatch(es)")
+    if bad_golden or bad_corpus:
+        raise SystemExit(1)
+
+    # ----- latency per kind (memo bypassed) -----
+    unmemoized = extract_title_and_chapter.__wrapped__
+    kinds = {}
+    for r in corpus:
+        kinds.setdefault(r["kind"], []).append((r["stem"], r["filename"]))
+    print(f"\n{'kind':<12} {'n':>6} {'parses/s':>12} {'p50 µs':>9} {'p99 µs':>9} {'max µs':>10}")
+    worst = 0.0
+    for kind, inputs in kinds.items():
+        lat = latencies_us(unmemoized, inputs)
+        worst = max(worst, max(lat))
+        print(f"{kind:<12} {len(inputs):>6} {len(inputs) / (sum(lat) / 1e6):>12,.0f} "
+              f"{percentile(lat, 50):>9.1f} {percentile(lat, 99):>9.1f} {max(lat):>10.1f}")
+
+    # ----- before / after on realistic inputs -----
+    inputs = [(r["stem"], r["filename"]) for r in golden]
+    print(f"\n{'parser':<22} {'parses/s':>12}")
+    print(f"{'legacy':<22} {rate(legacy_extract_title_and_chapter, inputs, args.repeat):>12,.0f}")
+    print(f"{'compiled (no memo)':<22} {rate(unmemoized, inputs, args.repeat):>12,.0f}")
+    print(f"{'compiled + memo':<22} {rate(extract_title_and_chapter, inputs, args.repeat, extract_title_and_chapter.cache_clear):>12,.0f}")
+
+    if worst > args.max_ms * 1000:
+        print(f"\n✗ slowest call took {worst / 1000:.2f} ms (budget {args.max_ms} ms)")
+        raise SystemExit(1)
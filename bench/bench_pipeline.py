@@ -0,0 +1,365 @@
+"""
+Offline end-to-end benchmark of the mirror_mysql pipeline: scan -> upsert -> recommend.
+
+Everything external is replaced by a local stand-in:
+  - Telegram : FakeTelegramClient serving synthetic dialogs/messages (patched over TelegramClient)
+  - AniList  : a local GraphQL stand-in (http.server) with configurable latency and rate limit
+  - MySQL    : a THROWAWAY schema named by BENCH_MYSQL_DB (all pipeline tables are dropped and
+               recreated from code.sql). Without it the DB stages are skipped.
+  - Files    : a synthetic download folder in a temp dir
+  - Encoder  : a hashing bag-of-words encoder (--real-encoder uses the configured backend)
+
+    BENCH_MYSQL_DB=manhwa_bench python bench/bench_pipeline.py --scales 1000:10,10000:100,100000:1000
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from contextlib import nullcontext
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Caches and indexes go to a temp dir, never the real ones (set before the modules read them)
+WORK_DIR = tempfile.mkdtemp(prefix="manhwa_bench_")
+os.environ["HTTP_CACHE_PATH"] = os.path.join(WORK_DIR, "http_cache.sqlite")
+os.environ["EMBED_CACHE_DIR"] = os.path.join(WORK_DIR, "embed_cache")
+os.environ["VECTOR_INDEX_DIR"] = os.path.join(WORK_DIR, "vector_index")
+HAVE_DB = bool(os.getenv("BENCH_MYSQL_DB"))
+if HAVE_DB:
+    os.environ["MYSQL_DB"] = os.environ["BENCH_MYSQL_DB"]  # before db.py reads .env
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from telethon.tl.types import Channel
+
+import mirror_mysql as mm
+
+WORDS = ("hunter dungeon regression martial sect villainess academy tower system murim "
+         "reincarnated duke necromancer player guild gate raid sword mage knight").split()
+CHANNELS = ["Manhwa_Hub", "KR Scans", "ManhwaDex", "Asura_Scans"]
+
+# ============== Synthetic data ==============
+def synthetic_titles(n: int):
+    rng = random.Random(20)
+    return [f"{' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 4)))} {i}" for i in range(n)]
+
+def make_download_folder(root: str, titles, files: int, seed: int = 0) -> None:
+    """`files` empty chapter files spread over titles, one sub-folder per 50 titles."""
+    rng = random.Random(seed)
+    per_title = max(1, files // len(titles))
+    made = 0
+    for i, title in enumerate(titles):
+        folder = os.path.join(root, f"batch_{i // 50:04d}")
+        os.makedirs(folder, exist_ok=True)
+        for ch in range(1, per_title + 1):
+            if made >= files:
+                return
+            tag = f" @{rng.choice(CHANNELS)}" if rng.random() < 0.5 else ""
+            name = rng.choice(["{t} Ch {c}", "[{c}] {t}", "{t} - {c}", "{t} Chapter {c} (Eng)"]).format(t=title, c=ch)
+            open(os.path.join(folder, f"{name}{tag}.pdf"), "wb").close()
+            made += 1
+
+# ============== Fake Telegram ===============
+class _Entity(Channel):
+    def __init__(self, dialog_id: int):
+        self.id = dialog_id
+        self.username = f"bench_{dialog_id}"
+
+class FakeTelegramClient:
+    """
+    Serves `dialogs` channels of `messages` synthetic posts each (newest first).
+    Every 100 messages (one Telethon page) costs `latency` seconds. `grow(n)` publishes
+    n more posts per dialog, for incremental runs.
+    """
+    titles = []
+    dialogs = 10
+    messages = 200
+    latency = 0.0
+    extra = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @classmethod
+    def grow(cls, n: int) -> None:
+        cls.extra += n
+
+    async def iter_dialogs(self):
+        top = self.messages + self.extra
+        for i in range(1, self.dialogs + 1):
+            yield SimpleNamespace(id=i, entity=_Entity(i), name=f"Bench Channel {i}", message=SimpleNamespace(id=top))
+
+    def _message(self, dialog_id: int, msg_id: int):
+        rng = random.Random(dialog_id * 1_000_003 + msg_id)
+        title = rng.choice(self.titles)
+        date = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=msg_id)
+        if rng.random() < 0.5:
+            return SimpleNamespace(id=msg_id, date=date, message=f"{title} Chapter {msg_id // 10 + 1} is out!", file=None)
+        name = f"{title} Ch {msg_id // 10 + 1} @{rng.choice(CHANNELS)}.pdf"
+        return SimpleNamespace(id=msg_id, date=date, message="", file=SimpleNamespace(name=name))
+
+    async def iter_messages(self, dialog_id, limit=None, min_id=0):
+        top = self.messages + self.extra
+        for n, msg_id in enumerate(range(top, max(min_id, top - (limit or top)), -1)):
+            if n % 100 == 0 and self.latency:
+                await asyncio.sleep(self.latency)
+            yield self._message(dialog_id, msg_id)
+
+# ============== AniList stand-in ============
+class AniListStandIn:
+    """
+    Local GraphQL endpoint answering the three query shapes mirror_mysql sends
+    (Page(id_in), aliased Media(search:), TrendingManhwa pages) from a synthetic catalog.
+    """
+
+    def __init__(self, library_titles, catalog: int, latency: float = 0.0, per_minute: int = 0):
+        self.by_title = {t.casefold(): 100000 + i for i, t in enumerate(library_titles)}
+        self.titles = {v: k for k, v in self.by_title.items()}
+        self.catalog = catalog
+        self.latency = latency
+        self.per_minute = per_minute
+        self.window = []
+        self.lock = threading.Lock()
+        self.requests = self.throttled = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+                status, payload, headers = stand_in.answer(body)
+                raw = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+    def _media(self, media_id: int, title: str):
+        rng = random.Random(media_id)
+        return {
+            "id": media_id,
+            "siteUrl": f"https://anilist.co/manga/{media_id}",
+            "title": {"romaji": title, "english": title.title(), "native": None},
+            "status": "RELEASING",
+            "chapters": None,
+            "genres": rng.sample(["Action", "Fantasy", "Romance", "Drama", "Comedy", "Martial Arts"], 2),
+            "averageScore": rng.randint(50, 95),
+            "popularity": rng.randint(100, 200000),
+            "favourites": rng.randint(0, 20000),
+            "updatedAt": 1700000000,
+            "coverImage": {"large": None},
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))),
+        }
+
+    def _limit(self):
+        """Returns: (allowed, headers) for a sliding one-minute window."""
+        if not self.per_minute:
+            return True, {}
+        with self.lock:
+            now = time.time()
+            self.window = [t for t in self.window if t > now - 60]
+            reset = int((self.window[0] if self.window else now) + 60)
+            if len(self.window) >= self.per_minute:
+                self.throttled += 1
+                return False, {"X-RateLimit-Limit": str(self.per_minute), "X-RateLimit-Remaining": "0",
+                               "X-RateLimit-Reset": str(reset), "Retry-After": str(max(1, int(reset - now)))}
+            self.window.append(now)
+            return True, {"X-RateLimit-Limit": str(self.per_minute),
+                          "X-RateLimit-Remaining": str(self.per_minute - len(self.window)),
+                          "X-RateLimit-Reset": str(reset)}
+
+    def answer(self, body: dict):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        allowed, headers = self._limit()
+        if not allowed:
+            return 429, {"data": None, "errors": [{"message": "Too Many Requests.", "status": 429}]}, headers
+
+        query, variables = body.get("query") or "", body.get("variables") or {}
+        if "id_in" in query:
+            media = [self._media(i, self.titles[i]) for i in variables.get("ids") or [] if i in self.titles]
+            return 200, {"data": {"Page": {"media": media}}}, headers
+        if "TrendingManhwa" in query:
+            page, per_page = int(variables.get("page") or 1), int(variables.get("perPage") or 20)
+            ids = range((page - 1) * per_page, min(self.catalog, page * per_page))
+            media = [self._media(500000 + i, f"catalog {WORDS[i % len(WORDS)]} {i}") for i in ids]
+            page_info = {"hasNextPage": page * per_page < self.catalog}
+            return 200, {"data": {"Page": {"pageInfo": page_info, "media": media}}}, headers
+        data = {}
+        for key, title in variables.items():  # aliased search: $s0.. -> m0..
+            media_id = self.by_title.get(str(title).casefold())
+            data["m" + key[1:]] = self._media(media_id, str(title)) if media_id else None
+        return 200, {"data": data}, headers
+
+# ============== Encoder stand-in ============
+class HashingEncoder:
+    """Deterministic bag-of-words vectors (no model download), L2-normalized."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.casefold().split():
+                out[i, zlib.crc32(word.encode("utf-8")) % self.dim] += 1.0
+        return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+
+# ============== DB ==========================
+PIPELINE_TABLES = ["embeddings", "trending_manhwa", "series_alias", "manhwa_meta", "telegram_dialog_state", "series"]
+
+def reset_schema() -> None:
+    """Drops the pipeline tables in the throwaway schema and recreates them from code.sql."""
+    with open(os.path.join(ROOT, "code.sql"), "r", encoding="utf-8") as f:
+        statements = [s.strip() for s in f.read().split(";") if s.strip()]
+    with mm.connection() as conn:
+        cur = conn.cursor()
+        for table in PIPELINE_TABLES:  # children first (manhwa_meta, series_alias -> series FK)
+            cur.execute(f"DROP TABLE IF EXISTS {table}")
+        for statement in statements:
+            cur.execute(statement)
+        conn.commit()
+        cur.close()
+
+# ============== Run =========================
+class StageTimer:
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, name: str, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        self.rows.append((name, time.perf_counter() - t0))
+        return out
+
+def run_scale(files: int, dialogs: int, args) -> list:
+    titles = synthetic_titles(max(1, files // args.chapters_per_title))
+    folder = tempfile.mkdtemp(prefix="downloads_", dir=WORK_DIR)
+    make_download_folder(folder, titles, files)
+    manifest = os.path.join(folder + ".manifest.json")
+
+    FakeTelegramClient.titles = titles
+    FakeTelegramClient.dialogs = dialogs
+    FakeTelegramClient.messages = args.messages
+    FakeTelegramClient.latency = args.tg_latency_ms / 1000.0
+    FakeTelegramClient.extra = 0
+    mm.TelegramClient = FakeTelegramClient
+
+    anilist = AniListStandIn(titles, args.catalog, args.anilist_latency_ms / 1000.0, args.anilist_rpm)
+    mm.ANILIST_URL = anilist.url
+
+    timer = StageTimer()
+    try:
+        if HAVE_DB:
+            timer("reset schema", reset_schema)
+        with (mm.session() if HAVE_DB else nullcontext()):
+            local = timer("local scan (cold)", mm.list_titles_with_last_chapter, folder, manifest_path=manifest)
+            timer("local scan (warm)", mm.list_titles_with_last_chapter, folder, manifest_path=manifest)
+            titles_found = list(local)
+
+            marks, seed = {}, {}
+            if HAVE_DB:
+                mm.ensure_dialog_watermarks_table()
+                marks = mm.load_dialog_watermarks()
+                seed = timer("load seed", mm.load_telegram_latest, titles_found)
+            scan = lambda: asyncio.run(mm.telegram_latest_all_dialogs(
+                0, "", titles_found, recent_scan=args.messages, watermarks=marks, seed=seed,
+                concurrency=8, requests_per_sec=0))
+            tg = timer("telegram scan (full)", scan)
+
+            if HAVE_DB:
+                timer("upsert series", mm.upsert_series, local, tg)
+                timer("save watermarks", mm.save_dialog_watermarks, marks)
+                seed = mm.load_telegram_latest(titles_found)
+            else:
+                seed = dict(tg)  # what load_telegram_latest would return
+            FakeTelegramClient.grow(args.tg_new)
+            tg = timer("telegram scan (incremental)", scan)
+
+            known = {}
+            if HAVE_DB:
+                mm.ensure_manhwa_meta_columns()
+                known = mm.load_anilist_ids()
+            meta = timer("anilist meta", mm.anilist_data, local, known_ids=known)
+            famous = timer("anilist trending", mm.get_currently_famous_manhwas, 20)
+            if HAVE_DB:
+                timer("upsert meta", mm.upsert_manhwa_meta, meta)
+                mm.ensure_trending_table()
+                timer("store trending", mm.store_trending_famous, famous)
+                if args.catalog:
+                    timer("catalog ingest", mm.ingest_trending_catalog, ["RELEASING"])
+
+                from manhwa_rec import Recommender
+                from embed_store import ensure_embeddings_table, sync_embeddings
+                rec = Recommender(model_name="bench-hashing")
+                if not args.real_encoder:
+                    rec._encoder = HashingEncoder()
+                ensure_embeddings_table()
+                timer("load tables", lambda: (rec.library, rec.trending))
+                timer("embed (changed only)", sync_embeddings, rec.cache_name, rec.entity_texts(), rec.encode,
+                      rec.entity_types)
+                timer("recommend (pooled)", rec.pooled)
+        mm.wait_for_revalidation()
+    finally:
+        anilist.close()
+
+    print(f"\n=== {files} files / {dialogs} dialogs: {len(local)} titles, {len(meta)} meta rows, "
+          f"{anilist.requests} AniList requests ({anilist.throttled} throttled) ===")
+    return timer.rows
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scales", default="1000:10,10000:100,100000:1000", help="files:dialogs pairs")
+    ap.add_argument("--messages", type=int, default=300, help="messages per dialog")
+    ap.add_argument("--tg-new", type=int, default=20, help="new messages per dialog before the incremental scan")
+    ap.add_argument("--tg-latency-ms", type=float, default=0.0, help="per 100-message page")
+    ap.add_argument("--chapters-per-title", type=int, default=20)
+    ap.add_argument("--catalog", type=int, default=0, help="AniList catalog size to ingest (0 = skip)")
+    ap.add_argument("--anilist-latency-ms", type=float, default=0.0)
+    ap.add_argument("--anilist-rpm", type=int, default=0, help="requests/minute before 429s (0 = unlimited)")
+    ap.add_argument("--real-encoder", action="store_true")
+    ap.add_argument("--json", help="also write the timings here")
+    args = ap.parse_args()
+
+    if not HAVE_DB:
+        print("BENCH_MYSQL_DB not set: DB stages (upserts, embeddings, recommend) are skipped.")
+
+    report = {}
+    for scale in args.scales.split(","):
+        files, dialogs = (int(x) for x in scale.split(":"))
+        rows = run_scale(files, dialogs, args)
+        report[scale] = dict(rows)
+        for name, sec in rows:
+            print(f"  {name:<28} {sec:>9.3f} s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,166 @@
+"""
+Title matching as tracked titles grow.
+
+1. Checks a few hand-written captions (extra words, emoji, title order, neighbouring titles),
+   the caption fallback against sequels / side stories of tracked titles,
+   and spelling variants (typos, punctuation, word order, sequel numbers).
+2. TitleMatcher: captions/sec for 100 .. 10,000 tracked titles. It should stay flat;
+   the naive scan (one `in` test per tracked title) grows linearly.
+3. TitleResolver: µs per variant lookup against the same sizes, vs a pairwise
+   edit-distance scan over every title (sampled).
+
+    python bench/bench_title_match.py --sizes 100,1000,10000
+"""
+import os
+import sys
+import time
+import random
+import string
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from title_match import TitleMatcher, TitleResolver, bounded_edit_distance, title_key
+
+WORDS = ("hunter dungeon regression martial sect villainess academy tower system murim "
+         "reincarnated duke necromancer player guild gate raid sword mage knight").split()
+TEMPLATES = [
+    "🔥 {t} Chapter {c} is out!",
+    "NEW | {t} - ch.{c} (raw)",
+    "Chapter {c} of {t} just dropped, enjoy",
+    "[{c}] {t}",
+    "{t} {c} + bonus art",
+    "Weekly update: nothing tracked here, see pinned {c}",
+]
+
+CASES = [
+    ("🔥 NEW: Solo Leveling: Ragnarok Chapter 12 is out! Also Eleceed ch.300",
+     [("solo leveling ragnarok", 12.0), ("eleceed", 300.0)]),
+    ("[45] Solo_Leveling", [("solo leveling", 45.0)]),
+    ("Chapter 99 - The Greatest Estate Developer", [("the greatest estate developer", 99.0)]),
+    ("solo leveling season 2 ch 5", [("solo leveling", 5.0)]),
+    ("Eleceed fan art (no chapter)", []),
+    ("eleceedx 4", []),
+    # No chapter keyword and no "[N]" prefix: a bare number is a year, a season or a count
+    ("Eleceed 2024 anniversary recap", []),
+    ("Solo Leveling 2 cast revealed!", []),
+    ("Tower of God 600+ chapters!", []),
+    ("Nano Machine 2 is coming", []),
+]
+
+# (caption, title parsed by extract_title_and_chapter, expected) with only "solo leveling",
+# "player", "omniscient reader" and "eleceed" tracked: mirrors the fallback in _match_message
+FALLBACK_CASES = [
+    ("Solo Leveling: Ragnarok Chapter 312", "Solo Leveling: Ragnarok", []),
+    ("The Max Level Player Chapter 88", "The Max Level Player", []),
+    ("Omniscient Reader Side Story Chapter 5", "Omniscient Reader Side Story", []),
+    ("🔥 NEW: Solo Leveling Chapter 12 is out!", "🔥 NEW: Solo Leveling is out!", [("solo leveling", 12.0)]),
+    ("Solo Leveling ch 12, Eleceed ch 300", "Solo Leveling , Eleceed", [("solo leveling", 12.0), ("eleceed", 300.0)]),
+]
+
+VARIANTS = [
+    ("solo levelling", "solo leveling"),
+    ("solo-leveling!", "solo leveling"),
+    ("leveling solo", "solo leveling"),
+    ("tower of gods", "tower of god"),
+    ("the greatest estate develope", "the greatest estate developer"),
+    ("hunter 4", None),
+    ("hunted", None),
+    ("the boxed", None),
+    ("solo levelling knight", None),
+    ("unrelated title here", None),
+]
+
+def check() -> int:
+    titles = {t: t for t in ("solo leveling", "solo leveling ragnarok", "the greatest estate developer", "eleceed",
+                             "tower of god", "nano machine")}
+    matcher = TitleMatcher(titles)
+    bad = 0
+    for caption, want in CASES:
+        got = matcher.find(caption)
+        if got != want:
+            bad += 1
+            print(f"MISMATCH {caption!r}: got {got}, want {want}")
+    print(f"{len(CASES) - bad}/{len(CASES)} captions matched as expected")
+
+    tracked = TitleMatcher({t: t for t in ("solo leveling", "player", "omniscient reader", "eleceed")})
+    for caption, parsed, want in FALLBACK_CASES:
+        got = tracked.find(caption) if tracked.covers(parsed) else []
+        if got != want:
+            bad += 1
+            print(f"MISMATCH fallback {caption!r}: got {got}, want {want}")
+
+    resolver = TitleResolver({t: t for t in ("solo leveling", "tower of god", "hunter", "hunter 2", "hunter 3",
+                                              "the boxer", "the greatest estate developer")})
+    for variant, want in VARIANTS:
+        got = resolver.resolve(variant)
+        if got != want:
+            bad += 1
+            print(f"MISMATCH {variant!r}: resolved to {got!r}, want {want!r}")
+    return bad
+
+def synthetic(n_titles: int, n_captions: int, seed: int = 22):
+    rng = random.Random(seed)
+    titles = [f"{' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4)))} {i}" for i in range(n_titles)]
+    captions = [rng.choice(TEMPLATES).format(t=rng.choice(titles).title(), c=rng.randint(1, 400))
+                for _ in range(n_captions)]
+    return titles, captions
+
+def naive_find(titles, caption):
+    low = caption.casefold()
+    return [t for t in titles if t in low]
+
+def bench(n_titles: int, n_captions: int) -> None:
+    titles, captions = synthetic(n_titles, n_captions)
+    t0 = time.perf_counter()
+    matcher = TitleMatcher({t: t for t in titles})
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    hits = sum(len(matcher.find(c)) for c in captions)
+    fast = time.perf_counter() - t0
+
+    sample = captions[: max(1, n_captions // 10)]
+    t0 = time.perf_counter()
+    for c in sample:
+        naive_find(titles, c)
+    naive = (time.perf_counter() - t0) * len(captions) / len(sample)
+
+    print(f"{n_titles:>7} titles | build {build * 1000:8.1f} ms | matcher {n_captions / fast:>9,.0f} captions/s "
+          f"({hits} hits) | naive scan {n_captions / naive:>9,.0f} captions/s")
+
+def bench_resolver(n_titles: int, n_queries: int = 2000, seed: int = 23) -> None:
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(3000)]
+    titles = list({" ".join(rng.choice(vocab) for _ in range(rng.randint(2, 5))) for _ in range(n_titles)})
+    picked = rng.sample(titles, min(n_queries, len(titles)))
+    queries = [t[:3] + t[4:] if i % 2 else t + "s" for i, t in enumerate(picked)]  # one edit each
+
+    t0 = time.perf_counter()
+    resolver = TitleResolver({t: t for t in titles})
+    build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    hits = sum(resolver.resolve(q) is not None for q in queries)
+    fast = (time.perf_counter() - t0) / len(queries)
+
+    sample = queries[:20]
+    keys = [title_key(t) for t in titles]
+    t0 = time.perf_counter()
+    for q in sample:
+        min(bounded_edit_distance(q, k, 2) for k in keys)
+    naive = (time.perf_counter() - t0) / len(sample)
+
+    print(f"{len(titles):>7} titles | build {build * 1000:8.1f} ms | resolver {fast * 1e6:>8.0f} µs/lookup "
+          f"({hits}/{len(queries)} resolved) | pairwise {naive * 1e6:>10,.0f} µs/lookup")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100,1000,10000", help="tracked title counts")
+    ap.add_argument("--captions", type=int, default=20000)
+    args = ap.parse_args()
+
+    failures = check()
+    for size in args.sizes.split(","):
+        bench(int(size), args.captions)
+    for size in args.sizes.split(","):
+        bench_resolver(int(size))
+    sys.exit(1 if failures else 0)
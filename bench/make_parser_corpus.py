@@ -0,0 +1,132 @@
+"""
+Generates the versioned parser corpus (bench/parser_corpus_v<N>.jsonl) from a fixed seed.
+
+Expected values are whatever the parser returns NOW, so only regenerate (with a new
+--version) after an intentional behaviour change, and review the diff of the old file.
+
+    python bench/make_parser_corpus.py --version 1
+"""
+import os
+import sys
+import json
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mirror_mysql import canonicalize_title, extract_title_and_chapter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TITLES = [
+    "Solo Leveling", "Omniscient Reader's Viewpoint", "The Beginning After The End", "Tower of God",
+    "Nano Machine", "Return of the Mount Hua Sect", "Eleceed", "Lookism", "The Greatest Estate Developer",
+    "Academy's Undercover Professor", "Surviving the Game as a Barbarian", "Pick Me Up, Infinite Gacha",
+    "Regressor Instruction Manual", "Swordmaster's Youngest Son", "SSS-Class Revival Hunter", "Villain To Kill",
+    "Reaper of the Drifting Moon", "Standard of Reincarnation", "Mercenary Enrollment", "Windbreaker",
+    "The Max Level Hero Has Returned!", "Duke Pendragon", "Player Who Returned 10,000 Years Later",
+    "Legend of the Northern Blade", "I'm the Max-Level Newbie", "Magic Emperor", "Overgeared", "Killer Peter",
+    "Teenage Mercenary", "Second Life Ranker", "나 혼자만 레벨업", "全知讀者視角", "Ōkami no Kō", "Café Terrace 2",
+]
+CHANNELS = ["Manhwa_Hub", "manhwa_world", "ManhwaDex", "KR Scans", "Asura_Scans", "webtoonz", "MangaBuddy2", "x"]
+EXTS = [".pdf", ".cbz", ".zip", ".epub", ".jpg", ".PDF", ".cbr", ".rar", ".webp", ".txt", ""]
+FORMS = [
+    "{t} Ch {c}", "{t} Chapter {c}", "{t}_ch{c}", "[{c}] {t}", "{t} - {c}", "{t} {c}", "{t} Ep.{c}",
+    "{t} chap {c} (Eng)", "{t} {c} [HD]", "{t} ch.{c} (v2)", "{t} {c} (Part 2)", "{t}", "{t} S2 {c}",
+    "{t} Chapter {c} (raw)", "{t}: {c}", "{t} – {c}", "{t} ch {c}-{c2}", "{t} Vol 3 Ch {c}", "{t} #{c}",
+]
+CAPTION_FORMS = [
+    "{t} Chapter {c} is out now!", "🔥 {t} ch {c} 🔥\nJoin @{ch}", "{t} {c}", "New: {t} - {c}\n\nRead fast",
+    "{t} Ep {c} @{ch}", "{t} [HD]", "{t} chapter {c} (Eng)", "[{c}] {t}", "{t} ch. {c} and {c2}",
+    "{t} Chapter {c}\nChapter {c2} coming soon", "@{ch}", "{t} {c} (Clean)", "{t}: {c}", "chapter {c}", "",
+]
+
+def _chapter(rng):
+    n = rng.randint(0, 999)
+    return str(n) if rng.random() < 0.8 else f"{n}.{rng.randint(0, 99)}"
+
+def synthetic_files(rng, n):
+    for _ in range(n):
+        t = rng.choice(TITLES)
+        sep = rng.choice([" ", "_", ".", "-", " - "])
+        t = t.replace(" ", sep if sep in "_." else " ")
+        base = rng.choice(FORMS).format(t=t, c=_chapter(rng), c2=_chapter(rng))
+        if rng.random() < 0.55:
+            base += rng.choice([" @", "@", " - @", "_@", " @ "]) + rng.choice(CHANNELS)
+        name = base + rng.choice(EXTS)
+        yield "file", Path(name).stem, name
+
+def synthetic_captions(rng, n):
+    for _ in range(n):
+        text = rng.choice(CAPTION_FORMS).format(
+            t=rng.choice(TITLES), c=_chapter(rng), c2=_chapter(rng), ch=rng.choice(CHANNELS))
+        yield "caption", text, None
+
+def adversarial():
+    """Inputs that make backtracking regexes go quadratic (or worse); sized like Telegram's 4096-char cap."""
+    n = 4096
+    texts = [
+        "a" + " " * n + "b",
+        " " * n + "@",
+        "x" + " " * n + "(",
+        "x" + " (" * (n // 2),
+        "x" + " [" * (n // 2) + " eng",
+        "@a" * (n // 2) + "!",
+        "@" + "a b_" * (n // 4) + "!",
+        "1" * n + "x",
+        "1 " * (n // 2) + "x",
+        "1." * (n // 2) + "x",
+        "ch " * (n // 3),
+        "chapter" * (n // 7) + "1",
+        "[" + " " * n,
+        "[" + "1" * n,
+        "[1" + " " * n + "]" + "x" * 10,
+        "." * n + "x",
+        "_" * n + "1",
+        "-" * n + "1",
+        "\t \n" * (n // 3) + "Title 5",
+        "Title" + " " * n + "(eng)",
+        "Title" + " " * n + "@chan",
+        "Title " + "v2 " * (n // 3),
+        "Title (part " + " " * n + "1)",
+        "　" * n + "Title 3",  # ideographic spaces count as \s
+    ]
+    for text in texts:
+        yield "adversarial", text, None
+    # Same shapes through the filename path (channel tag patterns run too)
+    for text in texts[:8]:
+        name = text[:200] + " @KR Scans.pdf"
+        yield "adversarial", Path(name).stem, name
+
+def build(seed: int, files: int, captions: int):
+    rng = random.Random(seed)
+    seen = set()
+    for kind, stem, filename in [*synthetic_files(rng, files), *synthetic_captions(rng, captions), *adversarial()]:
+        if (stem, filename) in seen:
+            continue
+        seen.add((stem, filename))
+        title, chapter, channel = extract_title_and_chapter(stem, filename)
+        yield {
+            "kind": kind,
+            "stem": stem,
+            "filename": filename,
+            "expected": [title, chapter, channel],
+            "canonical": canonicalize_title(title),
+        }
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--version", type=int, required=True)
+    ap.add_argument("--seed", type=int, default=19)
+    ap.add_argument("--files", type=int, default=4000)
+    ap.add_argument("--captions", type=int, default=1500)
+    args = ap.parse_args()
+
+    rows = list(build(args.seed, args.files, args.captions))
+    out = os.path.join(BENCH_DIR, f"parser_corpus_v{args.version}.jsonl")
+    with open(out, "w", encoding="utf-8") as f:
+        header = {"version": args.version, "seed": args.seed, "count": len(rows)}
+        f.write(json.dumps(header) + "\n")
+        for r in rows:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    print(f"wrote {len(rows)} cases to {out}")
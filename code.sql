@@ -4,6 +4,11 @@ CREATE TABLE IF NOT EXISTS series (
   canonical VARCHAR(255) NOT NULL,
   local_latest_chapter DECIMAL(10,3) NULL,
   channel VARCHAR(255) NULL,
+  telegram_latest_chapter DECIMAL(10,3) NULL,
+  telegram_source VARCHAR(255) NULL,
+  telegram_link VARCHAR(512) NULL,
+  telegram_seen_at DATETIME NULL,
+  user_preference ENUM('liked','neutral','unliked') NULL,
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP 
              ON UPDATE CURRENT_TIMESTAMP,
@@ -16,13 +21,22 @@ CREATE TABLE IF NOT EXISTS series (
 CREATE TABLE IF NOT EXISTS manhwa_meta (
   id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
   search_title   VARCHAR(255) NULL,   
+  canonical      VARCHAR(255) NULL,
+  series_id      BIGINT UNSIGNED NULL,
+  anilist_id     INT NULL,            
   display        VARCHAR(255) NULL,   
   status         VARCHAR(64) NULL,    
   chapters_total INT NULL,            
   genres         JSON NULL,           
   description    MEDIUMTEXT NULL,     
+  content_hash   CHAR(40) NULL,
   updated_at     TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-                ON UPDATE CURRENT_TIMESTAMP
+                ON UPDATE CURRENT_TIMESTAMP,
+  UNIQUE KEY uq_meta_search_title (search_title),
+  KEY idx_meta_canonical (canonical),
+  KEY idx_meta_series_id (series_id),
+  KEY idx_meta_anilist_id (anilist_id),
+  CONSTRAINT fk_meta_series FOREIGN KEY (series_id) REFERENCES series (id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 
@@ -72,3 +86,43 @@ CREATE TEMPORARY TABLE tmp_trending_stage (
   description   MEDIUMTEXT NULL,
   last_trending_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+
+
+CREATE TABLE IF NOT EXISTS telegram_dialog_state (
+  dialog_id     BIGINT NOT NULL PRIMARY KEY,
+  last_msg_id   BIGINT NOT NULL DEFAULT 0,
+  last_msg_date DATETIME NULL,
+  -- activity profile (dialog_schedule.py)
+  msgs_per_day   DOUBLE NULL,
+  match_yield    DOUBLE NULL,
+  messages_total BIGINT NOT NULL DEFAULT 0,
+  matches_total  BIGINT NOT NULL DEFAULT 0,
+  last_match_at  DATETIME NULL,
+  release_gap_h  DOUBLE NULL,
+  last_scan_at   DATETIME NULL,
+  next_scan_at   DATETIME NULL,
+  updated_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS series_alias (
+  alias      VARCHAR(255) NOT NULL PRIMARY KEY,     -- canonicalize_title() of a spelling variant
+  series_id  BIGINT UNSIGNED NOT NULL,
+  source     VARCHAR(32) NOT NULL,                  -- 'telegram' | 'trending'
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  KEY idx_alias_series (series_id),
+  CONSTRAINT fk_alias_series FOREIGN KEY (series_id) REFERENCES series (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS embeddings (
+  entity_type VARCHAR(16)  NOT NULL,          -- 'meta' | 'series' (no meta row) | 'trending'
+  entity_id   BIGINT UNSIGNED NOT NULL,
+  model_name  VARCHAR(255) NOT NULL,
+  text_hash   CHAR(40)     NOT NULL,          -- SHA-1 of the prepared text
+  dim         SMALLINT UNSIGNED NOT NULL,
+  vector      BLOB         NOT NULL,          -- float16 little-endian
+  updated_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (entity_type, entity_id, model_name),
+  KEY idx_embeddings_model_hash (model_name, text_hash)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -1,19 +1,164 @@
 import os
+import time
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
+import metrics
 
 load_dotenv()  # load credentials from .env
 
+# ================== Config ==================
+POOL_NAME = "manhwa"
+POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "5"))
+POOL_WAIT_SEC = float(os.getenv("MYSQL_POOL_WAIT_SEC", "10"))  # how long to wait for a free connection
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()  # per-thread shared session (see session())
+
+def _get_pool() -> pooling.MySQLConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = pooling.MySQLConnectionPool(
+                pool_name=POOL_NAME,
+                pool_size=POOL_SIZE,
+                pool_reset_session=True,
+                host=os.getenv("MYSQL_HOST", "localhost"),
+                user=os.getenv("MYSQL_USER"),
+                password=os.getenv("MYSQL_PASSWORD"),
+                database=os.getenv("MYSQL_DB")
+            )
+        return _pool
+
+def _healthy(conn):
+    """Pings the server, reconnecting once if the connection went stale (idle timeout, restart)."""
+    conn.ping(reconnect=True, attempts=2, delay=0.5)
+    return conn
+
+class _SessionConnection:
+    """The session's connection as handed to callers: close() is a no-op until the session ends."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class _MeteredCursor:
+    """Counts round trips and rows for the metrics report (only used while metrics are enabled)."""
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def execute(self, *args, **kwargs):
+        out = self._cur.execute(*args, **kwargs)
+        metrics.count("db.round_trips")
+        if not getattr(self._cur, "with_rows", True) and self._cur.rowcount > 0:
+            metrics.count("db.rows_written", self._cur.rowcount)
+        return out
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        seq_params = list(seq_params)
+        out = self._cur.executemany(operation, seq_params, *args, **kwargs)
+        metrics.count("db.round_trips")
+        metrics.count("db.rows_sent", len(seq_params))
+        return out
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        if row is not None:
+            metrics.count("db.rows_read")
+        return row
+
+    def fetchall(self):
+        rows = self._cur.fetchall()
+        metrics.count("db.rows_read", len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+class _MeteredConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return _MeteredCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def _metered(conn):
+    return _MeteredConnection(conn) if metrics.ENABLED else conn
+
+def _pooled_connection():
+    pool = _get_pool()
+    deadline = time.monotonic() + POOL_WAIT_SEC
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except PoolError:
+            # Pool exhausted: wait for another caller to return a connection
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+    metrics.count("db.connects")
+    try:
+        return _healthy(conn)
+    except Error:
+        conn.close()
+        raise
+
+# ============== Public API ==================
 def get_connection():
+    """
+    Returns a pooled connection (close() hands it back to the pool), or the shared
+    connection when called inside session(). Raises mysql.connector.Error on failure.
+    """
+    shared = getattr(_local, "conn", None)
+    if shared is not None:
+        return _SessionConnection(_metered(_healthy(shared)))
+    return _metered(_pooled_connection())
+
+@contextmanager
+def connection():
+    """
+    with connection() as conn: ...
+    Rolls back on error and always returns the connection to the pool.
+    """
+    conn = get_connection()
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@contextmanager
+def session():
+    """
+    Runs everything inside on ONE connection (per thread): every get_connection()/connection()
+    in the block gets it, so a pipeline run pays a single connect and auth handshake.
+    Stages still commit their own work.
+    """
+    if getattr(_local, "conn", None) is not None:  # nested: reuse the outer session
+        yield get_connection()
+        return
+    _local.conn = _pooled_connection()
     try:
-        conn = mysql.connector.connect(
-            host=os.getenv("MYSQL_HOST", "localhost"),
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            database=os.getenv("MYSQL_DB")
-        )
-        return conn
-    except Error as e:
-        print(f"❌ MySQL connection error: {e}")
-        return None
\ No newline at end of file
+        yield _SessionConnection(_metered(_local.conn))
+    finally:
+        conn, _local.conn = _local.conn, None
+        conn.close()
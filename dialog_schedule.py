@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+# ================== Config ==================
+EWMA_ALPHA = 0.3          # weight of the newest observation in the running averages
+HIGH_YIELD = 0.05         # dialogs where >= 5% of messages carry a tracked chapter are scanned every run
+MAX_DEFER_H = 12.0        # a zero-yield (but not dormant) dialog waits at most this long
+DORMANT_AFTER = 500       # messages seen without a single tracked chapter...
+DORMANT_DEFER_H = 24.0    # ...make a dialog dormant: checked once a day
+RELEASE_SLACK_H = 6.0     # start scanning this long before the next expected release
+MIN_DEFER_H = 1.0         # shorter deferrals are not worth it: scan now
+BURST_GAP_H = 1.0         # matches closer than this are one release (mirrors, re-posts)
+MIN_DEPTH = 50
+DEPTH_MARGIN = 1.5        # expected volume is padded by this factor when no watermark bounds the read
+
+# ============== Profiles ====================
+def new_profile() -> dict:
+    """
+    Activity profile of one dialog:
+      msgs_per_day / match_yield : running averages of post volume and of the share of
+                                   messages that carry a tracked chapter
+      messages / matches         : totals over every scan
+      last_match_at, release_gap_h: newest tracked chapter post and the typical gap between releases
+      last_scan_at, next_scan_at : when it was read, and when it is due again (None = every run)
+    """
+    return {
+        "msgs_per_day": None, "match_yield": None, "messages": 0, "matches": 0,
+        "last_match_at": None, "release_gap_h": None, "last_scan_at": None, "next_scan_at": None,
+    }
+
+def _ewma(prev: Optional[float], value: float) -> float:
+    return value if prev is None else (1 - EWMA_ALPHA) * prev + EWMA_ALPHA * value
+
+def _hours(delta: timedelta) -> float:
+    return delta.total_seconds() / 3600.0
+
+# ============== Scheduling ==================
+def plan_scan(profile: Optional[dict], now: datetime, new_msgs: Optional[int], recent_scan: int,
+              has_mark: bool = True) -> Optional[int]:
+    """
+    Returns how many messages to read from a dialog this run (the iter_messages limit):
+    0 skips it, None reads all the way down to its watermark.
+      - new_msgs = messages since the watermark (0 = no traffic, None = unknown)
+      - deferred dialogs (next_scan_at in the future) are skipped; their watermark stays put,
+        so the next scan still reads everything they posted in between
+      - with a watermark the read goes all the way down to it, however much was posted
+        (even when new_msgs is unknown); without one, depth is the expected volume
+        since the last scan
+    """
+    if new_msgs == 0:
+        return 0
+    profile = profile or {}
+    next_at = profile.get("next_scan_at")
+    if next_at is not None and now < next_at:
+        return 0
+    if has_mark:
+        return None
+
+    rate, last = profile.get("msgs_per_day"), profile.get("last_scan_at")
+    if rate is None or last is None:
+        return recent_scan
+    expected = rate * max(_hours(now - last), 0.0) / 24.0 * DEPTH_MARGIN
+    return int(min(recent_scan, max(MIN_DEPTH, expected)))
+
+def _next_scan_at(profile: dict, now: datetime) -> Optional[datetime]:
+    if profile["matches"] == 0:
+        return now + timedelta(hours=DORMANT_DEFER_H) if profile["messages"] >= DORMANT_AFTER else None
+
+    match_yield = profile["match_yield"] or 0.0
+    if match_yield >= HIGH_YIELD:
+        return None
+    defer_h = MAX_DEFER_H * (1.0 - match_yield / HIGH_YIELD)
+
+    # Don't sleep through the next expected release of the titles this dialog serves
+    gap, last = profile["release_gap_h"], profile["last_match_at"]
+    if gap and last is not None:
+        until_release = _hours(last + timedelta(hours=gap - RELEASE_SLACK_H) - now)
+        defer_h = min(defer_h, max(0.0, until_release))
+    return now + timedelta(hours=defer_h) if defer_h >= MIN_DEFER_H else None
+
+def update_profile(profile: dict, now: datetime, seen: int, matched: int, match_dates: List[datetime]) -> None:
+    """Folds one scan (messages read, messages with a tracked chapter, their dates) into `profile`."""
+    last_scan = profile["last_scan_at"]
+    if last_scan is not None and now > last_scan:
+        days = max(_hours(now - last_scan), 1.0) / 24.0
+        profile["msgs_per_day"] = _ewma(profile["msgs_per_day"], seen / days)
+    if seen:
+        profile["match_yield"] = _ewma(profile["match_yield"], matched / seen)
+    profile["messages"] += seen
+    profile["matches"] += matched
+
+    prev = profile["last_match_at"]
+    for dt in sorted(match_dates):
+        if prev is not None and dt > prev:
+            gap_h = _hours(dt - prev)
+            if gap_h < BURST_GAP_H:
+                continue
+            profile["release_gap_h"] = _ewma(profile["release_gap_h"], gap_h)
+        if prev is None or dt > prev:
+            prev = dt
+    profile["last_match_at"] = prev
+
+    profile["last_scan_at"] = now
+    profile["next_scan_at"] = _next_scan_at(profile, now)
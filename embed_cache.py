@@ -0,0 +1,150 @@
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+import metrics
+
+# ================== Config ==================
+CACHE_DIR = Path(os.getenv("EMBED_CACHE_DIR", ".embed_cache"))
+
+# ============== Keys ========================
+def text_hash(text: str) -> str:
+    """Stable content key for a prepared text (what prep_text returns)."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def _model_dir(model_name: str) -> Path:
+    return CACHE_DIR / re.sub(r"[^A-Za-z0-9._-]+", "__", model_name)
+
+# ============== Load / save =================
+# keys.json = {"model", "dim", "keys": [text_hash per row]}; vectors.f32 = raw little-endian
+# float32 rows in key order, so new rows are appended without rewriting the old ones.
+def load_cache(model_name: str) -> Tuple[Dict[str, int], Optional[np.ndarray]]:
+    """
+    Returns: ({text_hash: row}, vectors) for one model.
+      - vectors is a read-only memory map, so opening a large store is ~free;
+        only the rows you index are actually read from disk.
+      - Missing or inconsistent stores come back as ({}, None).
+    """
+    d = _model_dir(model_name)
+    keys_path, vec_path = d / "keys.json", d / "vectors.f32"
+    if not keys_path.exists() or not vec_path.exists():
+        return {}, None
+    try:
+        meta = json.loads(keys_path.read_text(encoding="utf-8"))
+        keys, dim = meta.get("keys") or [], int(meta.get("dim") or 0)
+        # Rows past len(keys) are left over from an interrupted append: ignored
+        if meta.get("model") != model_name or not keys or dim <= 0 \
+                or vec_path.stat().st_size < len(keys) * dim * 4:
+            return {}, None
+        vecs = np.memmap(vec_path, dtype="<f4", mode="r", shape=(len(keys), dim))
+    except (OSError, ValueError):
+        return {}, None
+    return {h: i for i, h in enumerate(keys)}, vecs
+
+def _write_keys(d: Path, model_name: str, keys: List[str], dim: int) -> None:
+    keys_tmp = d / "keys.tmp.json"
+    keys_tmp.write_text(json.dumps({"model": model_name, "dim": dim, "keys": keys}), encoding="utf-8")
+    os.replace(keys_tmp, d / "keys.json")
+
+def save_cache(model_name: str, keys: List[str], vecs: np.ndarray) -> None:
+    """Atomically replaces the store for `model_name` with exactly these rows."""
+    d = _model_dir(model_name)
+    d.mkdir(parents=True, exist_ok=True)
+    vecs = np.ascontiguousarray(vecs, dtype="<f4")
+    vec_tmp = d / "vectors.tmp.f32"
+    vec_tmp.write_bytes(vecs.tobytes())
+    os.replace(vec_tmp, d / "vectors.f32")
+    _write_keys(d, model_name, keys, vecs.shape[1])
+
+def append_cache(model_name: str, old_keys: List[str], new_keys: List[str], vecs: np.ndarray) -> None:
+    """Adds rows for `new_keys` after the `old_keys` already stored; only the new rows are written."""
+    if not old_keys:
+        save_cache(model_name, new_keys, vecs)
+        return
+    d = _model_dir(model_name)
+    vecs = np.ascontiguousarray(vecs, dtype="<f4")
+    with open(d / "vectors.f32", "r+b") as f:
+        f.truncate(len(old_keys) * vecs.shape[1] * 4)  # drop rows an interrupted append left behind
+        f.seek(0, os.SEEK_END)
+        f.write(vecs.tobytes())
+    _write_keys(d, model_name, list(old_keys) + list(new_keys), vecs.shape[1])
+
+def prune_cache(model_name: str, referenced: Set[str]) -> int:
+    """
+    Evicts every row whose text hash is not in `referenced` (all texts still in use).
+    Nothing is written when there is nothing to drop. Returns: rows evicted.
+    """
+    index, cached = load_cache(model_name)
+    kept = [h for h in index if h in referenced]
+    dropped = len(index) - len(kept)
+    if dropped:
+        vecs = np.array(cached[[index[h] for h in kept]], dtype=np.float32)
+        del cached  # drop the memory map before replacing the file (required on Windows)
+        save_cache(model_name, kept, vecs)
+    return dropped
+
+# ============== Encode ======================
+def encode_cached(
+    model_name: str,
+    texts: List[str],
+    encode: Callable[[List[str]], np.ndarray],
+    evict: bool = True,
+) -> np.ndarray:
+    """
+    Returns embeddings for `texts` (same order), calling `encode` only for
+    texts whose hash is not in the store yet.
+
+    evict=True: the store is rewritten to hold exactly the texts passed in, so pass
+    every text that is still referenced (library + trending) in ONE call; anything
+    else is evicted. evict=False: for callers that pass only part of what they use;
+    new texts are appended (only their rows are written) and nothing is dropped,
+    so the caller trims the store with prune_cache().
+    Nothing is written when no text is missing and nothing is evicted.
+    """
+    hashes = [text_hash(t) for t in texts]
+    unique = list(dict.fromkeys(hashes))
+    index, cached = load_cache(model_name)
+
+    missing: Dict[str, str] = {}
+    for h, t in zip(hashes, texts):
+        if h not in index and h not in missing:
+            missing[h] = t
+
+    fresh = None
+    if missing:
+        fresh = np.asarray(encode(list(missing.values())), dtype=np.float32)
+        if cached is not None and fresh.shape[1] != cached.shape[1]:
+            # Model output changed shape under the same name: start over.
+            index, cached = {}, None
+            missing = dict(zip(hashes, texts))
+            fresh = np.asarray(encode(list(missing.values())), dtype=np.float32)
+    metrics.count("embed.cache_hits", len(unique) - len(missing))
+
+    dim = fresh.shape[1] if fresh is not None else (cached.shape[1] if cached is not None else 0)
+    fresh_pos = {h: i for i, h in enumerate(missing)}
+
+    # One gather from the memory map + one from the freshly encoded block.
+    out = np.empty((len(hashes), dim), dtype=np.float32)
+    from_cache = [(i, index[h]) for i, h in enumerate(hashes) if h not in fresh_pos]
+    from_fresh = [(i, fresh_pos[h]) for i, h in enumerate(hashes) if h in fresh_pos]
+    if from_cache:
+        dst, src = zip(*from_cache)
+        out[list(dst)] = cached[list(src)]
+    if from_fresh:
+        dst, src = zip(*from_fresh)
+        out[list(dst)] = fresh[list(src)]
+    # Drop the memory map before the file is appended to or replaced (required on Windows).
+    del cached
+
+    if not evict:
+        if missing:
+            append_cache(model_name, list(index), list(missing), fresh)
+    elif missing or len(index) != len(unique) - len(missing):
+        row_of = {h: i for i, h in enumerate(hashes)}
+        save_cache(model_name, unique, out[[row_of[h] for h in unique]])
+    return out
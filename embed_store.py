@@ -0,0 +1,132 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from mysql.connector import ProgrammingError
+
+import metrics
+from db import connection
+from embed_cache import text_hash
+
+# ============== DB: ensure table ============
+def ensure_embeddings_table():
+    """
+    Creates 'embeddings' if missing.
+    One row per (entity_type, entity_id, model_name); `vector` is float16 little-endian,
+    `text_hash` is the SHA-1 of the prepared text it was computed from.
+    """
+    ddl = """
+    CREATE TABLE IF NOT EXISTS embeddings (
+      entity_type VARCHAR(16)  NOT NULL,
+      entity_id   BIGINT UNSIGNED NOT NULL,
+      model_name  VARCHAR(255) NOT NULL,
+      text_hash   CHAR(40)     NOT NULL,
+      dim         SMALLINT UNSIGNED NOT NULL,
+      vector      BLOB         NOT NULL,
+      updated_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+      PRIMARY KEY (entity_type, entity_id, model_name),
+      KEY idx_embeddings_model_hash (model_name, text_hash)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(ddl)
+        conn.commit()
+        cur.close()
+
+# ============== Encode / decode =============
+def to_blob(vec: np.ndarray) -> bytes:
+    return np.asarray(vec, dtype="<f2").tobytes()
+
+def from_blobs(blobs: List[bytes], dim: int) -> np.ndarray:
+    """Decodes many blobs with one frombuffer into a contiguous float32 matrix."""
+    if not blobs:
+        return np.empty((0, dim), dtype=np.float32)
+    return np.frombuffer(b"".join(blobs), dtype="<f2").reshape(len(blobs), dim).astype(np.float32)
+
+# ============== Read ========================
+def load_embeddings(model_name: str, hashes: Optional[List[str]] = None) -> Tuple[Dict[str, int], np.ndarray]:
+    """
+    Bulk-loads every stored vector for `model_name` with ONE query
+    (only the rows of `hashes`, if given: a refresh delta).
+    Returns: ({text_hash: row}, float32 matrix). Empty if the table does not exist yet.
+    """
+    if hashes is not None and not hashes:
+        return {}, np.empty((0, 0), dtype=np.float32)
+    sql, params = "SELECT text_hash, dim, vector FROM embeddings WHERE model_name = %s", [model_name]
+    if hashes is not None:
+        unique = list(dict.fromkeys(hashes))
+        sql += f" AND text_hash IN ({','.join(['%s'] * len(unique))})"
+        params += unique
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        except ProgrammingError:  # table not created yet
+            rows = []
+        finally:
+            cur.close()
+
+    dims = {int(dim) for _, dim, _ in rows}
+    if len(dims) != 1:  # nothing stored, or a model changed shape under the same name
+        return {}, np.empty((0, 0), dtype=np.float32)
+
+    index, blobs = {}, []
+    for h, _, blob in rows:
+        if h not in index:  # identical texts (same hash) share one row
+            index[h] = len(blobs)
+            blobs.append(bytes(blob))
+    return index, from_blobs(blobs, dims.pop())
+
+# ============== Write =======================
+def sync_embeddings(
+    model_name: str,
+    entities: List[Tuple[str, int, str]],
+    encode: Callable[[List[str]], np.ndarray],
+    entity_types: Optional[Iterable[str]] = None,
+) -> int:
+    """
+    entities = [(entity_type, entity_id, prepared_text), ...] for everything that should be stored.
+    Encodes only rows whose text hash differs from the stored one, upserts them, and deletes
+    stored rows of `entity_types` (default: the types listed) that are no longer listed.
+    Returns: number of texts encoded.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT entity_type, entity_id, text_hash FROM embeddings WHERE model_name = %s",
+            (model_name,),
+        )
+        stored = {(etype, int(eid)): h for etype, eid, h in cur.fetchall()}
+
+        wanted = {(etype, int(eid)): text for etype, eid, text in entities}
+        hashes = {key: text_hash(text) for key, text in wanted.items()}
+        changed = [key for key in wanted if stored.get(key) != hashes[key]]
+        metrics.count("embed.store_hits", len(wanted) - len(changed))
+
+        if changed:
+            vecs = np.asarray(encode([wanted[key] for key in changed]), dtype=np.float32)
+            rows = [
+                (etype, eid, model_name, hashes[(etype, eid)], vecs.shape[1], to_blob(vec))
+                for (etype, eid), vec in zip(changed, vecs)
+            ]
+            cur.executemany("""
+                INSERT INTO embeddings (entity_type, entity_id, model_name, text_hash, dim, vector)
+                VALUES (%s,%s,%s,%s,%s,%s)
+                ON DUPLICATE KEY UPDATE
+                    text_hash = VALUES(text_hash),
+                    dim       = VALUES(dim),
+                    vector    = VALUES(vector);
+            """, rows)
+
+        types = set(entity_types) if entity_types is not None else {etype for etype, _ in wanted}
+        gone = [(etype, eid, model_name) for (etype, eid) in stored if etype in types and (etype, eid) not in wanted]
+        if gone:
+            cur.executemany(
+                "DELETE FROM embeddings WHERE entity_type = %s AND entity_id = %s AND model_name = %s",
+                gone,
+            )
+
+        conn.commit()
+        cur.close()
+    return len(changed)
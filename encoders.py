@@ -0,0 +1,143 @@
+import os
+import re
+from pathlib import Path
+from typing import Iterator, List
+
+import numpy as np
+
+# ================== Config ==================
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_DIR = Path(os.getenv("ONNX_MODEL_DIR", ".onnx_models"))
+MAX_SEQ_LEN = 128   # SentenceTransformer's max_seq_length for the MiniLM paraphrase models
+BATCH_SIZE = 64
+
+# ============== Batching ====================
+def length_sorted_batches(lengths: List[int], batch_size: int = BATCH_SIZE) -> Iterator[np.ndarray]:
+    """
+    Yields index batches over texts ordered by token length, so each batch pads
+    to a similar length instead of to the longest text in a random mix.
+    """
+    order = np.argsort(np.asarray(lengths), kind="stable")
+    for i in range(0, len(order), batch_size):
+        yield order[i:i + batch_size]
+
+def _token_lengths(tokenizer, texts: List[str]) -> List[int]:
+    enc = tokenizer(texts, truncation=True, max_length=MAX_SEQ_LEN, padding=False)
+    return [len(ids) for ids in enc["input_ids"]]
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+# ============== Backends ====================
+class TorchEncoder:
+    """The reference backend: sentence-transformers on PyTorch."""
+
+    def __init__(self, model_name: str, batch_size: int = BATCH_SIZE):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.backend = "torch"
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        for idx in length_sorted_batches(_token_lengths(self.model.tokenizer, texts), self.batch_size):
+            out[idx] = self.model.encode(
+                [texts[i] for i in idx],
+                batch_size=len(idx),
+                show_progress_bar=False,
+                normalize_embeddings=True
+            )
+        return out
+
+class OnnxEncoder:
+    """
+    ONNX Runtime (CPU) backend with the same mean pooling + L2 normalization.
+    quantized=True uses a dynamically int8-quantized copy of the exported graph.
+    """
+
+    def __init__(self, model_name: str, quantized: bool = False, batch_size: int = BATCH_SIZE):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        self.model_name = model_name
+        self.backend = "onnx-int8" if quantized else "onnx"
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        path = quantize_onnx(model_name) if quantized else export_onnx(model_name)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(texts, truncation=True, max_length=MAX_SEQ_LEN, padding=False)
+        lengths = [len(ids) for ids in enc["input_ids"]]
+        out = None
+        for idx in length_sorted_batches(lengths, self.batch_size):
+            batch = self.tokenizer.pad(
+                {k: [enc[k][i] for i in idx] for k in enc.keys()},
+                padding=True,
+                return_tensors="np",
+            )
+            feeds = {name: batch[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]            # [B, T, D]
+            mask = batch["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if out is None:
+                out = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            out[idx] = _normalize(pooled)
+        return out if out is not None else np.empty((0, 0), dtype=np.float32)
+
+# ============== Export ======================
+def _model_dir(model_name: str) -> Path:
+    return ONNX_DIR / re.sub(r"[^A-Za-z0-9._-]+", "__", model_name)
+
+def export_onnx(model_name: str) -> Path:
+    """Exports the transformer (token embeddings only; pooling stays in numpy) once."""
+    out = _model_dir(model_name) / "model.onnx"
+    if out.exists():
+        return out
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = AutoTokenizer.from_pretrained(model_name)(["export sample"], return_tensors="pt")
+    tmp = out.with_suffix(".tmp.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            str(tmp),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "seq"},
+                "attention_mask": {0: "batch", 1: "seq"},
+                "last_hidden_state": {0: "batch", 1: "seq"},
+            },
+            opset_version=14,
+        )
+    os.replace(tmp, out)
+    return out
+
+def quantize_onnx(model_name: str) -> Path:
+    """Dynamic int8 weight quantization of the exported graph (no calibration data needed)."""
+    out = _model_dir(model_name) / "model.int8.onnx"
+    if out.exists():
+        return out
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    src = export_onnx(model_name)
+    tmp = out.with_suffix(".tmp.onnx")
+    quantize_dynamic(str(src), str(tmp), weight_type=QuantType.QInt8)
+    os.replace(tmp, out)
+    return out
+
+def get_encoder(backend: str, model_name: str, batch_size: int = BATCH_SIZE):
+    if backend == "torch":
+        return TorchEncoder(model_name, batch_size)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEncoder(model_name, quantized=(backend == "onnx-int8"), batch_size=batch_size)
+    raise ValueError(f"unknown encoder backend {backend!r} (choose from {', '.join(BACKENDS)})")
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Callable, Dict, Optional
+
+# ================== Config ==================
+CACHE_PATH = os.getenv("HTTP_CACHE_PATH", ".http_cache.sqlite")
+# Offline replay: serve whatever was recorded (any age), never touch the network.
+OFFLINE = os.getenv("HTTP_CACHE_OFFLINE", "0") == "1"
+
+_stats = {"hit": 0, "stale": 0, "miss": 0, "revalidated": 0, "error": 0}
+_stats_lock = threading.Lock()
+_revalidating: Dict[str, threading.Thread] = {}
+
+# ============== Storage =====================
+def _connect() -> sqlite3.Connection:
+    # One short-lived connection per call: safe from background revalidation threads.
+    conn = sqlite3.connect(CACHE_PATH, timeout=10)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+          key        TEXT PRIMARY KEY,
+          kind       TEXT NOT NULL,
+          url        TEXT NOT NULL,
+          request    TEXT NOT NULL,
+          body       TEXT NOT NULL,
+          fetched_at REAL NOT NULL
+        )
+    """)
+    return conn
+
+def cache_key(url: str, payload: dict) -> str:
+    """Keys on url + query (whitespace-insensitive) + variables."""
+    payload = dict(payload)
+    if isinstance(payload.get("query"), str):
+        payload["query"] = " ".join(payload["query"].split())
+    raw = json.dumps({"url": url, "payload": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _load(key: str):
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT body, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None, None
+    return json.loads(row[0]), row[1]
+
+def _store(key: str, kind: str, url: str, payload: dict, body: dict) -> None:
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, kind, url, request, body, fetched_at) VALUES (?,?,?,?,?,?)",
+            (key, kind, url, json.dumps(payload, ensure_ascii=False), json.dumps(body, ensure_ascii=False), time.time()),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+# ============== Public API ==================
+def cached_json(
+    url: str,
+    payload: dict,
+    fetch: Callable[[dict], dict],
+    ttl: float,
+    stale_ttl: float = 0,
+    kind: str = "default",
+    valid: Optional[Callable[[dict], bool]] = None,
+) -> dict:
+    """
+    Returns the JSON response for (url, payload), calling `fetch(payload)` only when needed:
+      - age < ttl                  -> cached body (hit)
+      - age < ttl + stale_ttl      -> cached body now, refreshed in the background (stale)
+      - older / not cached         -> fetched synchronously and stored (miss)
+    Bodies failing `valid` are returned but not stored. If a fetch fails and an
+    expired body exists, that body is served instead of raising.
+    """
+    key = cache_key(url, payload)
+    body, fetched_at = _load(key)
+
+    if OFFLINE:
+        if body is None:
+            _count("miss")
+            raise LookupError(f"offline HTTP cache has no response for {kind} request {key[:12]}")
+        _count("hit")
+        return body
+
+    age = time.time() - fetched_at if fetched_at is not None else None
+    if age is not None and age < ttl:
+        _count("hit")
+        return body
+    if age is not None and age < ttl + stale_ttl:
+        _count("stale")
+        _revalidate(key, kind, url, payload, fetch, valid)
+        return body
+
+    _count("miss")
+    try:
+        fresh = fetch(payload)
+    except Exception:
+        if body is not None:
+            _count("error")
+            return body
+        raise
+    if valid is None or valid(fresh):
+        _store(key, kind, url, payload, fresh)
+    return fresh
+
+def _revalidate(key, kind, url, payload, fetch, valid) -> None:
+    if key in _revalidating and _revalidating[key].is_alive():
+        return
+
+    def run():
+        try:
+            fresh = fetch(payload)
+            if valid is None or valid(fresh):
+                _store(key, kind, url, payload, fresh)
+                _count("revalidated")
+        except Exception:
+            _count("error")
+
+    t = threading.Thread(target=run, name=f"revalidate-{key[:8]}", daemon=True)
+    _revalidating[key] = t
+    t.start()
+
+def wait_for_revalidation(timeout: float = 30.0) -> None:
+    """Lets background refreshes finish before the process exits."""
+    deadline = time.time() + timeout
+    for t in list(_revalidating.values()):
+        t.join(max(0.0, deadline - time.time()))
+
+def cache_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
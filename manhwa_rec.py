@@ -1,17 +1,32 @@
+import os
+from datetime import datetime
 import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from db import get_connection
-
-conn = get_connection()
+from mysql.connector import ProgrammingError
+import metrics
+from db import connection
+from embed_cache import encode_cached, prune_cache, text_hash
+from embed_store import load_embeddings
+from title_match import TitleResolver
+from vector_index import ExactIndex, blocked_topk, index_path, open_index, recall_at_k
 
 MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 TOP_K_EACH = 5          # how many recs per library item
-MAX_DESC_CHARS = 2000 
+MAX_DESC_CHARS = 2000
+INDEX_MODE = os.getenv("REC_INDEX", "exact")        # exact | ivf | hnsw (candidate search)
+REPORT_RECALL = os.getenv("REC_REPORT_RECALL", "0") == "1"
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")   # torch | onnx | onnx-int8 (see encoders.py)
 
-library_df = pd.read_sql(
-    """
+W_GAP   = 0.30   # weight of chapter gap
+W_FRESH = 0.50   # weight of freshness
+W_PREF  = 0.20   # weight of user preference
+TAU_UPD = 30.0   # days scale for updated_at (smaller => cares more about *very* recent updates)
+TAU_NEW = 90.0   # days scale for created_at
+ALPHA   = 0.50   # how strongly the final weight boosts similarity (0=no effect, 1=strong)
+
+REC_COLUMNS = ["id", "canonical", "title", "description", "genres", "popularity", "favourites", "average_score"]
+
+LIBRARY_SQL = """
     SELECT
         s.id                    AS series_id,
         s.title                 AS series_title,
@@ -27,13 +42,10 @@ library_df = pd.read_sql(
         m.genres                AS meta_genres
     FROM series s
     LEFT JOIN manhwa_meta m
-        ON LOWER(m.display) = LOWER(s.title)
-    """,
-    conn,
-)
+        ON m.series_id = s.id
+"""
 
-trending_df = pd.read_sql(
-    """
+TRENDING_SQL = """
     SELECT
         id,
         canonical,
@@ -44,10 +56,28 @@ trending_df = pd.read_sql(
         favourites,
         average_score
     FROM trending_manhwa
-    """,
-    conn,
-)
-conn.close()
+"""
+
+# Spelling variants already resolved to a library series (see mirror_mysql.resolve_series_aliases)
+ALIASES_SQL = "SELECT alias FROM series_alias"
+
+# Change detection for refresh(): newest updated_at + row count per source table
+VERSIONS_SQL = """
+    SELECT 'series', MAX(updated_at), COUNT(*) FROM series
+    UNION ALL SELECT 'manhwa_meta', MAX(updated_at), COUNT(*) FROM manhwa_meta
+    UNION ALL SELECT 'trending_manhwa', MAX(updated_at), COUNT(*) FROM trending_manhwa
+"""
+
+# Ids only: what refresh() compares against the loaded rows to notice additions and deletions
+LIBRARY_KEYS_SQL = "SELECT s.id, m.id FROM series s LEFT JOIN manhwa_meta m ON m.series_id = s.id"
+TRENDING_IDS_SQL = "SELECT id FROM trending_manhwa"
+CHANGED_SERIES_SQL = """
+    SELECT DISTINCT s.id
+    FROM series s
+    LEFT JOIN manhwa_meta m
+        ON m.series_id = s.id
+    WHERE s.updated_at >= %s OR m.updated_at >= %s
+"""
 
 
 
@@ -66,147 +96,389 @@ def prep_text(title, desc, genres):
     return " — ".join(parts)
 
 
+def prepare_library(library_df):
+    """Adds title_for_embed / text and typed chapter + date columns; drops rows with nothing to embed."""
+    library_df = library_df.copy()
+    library_df["title_for_embed"] = library_df.apply(
+        lambda r: (r["meta_display"] or r["series_title"] or "").strip(), axis=1
+    )
+    library_df["desc_for_embed"] = library_df["meta_description"].fillna("").astype(str)
+    library_df["text"] = library_df.apply(
+        lambda r: prep_text(r["title_for_embed"], r["desc_for_embed"], r["meta_genres"]), axis=1
+    )
+    library_df = library_df[library_df['text'].str.len()>0].reset_index(drop=True)
+
+    library_df["local_latest_chapter"]    = pd.to_numeric(library_df["local_latest_chapter"], errors="coerce")
+    library_df["telegram_latest_chapter"] = pd.to_numeric(library_df["telegram_latest_chapter"], errors="coerce")
+    library_df["created_at"]              = pd.to_datetime(library_df["created_at"], errors="coerce", utc=True)
+    library_df["updated_at"]              = pd.to_datetime(library_df["updated_at"], errors="coerce", utc=True)
+    library_df["user_perf"]               = library_df["user_perf"].fillna("neutral")
+    return library_df
+
+
+def _library_keys(library_df):
+    """{(series_id, meta_id or None)} of raw LIBRARY_SQL rows."""
+    return {(int(s), None if pd.isna(m) else int(m)) for s, m in zip(library_df["series_id"], library_df["meta_id"])}
+
+def _stack(a, b):
+    if not len(a):
+        return b
+    return a if not len(b) else np.vstack([a, b])
+
+def prepare_trending(trending_df):
+    trending_df = trending_df.copy()
+    trending_df["title"] = trending_df["title"].fillna("").astype(str).str.strip()
+    trending_df["description"] = trending_df["description"].fillna("").astype(str)
+    trending_df["text"] = trending_df.apply(
+        lambda r: prep_text(r["title"], r["description"], r["genres"]), axis=1
+    )
+    return trending_df[trending_df["text"].str.len() > 0].reset_index(drop=True)
+
+
+def already_read(library_df, trending_df, aliases=()):
+    """
+    Avoiding Duplicate Recommendation: candidates whose title or canonical is in the library,
+    is a stored alias of a library series, or is a close spelling variant of a library title.
+    """
+    read_titles = set(library_df['title_for_embed'].str.lower())
+    red_canon = set(
+        [c.lower() for c in library_df['series_canonical'].dropna().astype(str)]
+    ) | {a.lower() for a in aliases}
 
-library_df["title_for_embed"] = library_df.apply(
-    lambda r: (r["meta_display"] or r["series_title"] or "").strip(), axis=1
-)
-library_df["desc_for_embed"] = library_df["meta_description"].fillna("").astype(str)
-library_df["text"] = library_df.apply(
-    lambda r: prep_text(r["title_for_embed"], r["desc_for_embed"], r["meta_genres"]), axis=1
-)
-library_df = library_df[library_df['text'].str.len()>0].reset_index(drop=True)
-
-
-
-
-trending_df["title"] = trending_df["title"].fillna("").astype(str).str.strip()
-trending_df["description"] = trending_df["description"].fillna("").astype(str)
-trending_df["text"] = trending_df.apply(
-    lambda r: prep_text(r["title"], r["description"], r["genres"]), axis=1
-)
-trending_df = trending_df[trending_df["text"].str.len() > 0].reset_index(drop=True)
-model = SentenceTransformer(MODEL_NAME)
-
-
-lib_emb = model.encode(
-    library_df['text'].tolist(),
-    batch_size=64,
-    show_progress_bar=True,
-    normalize_embeddings=True
-)
-
-cand_emb = model.encode(
-    trending_df['text'].tolist(),
-    batch_size=64,
-    show_progress_bar=True,
-    normalize_embeddings=True
-)
-#print(lib_emb)
-
-
-# Avoiding Duplicate Recommendation 
-read_titles = set(library_df['title_for_embed'].str.lower())
-red_canon = set(
-    [c.lower() for c in library_df['series_canonical'].dropna().astype(str)]
-) 
-
-cand_title_lower = trending_df["title"].str.lower()
-cand_canon_lower = trending_df["canonical"].fillna("").astype(str).str.lower()
-
-
-already_read_mask = cand_title_lower.isin(read_titles) | cand_canon_lower.isin(red_canon)
-
-
-sim_mat = lib_emb @ cand_emb.T # Dot Product 
-# @ is matrix multiplication operation and .T is transpose of cand_emb 
-# print(trending_df['description'])
-
-# Set similarity of already-read items to very negative so they never get recommended
-sim_mat[:, np.where(already_read_mask.values)[0]] = -1e9
-
-
-
-W_GAP   = 0.30   # weight of chapter gap
-W_FRESH = 0.50   # weight of freshness
-W_PREF  = 0.20   # weight of user preference
-TAU_UPD = 30.0   # days scale for updated_at (smaller => cares more about *very* recent updates)
-TAU_NEW = 90.0   # days scale for created_at
-ALPHA   = 0.50   # how strongly the final weight boosts similarity (0=no effect, 1=strong)
-
-library_df["local_latest_chapter"]    = pd.to_numeric(library_df["local_latest_chapter"], errors="coerce")
-library_df["telegram_latest_chapter"] = pd.to_numeric(library_df["telegram_latest_chapter"], errors="coerce")
-library_df["created_at"]              = pd.to_datetime(library_df["created_at"], errors="coerce", utc=True)
-library_df["updated_at"]              = pd.to_datetime(library_df["updated_at"], errors="coerce", utc=True)
-library_df["user_perf"]               = library_df["user_perf"].fillna("neutral")
-
-chapter_gap = (library_df['telegram_latest_chapter'].fillna(0) - library_df['local_latest_chapter'].fillna(0))
-chapter_gap = chapter_gap.clip(lower=0) # sets the data lower that 0 to 0 and greater than 1 to 1
-denom = library_df["telegram_latest_chapter"].fillna(1).replace(0, 1).abs()
-gap_norm = (chapter_gap / denom).clip(0, 1)  # 0=no gap, 1=large relative gap
-
-
-
-now = pd.Timestamp.utcnow()
-days_since_upd = ((now - library_df["updated_at"]).dt.total_seconds() / 86400.0).fillna(365.0)
-days_since_new = ((now - library_df["created_at"]).dt.total_seconds() / 86400.0).fillna(365.0)
-fresh_upd = np.exp(-days_since_upd / TAU_UPD)
-fresh_new = np.exp(-days_since_new / TAU_NEW)
-freshness = 0.6 * fresh_upd + 0.4 * fresh_new 
-
-
-
-
-pref_map = {"liked": 1.0, "neutral": 0.5, "unliked": 0.0}
-pref_score = library_df["user_perf"].map(pref_map).fillna(0.5)
-
-
-seed_weight = (W_GAP * gap_norm) + (W_FRESH * freshness) + (W_PREF * pref_score)
-seed_weight = seed_weight.clip(0, 1).values
-
-row_scale = (1.0 + ALPHA * seed_weight).reshape(-1, 1)
-sim_mat = row_scale * sim_mat
-
-
-
-def topk_for_row(row_idx,k=TOP_K_EACH):
-    sims = sim_mat[row_idx]
-    top_idx = np.argpartition(-sims, kth=min(k, sims.size-1))[:k]
-    top_idx = top_idx[np.argsort(-sims[top_idx])]
-    out = trending_df.loc[top_idx, ["id", "canonical", "title", "description", "genres", "popularity", "favourites", "average_score"]].copy()
-    out["similarity"] = [float(sims[i]) for i in top_idx]
-    out.insert(0, "based_on", library_df.loc[row_idx, "title_for_embed"])
-    return out.reset_index(drop=True)
-
-per_item_recs = []
-pooled = []
-
-for i in range(len(library_df)):
-    rec_i = topk_for_row(i, TOP_K_EACH)
-    per_item_recs.append(rec_i)
-    pooled.append(rec_i.assign(source_row=i))
-
-per_item_recs_df = pd.concat(per_item_recs, ignore_index=True)
+    cand_title_lower = trending_df["title"].str.lower()
+    cand_canon_lower = trending_df["canonical"].fillna("").astype(str).str.lower()
+    # Written below: a writable copy (under Copy-on-Write, .values can be a read-only view)
+    mask = (cand_title_lower.isin(read_titles) | cand_canon_lower.isin(red_canon)).to_numpy(copy=True)
 
-# Pooled unique: keep the best similarity if a candidate appears for multiple library items
-pooled_df = pd.concat(pooled, ignore_index=True)
-pooled_best = (
-    pooled_df
-    .sort_values("similarity", ascending=False)
-    .drop_duplicates(subset=["id", "canonical"], keep="first")
-    .reset_index(drop=True)
-)
+    # Fuzzy pass for the rest: n-gram blocked lookups, not a library x candidates compare
+    library = TitleResolver({t: t for t in read_titles | red_canon})
+    for i in np.flatnonzero(~mask):
+        mask[i] = library.resolve(cand_canon_lower.iat[i]) is not None or library.resolve(cand_title_lower.iat[i]) is not None
+    return mask
 
-print("\n=== Sample: Top-K per library title ===")
-print(per_item_recs_df.head(20))
-print(per_item_recs_df['title'].head(20))
 
-print("\n=== Pooled unique recommendations (best across your whole library) ===")
-print(pooled_best.head(30))
-print(pooled_best['title'].head(30))
+def seed_row_scale(library_df):
+    """Per-library-row similarity boost from chapter gap, freshness and user preference."""
+    chapter_gap = (library_df['telegram_latest_chapter'].fillna(0) - library_df['local_latest_chapter'].fillna(0))
+    chapter_gap = chapter_gap.clip(lower=0) # sets the data lower that 0 to 0 and greater than 1 to 1
+    denom = library_df["telegram_latest_chapter"].fillna(1).replace(0, 1).abs()
+    gap_norm = (chapter_gap / denom).clip(0, 1)  # 0=no gap, 1=large relative gap
 
+    now = pd.Timestamp.utcnow()
+    days_since_upd = ((now - library_df["updated_at"]).dt.total_seconds() / 86400.0).fillna(365.0)
+    days_since_new = ((now - library_df["created_at"]).dt.total_seconds() / 86400.0).fillna(365.0)
+    fresh_upd = np.exp(-days_since_upd / TAU_UPD)
+    fresh_new = np.exp(-days_since_new / TAU_NEW)
+    freshness = 0.6 * fresh_upd + 0.4 * fresh_new
 
+    pref_map = {"liked": 1.0, "neutral": 0.5, "unliked": 0.0}
+    pref_score = library_df["user_perf"].map(pref_map).fillna(0.5)
 
+    seed_weight = (W_GAP * gap_norm) + (W_FRESH * freshness) + (W_PREF * pref_score)
+    seed_weight = seed_weight.clip(0, 1).values
 
+    return (1.0 + ALPHA * seed_weight).reshape(-1, 1)
 
 
 
+class Recommender:
+    """
+    Importable recommender with lazy state:
+      - the library / candidate tables are read on first use
+      - embeddings are bulk-loaded from the `embeddings` table, then the local
+        embedding cache; the encoder (and its heavy torch / onnxruntime
+        imports) is only loaded when a text is in neither
+      - scored top-K results are kept per k, so repeated calls are cheap
+    """
+    entity_types = ("meta", "series", "trending")  # what entity_texts() stores in `embeddings`
+
+    def __init__(self, model_name=MODEL_NAME, index_mode=INDEX_MODE, top_k=TOP_K_EACH, backend=ENCODER_BACKEND):
+        self.model_name = model_name
+        self.index_mode = index_mode
+        self.top_k = top_k
+        self.backend = backend
+        self._encoder = None
+        self.reload()
+
+    def reload(self):
+        """Forgets loaded tables and results (the encoder stays loaded)."""
+        self._library = None
+        self._trending = None
+        self._versions = None
+        self._lib_keys = None
+        self._cand_ids = None
+        self._aliases = ()
+        self._lib_emb = None
+        self._cand_emb = None
+        self._results = {}
+
+    # ----- lazy state -----
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            from encoders import get_encoder
+            self._encoder = get_encoder(self.backend, self.model_name)
+        return self._encoder
+
+    @property
+    def cache_name(self):
+        # Backends embed slightly differently: each gets its own cache entries
+        return self.model_name if self.backend == "torch" else f"{self.model_name}#{self.backend}"
+
+    def encode(self, texts):
+        metrics.count("embed.texts_encoded", len(texts))
+        return self.encoder.encode(texts)
+
+    def _load_tables(self):
+        with metrics.span("rec.load_tables"), connection() as conn:
+            self._versions = self._table_versions(conn)
+            self._aliases = self._load_aliases(conn)
+            library_df = pd.read_sql(LIBRARY_SQL, conn)
+            trending_df = pd.read_sql(TRENDING_SQL, conn)
+        self._lib_keys = _library_keys(library_df)
+        self._cand_ids = set(trending_df["id"].astype(int))
+        self._library = prepare_library(library_df)
+        self._trending = prepare_trending(trending_df)
+
+    @staticmethod
+    def _load_aliases(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute(ALIASES_SQL)
+            return {alias for (alias,) in cur.fetchall()}
+        except ProgrammingError:  # table not created yet
+            return set()
+        finally:
+            cur.close()
+
+    @staticmethod
+    def _table_versions(conn):
+        cur = conn.cursor()
+        cur.execute(VERSIONS_SQL)
+        versions = {table: (max_upd, int(count)) for table, max_upd, count in cur.fetchall()}
+        cur.close()
+        return versions
+
+    def refresh(self):
+        """
+        Pulls what changed since the last load and embeds only those texts:
+          - every library row of a series whose series / meta rows changed (updated_at >= last
+            seen, so same-second writes are not missed) or were added, moved or deleted
+          - trending rows changed since the last load
+          - rows whose id is no longer in the DB are dropped (ids compared, not counts)
+        Returns True if anything changed.
+        """
+        if self._versions is None:
+            return False
+        with connection() as conn:
+            versions = self._table_versions(conn)
+            self._aliases = self._load_aliases(conn)
+            old = self._versions
+            if versions == old:
+                return False
+            since = {t: (old[t][0] or datetime(1970, 1, 1)) for t in old}
+            cur = conn.cursor()
+            cur.execute(LIBRARY_KEYS_SQL)
+            lib_keys = {(int(s), None if m is None else int(m)) for s, m in cur.fetchall()}
+            cur.execute(TRENDING_IDS_SQL)
+            cand_ids = {int(i) for (i,) in cur.fetchall()}
+            cur.execute(CHANGED_SERIES_SQL, (since["series"], since["manhwa_meta"]))
+            changed = {int(i) for (i,) in cur.fetchall()}
+            cur.close()
+
+            # A series is re-read whole, so its unchanged meta rows come back with the changed ones
+            changed |= {s for s, _ in lib_keys ^ self._lib_keys}
+            reread = sorted(changed & {s for s, _ in lib_keys})
+            lib_delta = pd.read_sql(
+                LIBRARY_SQL + f" WHERE s.id IN ({','.join(['%s'] * len(reread))})", conn, params=reread,
+            ) if reread else None
+            cand_delta = pd.read_sql(
+                TRENDING_SQL + " WHERE updated_at >= %s",
+                conn, params=(since["trending_manhwa"],),
+            )
+
+        lib_keep = ~self._library["series_id"].isin(changed).to_numpy()
+        cand_keep = (self._trending["id"].isin(cand_ids) & ~self._trending["id"].isin(cand_delta["id"])).to_numpy()
+        new_lib = prepare_library(lib_delta) if lib_delta is not None and len(lib_delta) else self._library.iloc[0:0]
+        new_cand = prepare_trending(cand_delta) if len(cand_delta) else self._trending.iloc[0:0]
+
+        if self._lib_emb is not None:
+            # Only the delta is embedded (store lookup limited to its hashes); kept rows keep their vectors
+            new_emb = self._embed(new_lib["text"].tolist() + new_cand["text"].tolist(), delta=True)
+            self._lib_emb = _stack(self._lib_emb[lib_keep], new_emb[:len(new_lib)])
+            self._cand_emb = _stack(self._cand_emb[cand_keep], new_emb[len(new_lib):])
+
+        self._library = pd.concat([self._library[lib_keep], new_lib], ignore_index=True)
+        self._trending = pd.concat([self._trending[cand_keep], new_cand], ignore_index=True)
+        self._lib_keys, self._cand_ids, self._versions = lib_keys, cand_ids, versions
+        if self._lib_emb is not None:
+            prune_cache(self.cache_name, {text_hash(t) for t in self._library["text"].tolist() + self._trending["text"].tolist()})
+        self._results = {}
+        return True
+
+    @property
+    def library(self):
+        if self._library is None:
+            self._load_tables()
+        return self._library
+
+    @property
+    def trending(self):
+        if self._trending is None:
+            self._load_tables()
+        return self._trending
+
+    def entity_texts(self):
+        """
+        [(entity_type, entity_id, text), ...] as stored in the `embeddings` table.
+        Library rows are keyed by meta row ("meta"), so a series with several meta rows
+        stores every text; series without meta fall back to ("series", series_id).
+        """
+        library = [
+            ("series", int(sid), t) if pd.isna(mid) else ("meta", int(mid), t)
+            for sid, mid, t in zip(self.library["series_id"], self.library["meta_id"], self.library["text"])
+        ]
+        return library + [("trending", int(i), t) for i, t in zip(self.trending["id"], self.trending["text"])]
+
+    def _embed(self, texts, delta=False):
+        """
+        Vectors for `texts`: the pipeline's `embeddings` table first (every row of the model
+        in one bulk query, or only these texts' hashes for a refresh delta), then the local cache.
+        """
+        hashes = [text_hash(t) for t in texts]
+        stored_row, stored = load_embeddings(self.cache_name, hashes if delta else None)
+        rows = np.array([stored_row.get(h, -1) for h in hashes], dtype=np.int64)
+        missing = np.flatnonzero(rows < 0)
+        metrics.count("embed.store_hits", len(texts) - len(missing))
+        if len(missing) == 0:
+            return stored[rows]
+        # Texts the pipeline has not embedded yet go through the local cache. Only part
+        # of the texts is passed: new ones are appended, nothing is evicted here (see prune_cache)
+        extra = encode_cached(self.cache_name, [texts[i] for i in missing], self.encode, evict=False)
+        all_emb = np.empty((len(texts), extra.shape[1]), dtype=np.float32)
+        all_emb[missing] = extra
+        if len(stored):
+            have = np.flatnonzero(rows >= 0)
+            all_emb[have] = stored[rows[have]]
+        return all_emb
+
+    def _embeddings(self):
+        if self._lib_emb is None:
+            library, trending = self.library, self.trending
+            texts = library['text'].tolist() + trending['text'].tolist()
+            all_emb = self._embed(texts)
+            # Eviction runs once per load, against every text still in use
+            prune_cache(self.cache_name, {text_hash(t) for t in texts})
+            self._lib_emb = all_emb[:len(library)]
+            self._cand_emb = all_emb[len(library):]
+        return self._lib_emb, self._cand_emb
+
+    # ----- scoring -----
+    def _read_mask(self):
+        if "read_mask" not in self._results:
+            self._results["read_mask"] = already_read(self.library, self.trending, self._aliases)
+        return self._results["read_mask"]
+
+    def _search(self, k):
+        """Returns (top_idx, top_sim): L x k candidate positions (-1 = empty) and boosted similarities."""
+        lib_emb, cand_emb = self._embeddings()
+        library, trending = self.library, self.trending
+        read_mask = self._read_mask()
+        row_scale = seed_row_scale(library)
+
+        if self.index_mode == "exact":
+            return blocked_topk(lib_emb, cand_emb, k, exclude_mask=read_mask, row_scale=row_scale)
+
+        # Approximate search over the persisted candidate index, synced to the current trending rows
+        index = open_index(self.index_mode, cand_emb.shape[1])
+        added, removed = index.sync(trending["id"].values, [text_hash(t) for t in trending["text"]], cand_emb)
+        if added or removed:
+            index.save(index_path(self.index_mode))
+        read_ids = set(trending.loc[read_mask, "id"].tolist())
+        hit_ids, hit_sim = index.search(lib_emb, k, exclude=read_ids)
+
+        if REPORT_RECALL:
+            exact = ExactIndex(cand_emb.shape[1])
+            exact.add(trending["id"].values, cand_emb)
+            exact_ids, _ = exact.search(lib_emb, k, exclude=read_ids)
+            print(f"{self.index_mode} recall@{k} vs exact: {recall_at_k(hit_ids, exact_ids):.3f}")
+
+        pos_of = pd.Series(np.arange(len(trending)), index=trending["id"].values)
+        top_idx = pos_of.reindex(hit_ids.ravel()).fillna(-1).to_numpy(np.int64).reshape(hit_ids.shape)
+        return top_idx, row_scale * hit_sim
+
+    def _scored(self, k):
+        """Per-item frame for every library row (with source_row), computed once per k."""
+        if k not in self._results:
+            with metrics.span("rec.search"):
+                top_idx, top_sim = self._search(k)
+
+            # One gather for every (library row, rank) pair; -1 marks empty slots
+            rec_rows, rec_rank = np.nonzero(top_idx >= 0)
+            recs = self.trending.iloc[top_idx[rec_rows, rec_rank]][REC_COLUMNS].reset_index(drop=True)
+            recs["similarity"] = top_sim[rec_rows, rec_rank].astype(float)
+            recs.insert(0, "based_on", self.library["title_for_embed"].values[rec_rows])
+            self._results[k] = recs.assign(source_row=rec_rows)
+        return self._results[k]
+
+    # ----- public API -----
+    def per_item(self, k=None):
+        """Top-k recommendations for every library item."""
+        return self._scored(k or self.top_k).drop(columns="source_row")
+
+    def recommend_for(self, series_id, k=None):
+        """Top-k recommendations based on one `series` row (empty frame if it has no embeddable text)."""
+        k = k or self.top_k
+        key = ("series", k, series_id)
+        if key not in self._results:
+            scored = self._scored(k)
+            rows = np.flatnonzero(self.library["series_id"].values == series_id)
+            out = scored[scored["source_row"].isin(rows)]
+            # A series joined to several meta rows: keep each candidate's best score
+            out = (
+                out
+                .sort_values("similarity", ascending=False)
+                .drop_duplicates(subset=["id", "canonical"], keep="first")
+                .head(k)
+            )
+            self._results[key] = out.drop(columns="source_row").reset_index(drop=True)
+        return self._results[key]
+
+    def pooled(self, k=None):
+        """Pooled unique: keep the best similarity if a candidate appears for multiple library items."""
+        key = ("pooled", k or self.top_k)
+        if key not in self._results:
+            self._results[key] = (
+                self._scored(k or self.top_k)
+                .sort_values("similarity", ascending=False)
+                .drop_duplicates(subset=["id", "canonical"], keep="first")
+                .reset_index(drop=True)
+            )
+        return self._results[key]
+
+    def similar_to_text(self, text, k=None):
+        """'More like this description': candidates closest to a free-text query (already-read excluded)."""
+        _, cand_emb = self._embeddings()
+        query = np.asarray(self.encode([text]), dtype=np.float32)
+        read_mask = self._read_mask()
+        top_idx, top_sim = blocked_topk(query, cand_emb, k or self.top_k, exclude_mask=read_mask)
+        keep = top_sim[0] > -1e8
+        out = self.trending.iloc[top_idx[0][keep]][REC_COLUMNS].reset_index(drop=True)
+        out["similarity"] = top_sim[0][keep].astype(float)
+        return out
+
+
+
+if __name__ == "__main__":
+    with metrics.run("recommend"):
+        rec = Recommender()
+        per_item_recs_df = rec.per_item()
+        pooled_best = rec.pooled()
+
+    print("\n=== Sample: Top-K per library title ===")
+    print(per_item_recs_df.head(20))
+    print(per_item_recs_df['title'].head(20))
+
+    print("\n=== Pooled unique recommendations (best across your whole library) ===")
+    print(pooled_best.head(30))
+    print(pooled_best['title'].head(30))
@@ -0,0 +1,169 @@
+import os
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# ================== Config ==================
+REPORT_PATH = os.getenv("METRICS_JSON")  # run report; a .jsonl path gets one line appended per run
+PROM_PATH = os.getenv("METRICS_PROM")    # Prometheus textfile (node_exporter textfile collector)
+ENABLED = bool(REPORT_PATH or PROM_PATH) or os.getenv("METRICS", "0") == "1"
+PROM_PREFIX = "manhwa"
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_spans: Dict[str, List[float]] = {}  # name -> [calls, errors, seconds]
+_collectors: List[Callable[[], Dict[str, float]]] = []
+
+# ============== Recording ===================
+class _NoSpan:
+    """What span() returns while disabled: one shared object, nothing timed."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.t0
+        with _lock:
+            row = _spans.setdefault(self.name, [0, 0, 0.0])
+            row[0] += 1
+            row[1] += exc_type is not None
+            row[2] += elapsed
+        return False
+
+def span(name: str):
+    """
+    with span("telegram_scan"): ...
+    Adds the block's wall time to stage `name` (repeated entries are summed).
+    """
+    return _Span(name) if ENABLED else _NO_SPAN
+
+def count(name: str, n: float = 1) -> None:
+    """Adds `n` to counter `name`. Call it once per batch, not per item, in hot loops."""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def collector(fn: Callable[[], Dict[str, float]]) -> None:
+    """Registers `fn() -> {counter: value}`, read when a report is built (for stats kept elsewhere)."""
+    _collectors.append(fn)
+
+def enable(on: bool = True) -> None:
+    global ENABLED
+    ENABLED = on
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _spans.clear()
+
+# ============== Reports =====================
+def snapshot(run: str = "pipeline", started_at: Optional[float] = None, status: str = "ok") -> dict:
+    """Returns: {"run", "status", "started_at", "finished_at", "stages": {...}, "counters": {...}}"""
+    extra = {}
+    for fn in _collectors:
+        try:
+            extra.update(fn())
+        except Exception:
+            pass
+    with _lock:
+        stages = {
+            name: {"calls": int(calls), "errors": int(errors), "seconds": round(seconds, 6)}
+            for name, (calls, errors, seconds) in _spans.items()
+        }
+        counters = {**_counters, **extra}
+    return {
+        "run": run,
+        "status": status,
+        "started_at": started_at,
+        "finished_at": time.time(),
+        "stages": stages,
+        "counters": dict(sorted(counters.items())),
+    }
+
+def _prom_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+def to_prometheus(report: dict) -> str:
+    """Prometheus text exposition of one report: stage gauges labelled by stage, one gauge per counter."""
+    p, run = PROM_PREFIX, report["run"]
+    lines = [
+        f"# HELP {p}_stage_seconds Wall time spent in a pipeline stage during the last run.",
+        f"# TYPE {p}_stage_seconds gauge",
+    ]
+    for stage, row in report["stages"].items():
+        lines.append(f'{p}_stage_seconds{{run="{run}",stage="{stage}"}} {row["seconds"]}')
+    lines += [f"# TYPE {p}_stage_errors gauge"]
+    for stage, row in report["stages"].items():
+        lines.append(f'{p}_stage_errors{{run="{run}",stage="{stage}"}} {row["errors"]}')
+    for name, value in report["counters"].items():
+        metric = f"{p}_{_prom_name(name)}"
+        lines += [f"# TYPE {metric} gauge", f'{metric}{{run="{run}"}} {value}']
+    lines += [
+        f"# TYPE {p}_run_success gauge",
+        f'{p}_run_success{{run="{run}"}} {int(report["status"] == "ok")}',
+        f"# TYPE {p}_run_finished_timestamp_seconds gauge",
+        f'{p}_run_finished_timestamp_seconds{{run="{run}"}} {report["finished_at"]:.3f}',
+    ]
+    return "\n".join(lines) + "\n"
+
+def _write_atomic(path: str, text: str) -> None:
+    # The textfile collector may read at any moment: never expose a half-written file
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def write_report(report: dict, json_path: Optional[str] = None, prom_path: Optional[str] = None) -> None:
+    """Writes `report` to METRICS_JSON / METRICS_PROM (or the paths given); unset paths are skipped."""
+    json_path = json_path or REPORT_PATH
+    prom_path = prom_path or PROM_PATH
+    if json_path:
+        if json_path.endswith(".jsonl"):  # history: one run per line, for graphing across runs
+            with open(json_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(report, ensure_ascii=False) + "\n")
+        else:
+            _write_atomic(json_path, json.dumps(report, indent=2, ensure_ascii=False))
+    if prom_path:
+        _write_atomic(prom_path, to_prometheus(report))
+
+@contextmanager
+def run(name: str = "pipeline"):
+    """
+    with run("mirror"): ...
+    Times the whole block and writes the report when it ends, failed runs included.
+    Does nothing while disabled.
+    """
+    if not ENABLED:
+        yield
+        return
+    reset()
+    started_at = time.time()
+    status = "ok"
+    try:
+        with span("total"):
+            yield
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        write_report(snapshot(name, started_at, status))
@@ -2,14 +2,27 @@ import os
 import re
 import html
 import json
+import hashlib
+import time
 import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta, timezone
-from db import get_connection
+from db import connection, session
+from http_cache import cached_json, cache_stats, wait_for_revalidation
+from embed_store import ensure_embeddings_table, sync_embeddings
+import metrics
+from title_match import TitleMatcher, TitleResolver
+from dialog_schedule import new_profile, plan_scan, update_profile
 import requests
 from dotenv import load_dotenv
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from telethon.tl.types import Channel, Chat, Message
 
 # ================== Config ==================
@@ -27,7 +40,9 @@ except Exception:
 LEADING_BRACKET_NUM = re.compile(r"^\s*\[\s*(\d+(?:\.\d+)?)\s*\]\s*(.*)$", re.I)
 EXPL_CH             = re.compile(r"(?:\bch(?:apter)?|\bep|\bchap)\s*(\d+(?:\.\d+)?)", re.I)
 TRAILING_BARE_NUM   = re.compile(r"(?:^|[ \-–_:._])(\d+(?:\.\d+)?)\s*$", re.I)
-TRAILING_TAGS       = re.compile(r"\s*[\(\[]\s*(?:eng|raw|hd|scan|color|clean|repack|v\d+|part\s*\d+)\s*[\)\]]\s*$", re.I)
+# (?<!\s): only try a match at the start of a whitespace run. The leftmost match is the same,
+# but a long run no longer costs one full scan of the run per space (quadratic).
+TRAILING_TAGS       = re.compile(r"(?<!\s)\s*[\(\[]\s*(?:eng|raw|hd|scan|color|clean|repack|v\d+|part\s*\d+)\s*[\)\]]\s*$", re.I)
 MULTISPACE          = re.compile(r"\s{2,}")
 
 _EXTS_RE = "(?:" + "|".join(re.escape(ext.lstrip(".")) for ext in sorted(EXTS, key=len, reverse=True)) + ")"
@@ -71,79 +86,185 @@ def snippet(txt: str, max_len: int = 280) -> str:
     return t if len(t) <= max_len else (t[:max_len - 1] + "…")
 
 # ============== Parsing =====================
+TRAILING_AT_TAG = re.compile(r"(?<!\s)\s*@[\w _-]+$", re.I)  # see TRAILING_TAGS
+
+@lru_cache(maxsize=1024)
+def _channel_patterns(channel: str) -> Tuple[re.Pattern, ...]:
+    """
+    Compiled once per channel tag: one pattern per spelling variant, folding the
+    "tag at the end" and "tag followed by a word boundary" removals into one pass.
+    """
+    variants = sorted({channel, channel.replace("_", " ")})
+    return tuple(re.compile(rf"\s*@{re.escape(ch)}(?:\s*$|\b)", re.I) for ch in variants)
+
+@lru_cache(maxsize=65536)
 def extract_title_and_chapter(stem: str, filename: Optional[str] = None):
+    """
+    Returns: (title, chapter or None, channel or None).
+    Memoized on (stem, filename): local rescans and Telegram history repeat the same names.
+    """
     s = stem.replace("_", " ").replace(".", " ").strip()
     channel = None
     if filename:
         m = CHANNEL_BETWEEN_ANY.search(filename)
         if m:
             channel = m.group(1).strip()
-            variants = {channel, channel.replace("_", " ")}
-            for ch in variants:
-                s = re.sub(rf"\s*@{re.escape(ch)}\s*$", " ", s, flags=re.I)
-                s = re.sub(rf"\s*@{re.escape(ch)}\b",  " ", s, flags=re.I)
+            for pattern in _channel_patterns(channel):
+                s = pattern.sub(" ", s)
 
-    s = re.sub(r"\s*@[\w _-]+$", " ", s, flags=re.I)
+    s = TRAILING_AT_TAG.sub(" ", s)
 
     chapter = None
     m = LEADING_BRACKET_NUM.match(s)
     if m:
-        try: chapter = float(m.group(1))
-        except ValueError: chapter = None
+        chapter = float(m.group(1))
         s = m.group(2)
 
     if chapter is None:
-        m = EXPL_CH.search(s)
-        if m:
-            try: chapter = float(m.group(1))
-            except ValueError: chapter = None
-            s = EXPL_CH.sub("", s)
+        # Single pass: the first "ch N" gives the chapter, every one is removed
+        first = []
+        def _take(m):
+            if not first:
+                first.append(m.group(1))
+            return ""
+        s = EXPL_CH.sub(_take, s)
+        if first:
+            chapter = float(first[0])
 
     if chapter is None:
         m = TRAILING_BARE_NUM.search(s)
         if m:
-            try: chapter = float(m.group(1))
-            except ValueError: chapter = None
-            s = TRAILING_BARE_NUM.sub("", s)
+            chapter = float(m.group(1))
+            s = s[:m.start()] + s[m.end():]
 
     s = TRAILING_TAGS.sub("", s)
     s = MULTISPACE.sub(" ", s).strip(" -–_:")
     return s or stem, chapter, channel
 
 # ============== Local scan ==================
-def list_titles_with_last_chapter(folder: str, debug: bool = False):
+SCAN_MANIFEST = ".scan_manifest.json"
+MANIFEST_VERSION = 1
+
+def _fold_local_file(manhwa: dict, canon_to_display: dict, title: str, ch: Optional[float],
+                     channel: Optional[str], mtime: Optional[float]) -> None:
+    """Merges one parsed file into {title: [last_local_chapter, channel, latest_file_mtime]}."""
+    canon = canonicalize_title(title)
+    display = canon_to_display.get(canon) or title
+    canon_to_display[canon] = display
+
+    prev_last, prev_channel, prev_mtime = (manhwa.get(display) or [0.0, None, None])
+
+    if ch is not None:
+        if ch > prev_last:
+            manhwa[display] = [ch, channel or prev_channel, mtime]
+        elif ch == prev_last:
+            if prev_mtime is None or mtime > prev_mtime:
+                manhwa[display] = [prev_last, channel or prev_channel, mtime]
+    else:
+        if display not in manhwa:
+            manhwa[display] = [prev_last, prev_channel, prev_mtime]
+
+def _load_manifest(path: Optional[str], root: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("root") != root:
+        return {}
+    return manifest.get("dirs") or {}
+
+def _save_manifest(path: str, root: str, dirs: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "root": root, "dirs": dirs}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _scan_dir(path: str, dir_mtime: float, prev: Optional[dict], stats: dict) -> dict:
     """
-    Returns: {title: [last_local_chapter, channel, latest_file_mtime]}
-      - latest_file_mtime is a POSIX timestamp (float) for the file that yielded the max chapter.
+    Lists one directory with os.scandir.
+    Returns: {"mtime", "subdirs": [name], "files": {name: [size, mtime, title, chapter, channel]}}
+    Files whose (size, mtime) match `prev` keep their parsed values.
     """
-    root = Path(folder)
-    manhwa = {}
-    canon_to_display = {}
-
-    for p in root.rglob("*"):
-        if not p.is_file() or p.suffix.lower() not in EXTS:
-            continue
-
-        title, ch, channel = extract_title_and_chapter(p.stem, filename=p.name)
-        if not title:
-            continue
+    prev_files = (prev or {}).get("files") or {}
+    files, subdirs = {}, []
+    with os.scandir(path) as it:
+        for e in it:
+            if e.is_dir():
+                subdirs.append(e.name)
+                continue
+            if not e.is_file() or os.path.splitext(e.name)[1].lower() not in EXTS:
+                continue
+            stats["files"] += 1
+            st = e.stat()  # served from the DirEntry cache on Windows
+            old = prev_files.get(e.name)
+            if old and old[0] == st.st_size and old[1] == st.st_mtime:
+                files[e.name] = old
+                continue
+            title, ch, channel = extract_title_and_chapter(Path(e.name).stem, filename=e.name)
+            files[e.name] = [st.st_size, st.st_mtime, title, ch, channel]
+            stats["parsed"] += 1
 
-        canon = canonicalize_title(title)
-        display = canon_to_display.get(canon) or title
-        canon_to_display[canon] = display
+    # A directory touched within the last couple of seconds may still be changing
+    # under the same mtime tick: don't let the next run trust it.
+    trusted = dir_mtime if (datetime.now().timestamp() - dir_mtime) > 2 else -1.0
+    return {"mtime": trusted, "subdirs": sorted(subdirs), "files": files}
 
-        prev_last, prev_channel, prev_mtime = (manhwa.get(display) or [0.0, None, None])
+def list_titles_with_last_chapter(folder: str, debug: bool = False, manifest_path: Optional[str] = SCAN_MANIFEST):
+    """
+    Returns: {title: [last_local_chapter, channel, latest_file_mtime]}
+      - latest_file_mtime is a POSIX timestamp (float) for the file that yielded the max chapter.
 
-        if ch is not None:
-            if ch > prev_last:
-                manhwa[display] = [ch, channel or prev_channel, p.stat().st_mtime]
-            elif ch == prev_last:
-                current_mtime = p.stat().st_mtime
-                if prev_mtime is None or current_mtime > prev_mtime:
-                    manhwa[display] = [prev_last, channel or prev_channel, current_mtime]
+    Incremental: a manifest of {dir: (mtime, subdirs, {file: (size, mtime, parsed)})} is kept
+    at `manifest_path` (None = don't persist). Directories whose mtime is unchanged are not
+    listed again, and only new/modified files are re-parsed. Files rewritten in place
+    (same directory mtime) are picked up once their directory changes.
+    """
+    root = os.path.abspath(folder)
+    old_dirs = _load_manifest(manifest_path, root)
+    dirs = {}
+    stats = {"listed": 0, "reused": 0, "files": 0, "parsed": 0}
+
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            d_mtime = os.stat(d).st_mtime
+        except OSError:
+            continue
+        prev = old_dirs.get(d)
+        if prev and prev.get("mtime") == d_mtime:
+            entry = prev
+            stats["reused"] += 1
+            stats["files"] += len(prev.get("files") or {})
         else:
-            if display not in manhwa:
-                manhwa[display] = [prev_last, prev_channel, prev_mtime]
+            try:
+                entry = _scan_dir(d, d_mtime, prev, stats)
+            except OSError:
+                continue
+            stats["listed"] += 1
+        dirs[d] = entry
+        stack.extend(os.path.join(d, sub) for sub in entry["subdirs"])
+
+    manhwa = {}
+    canon_to_display = {}
+    for d in sorted(dirs):
+        for name, (_, mtime, title, ch, channel) in sorted(dirs[d]["files"].items()):
+            if not title:
+                continue
+            _fold_local_file(manhwa, canon_to_display, title, ch, channel, mtime)
+
+    if manifest_path and (dirs != old_dirs):
+        _save_manifest(manifest_path, root, dirs)
+    metrics.count("scan.dirs_listed", stats["listed"])
+    metrics.count("scan.dirs_reused", stats["reused"])
+    metrics.count("scan.files", stats["files"])
+    metrics.count("scan.files_parsed", stats["parsed"])
+    if debug:
+        print(f"Local scan: {stats['listed']} dirs listed, {stats['reused']} reused, "
+              f"{stats['parsed']} files parsed")
 
     return manhwa
 
@@ -164,187 +285,565 @@ def _build_msg_link(entity, msg: Message) -> Optional[str]:
         return f"https://t.me/c/{entity.id}/{msg.id}"
     return None
 
+def _match_message(msg: Message, targets: TitleResolver, matcher: Optional[TitleMatcher] = None):
+    """
+    Yields (target_title, chapter) for every tracked title found in the message.
+    Parsed titles are resolved through `targets` (exact, alias, then fuzzy); a part that
+    resolves to nothing is searched with `matcher`, which also finds titles inside
+    longer captions ("🔥 <title> Chapter 12 is out!"). When the part parsed into a title
+    with its own chapter, the matcher is only trusted if tracked titles cover that whole
+    title, so "<title>: Ragnarok Chapter 312" is not taken as chapter 312 of <title>.
+    When the part parsed without a chapter, a bare number after a title is not one either
+    ("<title> 2024 anniversary recap", "<title> 2 is coming").
+    """
+    parts, fname = _message_parts(msg)
+    for part in parts:
+        if fname and part == fname:
+            stem = Path(fname).stem
+            title, chno, _ = extract_title_and_chapter(stem, filename=fname)
+        else:
+            title, chno, _ = extract_title_and_chapter(part, filename=None)
+
+        target_title = targets.resolve(canonicalize_title(title)) if title and chno is not None else None
+        if target_title:
+            yield target_title, chno
+        elif matcher is not None and (not title or chno is None or matcher.covers(title)):
+            yield from matcher.find(part, bare_numbers=chno is not None)
+
+class _RequestBudget:
+    """Token bucket shared by concurrent dialog scans: `rate` requests/s, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 5):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._stamp = None
+        self._lock = asyncio.Lock()
+
+    async def take(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._stamp is not None:
+                    self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+async def _scan_dialog(client, d, targets: TitleResolver, recent_scan: int, min_id: int,
+                       budget: _RequestBudget, matcher: Optional[TitleMatcher] = None, max_flood_retries: int = 3):
+    """
+    Reads one dialog newest-first down to `min_id`, at most `recent_scan` messages (None = no limit).
+    Returns: ({title: (chapter, dialog_name, permalink, date)}, (newest_msg_id, newest_date) | None,
+              {"seen", "matched", "match_dates", "complete"} | None)
+    "complete" is False when the limit cut the read short of `min_id` / the dialog's start.
+    A FloodWait only pauses THIS dialog; the attempt is restarted from scratch afterwards.
+    """
+    ent = d.entity
+    dname = (d.name or "").strip()
+
+    for attempt in range(max_flood_retries + 1):
+        best, newest = {}, None
+        match_dates = []
+        try:
+            await budget.take()
+            seen = 0
+            async for msg in client.iter_messages(d.id, limit=recent_scan, min_id=min_id):
+                seen += 1
+                if seen % 100 == 0:  # iter_messages pages 100 messages per request
+                    await budget.take()
+                if newest is None:
+                    newest = (msg.id, msg.date)
+                matched = False
+                for target_title, chno in _match_message(msg, targets, matcher):
+                    matched = True
+                    prev = best.get(target_title)
+                    if prev is None or chno > prev[0]:
+                        best[target_title] = (chno, dname, _build_msg_link(ent, msg), msg.date)
+                if matched and msg.date is not None:
+                    match_dates.append(msg.date)
+            metrics.count("telegram.messages", seen)
+            metrics.count("telegram.requests", seen // 100 + 1)
+            complete = recent_scan is None or seen < recent_scan
+            return best, newest, {"seen": seen, "matched": len(match_dates), "match_dates": match_dates,
+                                  "complete": complete}
+        except FloodWaitError as e:
+            metrics.count("telegram.flood_waits")
+            if attempt == max_flood_retries:
+                print(f"⚠️ FloodWait on '{dname}' persisted, skipping this run")
+                return {}, None, None
+            await asyncio.sleep(e.seconds + 1)
+
+@asynccontextmanager
+async def _telegram_client(api_id: int, api_hash: str, client=None):
+    """Yields `client` when one is already connected (listener mode), else a new session."""
+    if client is not None:
+        yield client
+        return
+    async with TelegramClient("manhwa_session", api_id, api_hash) as own:
+        yield own
+
+async def tracked_dialogs(client) -> list:
+    """Every channel and group dialog (the "Telegram" service chat excluded)."""
+    dialogs = []
+    async for d in client.iter_dialogs():
+        name = (d.name or "").strip()
+        if name.lower() == "telegram":
+            continue
+        if isinstance(d.entity, (Channel, Chat)):
+            dialogs.append(d)
+    return dialogs
+
 async def telegram_latest_all_dialogs(
     api_id: int,
     api_hash: str,
     titles: List[str],
-    recent_scan: int = 600
+    recent_scan: int = 600,
+    watermarks: Optional[Dict[int, Tuple[int, Optional[datetime]]]] = None,
+    seed: Optional[Dict[str, Tuple[float, Optional[str], Optional[str], Optional[datetime]]]] = None,
+    concurrency: int = 1,
+    requests_per_sec: float = 0,
+    caption_search: bool = True,
+    aliases: Optional[Dict[str, str]] = None,
+    profiles: Optional[Dict[int, dict]] = None,
+    client=None,
 ) -> Dict[str, Tuple[float, Optional[str], Optional[str], Optional[datetime]]]:
     """
     Scans ALL dialogs (channels + groups).
     Returns: {title: (latest_chapter, dialog_name, permalink, message_date_utc)}
+
+    Incremental mode (pass `watermarks` = {dialog_id: (last_msg_id, last_msg_date)}):
+      - results start from `seed` (what earlier scans found, see load_telegram_latest)
+      - dialogs whose newest message is not past their mark are skipped without a request
+      - other dialogs are only read down to their mark (min_id)
+      - `watermarks` is updated in place with the newest message seen per dialog
+    If some title has no seed yet, marks are ignored for this run so it gets a full backfill.
+
+    Scheduling (pass `profiles` = {dialog_id: activity profile}, see load_dialog_profiles):
+      - dialogs whose dialog.date is not past their mark date are skipped too
+      - low-yield and dormant dialogs are deferred until due (dialog_schedule.plan_scan);
+        their mark stays put, so nothing they post in between is missed
+      - due dialogs are read down to their mark whatever the volume; without a mark the
+        depth follows their usual volume instead of `recent_scan`
+      - `profiles` is updated in place from what each scan saw
+
+    Concurrency: up to `concurrency` dialogs are read at once, all drawing from one
+    `requests_per_sec` budget (0 = unlimited). Per-dialog results are merged in dialog
+    order, so the output is the same as a sequential scan.
+
+    Titles are also found inside free-form captions (extra words, emoji, "Chapter N of <title>")
+    by one TitleMatcher built over all tracked titles; set `caption_search=False` for exact only.
+
+    Spelling variants resolve through a TitleResolver (see title_match.py). Pass `aliases` =
+    {alias_canonical: series_canonical} (see load_title_aliases); it is updated in place
+    with the variants this scan resolved.
+
+    Pass a connected `client` to scan with it instead of opening a session (telegram_listen.py).
     """
     canon_targets = {canonicalize_title(t): t for t in titles}
+    alias_targets = {a: canon_targets[c] for a, c in (aliases or {}).items() if c in canon_targets}
+    targets = TitleResolver(canon_targets, alias_targets)
+    matcher = TitleMatcher(canon_targets) if caption_search else None
     out = {t: (0.0, None, None, None) for t in titles}
-
-    async with TelegramClient("manhwa_session", api_id, api_hash) as client:
-        dialogs = []
-        async for d in client.iter_dialogs():
-            ent = d.entity
-            name = (d.name or "").strip()
-            if name.lower() == "telegram":
-                continue
-            if isinstance(ent, Channel) or isinstance(ent, Chat):
-                dialogs.append(d)
-
-        for d in dialogs:
-            ent = d.entity
-            dname = (d.name or "").strip()
-            async for msg in client.iter_messages(d.id, limit=recent_scan):
-                parts, fname = _message_parts(msg)
-                for part in parts:
-                    if fname and part == fname:
-                        stem = Path(fname).stem
-                        title, chno, _ = extract_title_and_chapter(stem, filename=fname)
-                    else:
-                        title, chno, _ = extract_title_and_chapter(part, filename=None)
-                    if not title or chno is None:
-                        continue
-
-                    canon = canonicalize_title(title)
-                    target_title = canon_targets.get(canon)
-                    if not target_title:
-                        continue
-
-                    prev_ch, _, _, _ = out[target_title]
-                    if chno > prev_ch:
-                        out[target_title] = (chno, dname, _build_msg_link(ent, msg), msg.date)
+    seed = seed or {}
+    for t, prev in seed.items():
+        if t in out:
+            out[t] = prev
+    use_marks = watermarks is not None and all(t in seed for t in titles)
+    now = datetime.now(timezone.utc)
+
+    async with _telegram_client(api_id, api_hash, client) as client:
+        dialogs = await tracked_dialogs(client)
+
+        budget = _RequestBudget(requests_per_sec, burst=max(1, concurrency))
+        gate = asyncio.Semaphore(max(1, concurrency))
+
+        async def scan(d):
+            mark_id, depth = 0, recent_scan
+            if use_marks:
+                mark_id, mark_date = watermarks.get(d.id) or (0, None)
+                top_id = getattr(d.message, "id", None)
+                top_date = getattr(d, "date", None)
+                if mark_id and top_id is not None:
+                    new_msgs = max(0, top_id - mark_id)
+                elif mark_date is not None and top_date is not None and top_date <= mark_date:
+                    new_msgs = 0
+                else:
+                    new_msgs = None
+                if profiles is not None:
+                    depth = plan_scan(profiles.get(d.id), now, new_msgs, recent_scan, has_mark=bool(mark_id))
+                    skip = depth == 0
+                else:
+                    skip = new_msgs == 0
+                    if mark_id:
+                        depth = None  # read all the way down to the mark, however much was posted
+                if skip:
+                    metrics.count("telegram.dialogs_skipped" if new_msgs == 0 else "telegram.dialogs_deferred")
+                    return {}, None, None
+            async with gate:
+                return await _scan_dialog(client, d, targets, depth, mark_id, budget, matcher)
+
+        metrics.count("telegram.dialogs", len(dialogs))
+        results = await asyncio.gather(*(scan(d) for d in dialogs))
+
+    # Deterministic merge: dialog order, first strictly-higher chapter wins
+    for d, (best, newest, stats) in zip(dialogs, results):
+        for target_title, hit in best.items():
+            if hit[0] > out[target_title][0]:
+                out[target_title] = hit
+        if watermarks is not None and newest is not None:
+            prev_id = (watermarks.get(d.id) or (0, None))[0]
+            # A read cut short of an existing mark leaves it put: the messages in between are unread
+            if newest[0] > prev_id and (not prev_id or stats["complete"]):
+                watermarks[d.id] = newest
+        if profiles is not None and stats is not None:
+            profile = profiles.setdefault(d.id, new_profile())
+            update_profile(profile, now, stats["seen"], stats["matched"], stats["match_dates"])
+    if aliases is not None:
+        for variant, title in targets.learned.items():
+            aliases[variant] = canonicalize_title(title)
 
     return out
 
 
 # ============== AniList lookups =============
-def anilist_data(data: dict):
-    """
-    data = {title: [last_local_ch, channel, ...], ...}
-    Returns a list of dicts with AniList info for each title.
-    """
-    url = 'https://graphql.anilist.co'
-    headers = {"Content-Type": "application/json", "Accept": "application/json"}
-    query = '''
-    query ($search: String) {
-      Media(search: $search, type: MANGA) {
+ANILIST_URL = "https://graphql.anilist.co"
+ANILIST_HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+ANILIST_ID_BATCH = 50       # Page(perPage) max
+ANILIST_SEARCH_BATCH = 25   # aliased Media(search:) per request (keeps query complexity low)
+ANILIST_RATE_RESERVE = 2    # leave this many requests of the per-minute budget unused
+ANILIST_MAX_RETRIES = 3     # retries after a 429
+CATALOG_STATUSES = [s for s in os.getenv("ANILIST_CATALOG", "").split(",") if s.strip()]  # e.g. RELEASING,FINISHED
+CATALOG_PER_PAGE = 50
+CATALOG_CONCURRENCY = 4
+CATALOG_CHUNK = 500         # rows per store_trending_famous() call
+CATALOG_PAGE_RETRIES = 2    # extra attempts for a catalog page that still fails after the 429 retries
+CATALOG_RETRY_SEC = 5.0
+
+_META_FIELDS = """
+        id
         title { romaji english }
         status
         chapters
         genres
         description
-      }
-    }
-    '''
+"""
 
-    results = []
+# Per query type: (fresh seconds, extra seconds a stale copy is served while it refreshes)
+ANILIST_TTL = {
+    "meta":     (24 * 3600, 7 * 24 * 3600),
+    "trending": (24 * 3600, 24 * 3600),
+}
 
-    for t, v in sorted(data.items()):
-        variables = {"search": t}
-        try:
-            resp = requests.post(
-                url,
-                json={"query": query, "variables": variables},
-                headers=headers,
-                timeout=20
-            )
-            js = resp.json()
-            media = (js.get("data") or {}).get("Media")
-            if not media:
-                continue
+class _AniListRateLimit:
+    """
+    Shared view of AniList's rate-limit headers across threads:
+    X-RateLimit-Remaining / X-RateLimit-Reset before the budget runs out, Retry-After on a 429.
+    """
 
-            title = media.get("title", {}) or {}
-            display = title.get("english") or title.get("romaji") or t
-
-            results.append({
-                "search": t,
-                "display": display,
-                "status": media.get("status"),
-                "chapters": media.get("chapters"),
-                "genres": media.get("genres") or [],
-                "description": media.get("description"),
-            })
+    def __init__(self, reserve: int = ANILIST_RATE_RESERVE):
+        self.reserve = reserve
+        self.remaining = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.time()
+            delay = self.blocked_until - now
+            if self.remaining is not None:
+                if self.remaining <= self.reserve and self.reset_at > now:
+                    delay = max(delay, self.reset_at - now)
+                self.remaining -= 1  # claim a slot so parallel callers don't all pass
+        if delay > 0:
+            time.sleep(delay)
+
+    def update(self, resp) -> None:
+        h = resp.headers
+        with self.lock:
+            now = time.time()
+            if resp.status_code == 429:
+                self.blocked_until = max(self.blocked_until, now + float(h.get("Retry-After") or 60))
+            if h.get("X-RateLimit-Remaining") is not None:
+                self.remaining = int(h["X-RateLimit-Remaining"])
+                # Reset is a unix timestamp; without it assume the one-minute window (or Retry-After)
+                default_reset = self.blocked_until if resp.status_code == 429 else now + 60
+                self.reset_at = float(h.get("X-RateLimit-Reset") or default_reset)
+
+_anilist_limit = _AniListRateLimit()
+
+def _anilist_fetch(payload: dict) -> dict:
+    for attempt in range(ANILIST_MAX_RETRIES + 1):
+        _anilist_limit.wait()
+        resp = requests.post(
+            ANILIST_URL,
+            json=payload,
+            headers=ANILIST_HEADERS,
+            timeout=20
+        )
+        _anilist_limit.update(resp)
+        metrics.count("anilist.requests")
+        if resp.status_code == 429 and attempt < ANILIST_MAX_RETRIES:
+            metrics.count("anilist.retries")
+            continue
+        return resp.json()
+
+def _anilist_post(query: str, variables: dict, kind: str = "meta") -> dict:
+    """POST through the local response cache (see http_cache.py)."""
+    fresh, stale = ANILIST_TTL[kind]
+    return cached_json(
+        ANILIST_URL,
+        {"query": query, "variables": variables},
+        _anilist_fetch,
+        ttl=fresh,
+        stale_ttl=stale,
+        kind=kind,
+        valid=lambda js: bool(js.get("data")),
+    )
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _meta_by_ids(ids: List[int]) -> Dict[int, dict]:
+    """One Page(media(id_in:)) request per ANILIST_ID_BATCH ids. Returns {anilist_id: media}."""
+    query = f'''
+    query ($ids: [Int], $perPage: Int) {{
+      Page(page: 1, perPage: $perPage) {{
+        media(id_in: $ids, type: MANGA) {{{_META_FIELDS}        }}
+      }}
+    }}
+    '''
+    found = {}
+    for chunk in _chunks(ids, ANILIST_ID_BATCH):
+        try:
+            js = _anilist_post(query, {"ids": chunk, "perPage": len(chunk)})
         except Exception:
             continue
+        for media in (((js.get("data") or {}).get("Page") or {}).get("media") or []):
+            if media and media.get("id"):
+                found[int(media["id"])] = media
+    return found
+
+def _meta_by_search(titles: List[str]) -> Dict[str, dict]:
+    """One aliased request (m0: Media(search: $s0) ...) per ANILIST_SEARCH_BATCH titles. Returns {title: media}."""
+    found = {}
+    for chunk in _chunks(titles, ANILIST_SEARCH_BATCH):
+        params = ", ".join(f"$s{i}: String" for i in range(len(chunk)))
+        fields = "".join(
+            f"\n      m{i}: Media(search: $s{i}, type: MANGA) {{{_META_FIELDS}      }}"
+            for i in range(len(chunk))
+        )
+        query = f"query ({params}) {{{fields}\n    }}"
+        try:
+            # Titles AniList can't find come back as null aliases (+ an "errors" entry)
+            js = _anilist_post(query, {f"s{i}": t for i, t in enumerate(chunk)})
+        except Exception:
+            continue
+        data = js.get("data") or {}
+        for i, t in enumerate(chunk):
+            media = data.get(f"m{i}")
+            if media:
+                found[t] = media
+    return found
+
+def anilist_data(data: dict, known_ids: Optional[Dict[str, int]] = None):
+    """
+    data = {title: [last_local_ch, channel, ...], ...}
+    known_ids = {title: anilist_id} for titles resolved on earlier runs (see load_anilist_ids)
+    Returns a list of dicts with AniList info for each title.
+
+    Known ids are refreshed in Page(id_in:) batches; the rest (and ids AniList no longer
+    returns) are searched with aliased requests, so ~300 titles take a handful of requests.
+    """
+    known_ids = known_ids or {}
+    titles = sorted(data)
+
+    by_id: Dict[int, List[str]] = {}
+    for t in titles:
+        if known_ids.get(t):
+            by_id.setdefault(int(known_ids[t]), []).append(t)
+
+    found: Dict[str, dict] = {}
+    for media_id, media in _meta_by_ids(list(by_id)).items():
+        for t in by_id.get(media_id, []):
+            found[t] = media
+    found.update(_meta_by_search([t for t in titles if t not in found]))
+
+    results = []
+    for t in titles:
+        media = found.get(t)
+        if not media:
+            continue
+        title = media.get("title", {}) or {}
+        display = title.get("english") or title.get("romaji") or t
+
+        results.append({
+            "search": t,
+            "anilist_id": media.get("id"),
+            "display": display,
+            "status": media.get("status"),
+            "chapters": media.get("chapters"),
+            "genres": media.get("genres") or [],
+            "description": media.get("description"),
+        })
 
     return results
 
+_TRENDING_QUERY = """
+query TrendingManhwa($page: Int = 1, $perPage: Int = 20, $status: MediaStatus = RELEASING, $sort: [MediaSort] = [TRENDING_DESC]) {
+  Page(page: $page, perPage: $perPage) {
+    pageInfo { hasNextPage }
+    media(
+      type: MANGA
+      countryOfOrigin: KR
+      status: $status
+      isAdult: false
+      sort: $sort
+    ) {
+      id
+      siteUrl
+      title { romaji english native }
+      status
+      chapters
+      genres
+      averageScore
+      popularity
+      favourites
+      updatedAt
+      coverImage { large }
+      description
+    }
+  }
+}
+"""
+
+def _trending_item(m: dict) -> dict:
+    """One AniList media node -> the dict store_trending_famous() expects."""
+    title = (m.get("title") or {})
+    display = title.get("english") or title.get("romaji") or title.get("native") or ""
+    raw_desc = m.get("description") or ""
+    return {
+        "display": display,
+        "romaji": title.get("romaji"),
+        "english": title.get("english"),
+        "siteUrl": m.get("siteUrl"),
+        "status": m.get("status"),
+        "chapters": m.get("chapters"),
+        "genres": m.get("genres") or [],
+        "averageScore": m.get("averageScore"),
+        "popularity": m.get("popularity"),
+        "favourites": m.get("favourites"),
+        "updatedAt": m.get("updatedAt"),
+        "cover": ((m.get("coverImage") or {}).get("large")),
+        "description_raw": raw_desc,
+        "description": clean_description(raw_desc),
+    }
+
+def _trending_page(page: int, per_page: int, status: str = "RELEASING", sort: str = "TRENDING_DESC") -> Tuple[List[dict], bool]:
+    """Returns: (items, has_next_page)"""
+    variables = {"page": page, "perPage": int(per_page), "status": status, "sort": [sort]}
+    js = _anilist_post(_TRENDING_QUERY, variables, kind="trending")
+    page_js = ((js.get("data") or {}).get("Page") or {})
+    if not page_js:
+        # Rate-limited or failed: an empty page here would read as "last page"
+        raise RuntimeError(f"AniList {status} page {page} failed: {js.get('errors') or 'no data'}")
+    media_list = page_js.get("media") or []
+    return [_trending_item(m) for m in media_list], bool((page_js.get("pageInfo") or {}).get("hasNextPage"))
+
 def get_currently_famous_manhwas(limit: int = 20):
     """
     Fetch 'currently famous' manhwas from AniList:
     type: MANGA, countryOfOrigin: KR, status: RELEASING, sort: TRENDING_DESC
     Includes description (raw and cleaned).
     """
-    url = "https://graphql.anilist.co"
-    headers = {"Content-Type": "application/json", "Accept": "application/json"}
-    query = """
-    query TrendingManhwa($page: Int = 1, $perPage: Int = 20) {
-      Page(page: $page, perPage: $perPage) {
-        media(
-          type: MANGA
-          countryOfOrigin: KR
-          status: RELEASING
-          isAdult: false
-          sort: TRENDING_DESC
-        ) {
-          id
-          siteUrl
-          title { romaji english native }
-          status
-          chapters
-          genres
-          averageScore
-          popularity
-          favourites
-          updatedAt
-          coverImage { large }
-          description
-        }
-      }
-    }
-    """
-    variables = {"page": 1, "perPage": int(limit)}
-
     try:
-        resp = requests.post(url, json={"query": query, "variables": variables}, headers=headers, timeout=20)
-        js = resp.json()
-        media_list = (((js.get("data") or {}).get("Page") or {}).get("media") or [])
-        out = []
-        for m in media_list:
-            title = (m.get("title") or {})
-            display = title.get("english") or title.get("romaji") or title.get("native") or ""
-            raw_desc = m.get("description") or ""
-            out.append({
-                "display": display,
-                "romaji": title.get("romaji"),
-                "english": title.get("english"),
-                "siteUrl": m.get("siteUrl"),
-                "status": m.get("status"),
-                "chapters": m.get("chapters"),
-                "genres": m.get("genres") or [],
-                "averageScore": m.get("averageScore"),
-                "popularity": m.get("popularity"),
-                "favourites": m.get("favourites"),
-                "updatedAt": m.get("updatedAt"),
-                "cover": ((m.get("coverImage") or {}).get("large")),
-                "description_raw": raw_desc,
-                "description": clean_description(raw_desc),
-            })
-        return out
+        items, _ = _trending_page(1, limit)
+        return items
     except Exception as e:
         print("AniList trending fetch failed:", e)
         return []
 
+def _catalog_page(page: int, per_page: int, status: str) -> Tuple[List[dict], bool]:
+    for attempt in range(CATALOG_PAGE_RETRIES + 1):
+        try:
+            return _trending_page(page, per_page, status, "ID")
+        except Exception:
+            if attempt == CATALOG_PAGE_RETRIES:
+                raise
+            metrics.count("anilist.retries")
+            time.sleep(CATALOG_RETRY_SEC * (attempt + 1))
+
+def iter_catalog_pages(statuses: List[str], per_page: int = CATALOG_PER_PAGE, concurrency: int = CATALOG_CONCURRENCY):
+    """
+    Walks every page of the KR query for each status, `concurrency` pages in flight,
+    yielding each page's items in page order. Sorted by ID so pages stay stable while walking.
+    A page that still fails after CATALOG_PAGE_RETRIES raises instead of ending the walk early.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for status in statuses:
+            status = status.strip().upper()
+            pending = deque()
+            next_page, more = 1, True
+            while more or pending:
+                while more and len(pending) < concurrency:
+                    pending.append(pool.submit(_catalog_page, next_page, per_page, status))
+                    next_page += 1
+                items, has_next = pending.popleft().result()
+                if items:
+                    yield items
+                if not has_next and more:
+                    more = False
+                    for f in pending:  # requested past the last page
+                        f.cancel()
+                    pending.clear()
+
+def ingest_trending_catalog(statuses: List[str], chunk_size: int = CATALOG_CHUNK,
+                            per_page: int = CATALOG_PER_PAGE, concurrency: int = CATALOG_CONCURRENCY) -> Tuple[int, List[str]]:
+    """
+    Streams the full catalog into trending_manhwa, `chunk_size` rows per upsert,
+    so memory stays flat however many titles AniList returns.
+    A status whose walk fails part-way keeps the pages stored so far; the others still run.
+    Returns: (number of titles fetched, statuses ingested only partially)
+    """
+    resolver = series_resolver()  # one load of series + aliases for every chunk
+    buf, total, partial = [], 0, []
+    for status in statuses:
+        try:
+            for items in iter_catalog_pages([status], per_page, concurrency):
+                buf.extend(items)
+                total += len(items)
+                if len(buf) >= chunk_size:
+                    store_trending_famous(buf, resolver)
+                    buf = []
+        except Exception as e:
+            print(f"AniList catalog walk for {status} stopped early: {e}")
+            metrics.count("anilist.catalog_partial")
+            partial.append(status)
+    if buf:
+        store_trending_famous(buf, resolver)
+    return total, partial
+
 def match_famous_with_local(famous: List[dict], local_titles: List[str]):
     """
     Returns two lists:
       have_it: famous titles you already have locally
       missing: famous titles you don't have locally
-    Matching is case-insensitive using canonicalize_title.
+    Matching goes through a TitleResolver over canonicalize_title, so small
+    spelling differences still count as "have it".
     """
     have_it, missing = [], []
-    canon_local = {canonicalize_title(t): t for t in local_titles}
+    local = TitleResolver({canonicalize_title(t): t for t in local_titles})
     for item in famous:
-        disp = item.get("display") or ""
-        canon = canonicalize_title(disp)
-        if canon in canon_local:
-            have_it.append({**item, "local_title": canon_local[canon]})
+        local_title = local.resolve(canonicalize_title(item.get("display") or ""))
+        if local_title:
+            have_it.append({**item, "local_title": local_title})
         else:
             missing.append(item)
     return have_it, missing
@@ -379,105 +878,106 @@ def ensure_trending_table():
       UNIQUE KEY uq_trending_canonical (canonical)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     """
-    conn = get_connection()
-    if not conn:
-        return
-    cur = conn.cursor()
-    cur.execute(ddl)
-    conn.commit()
-    cur.close()
-    conn.close()
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(ddl)
+        conn.commit()
+        cur.close()
 
-def store_trending_famous(famous: List[dict]):
+def store_trending_famous(famous: List[dict], resolver: Optional[TitleResolver] = None):
     """
     Insert AniList 'famous' (trending) manhwas into SQL,
-    excluding titles already present in local `series` (by canonical),
+    excluding titles already present in local `series` (by canonical or a `series_alias`),
     and only updating existing rows once per day.
-    Assumes table `trending_manhwa` already exists with a UNIQUE(canonical).
+    Assumes tables `trending_manhwa` (with a UNIQUE(canonical)) and `series_alias` already exist.
+    Chunked callers pass one `resolver` (see series_resolver) for all chunks.
     """
     if not famous:
         return
+    # Spelling variants of library titles are local too: alias them first, the insert skips aliases
+    resolve_series_aliases({canonicalize_title(item.get("display") or "") for item in famous},
+                           source="trending", resolver=resolver)
 
-    conn = get_connection()
-    if not conn:
-        return
-    cur = conn.cursor()
+    with connection() as conn:
+        cur = conn.cursor()
 
-    # Staging table for this batch
-    cur.execute("""
-        CREATE TEMPORARY TABLE tmp_trending_stage (
-          canonical      VARCHAR(255) NOT NULL,
-          display        VARCHAR(255) NOT NULL,
-          site_url       VARCHAR(512) NULL,
-          average_score  TINYINT UNSIGNED NULL,
-          popularity     INT UNSIGNED NULL,
-          favourites     INT UNSIGNED NULL,
-          genres         JSON NULL,
-          chapters_total INT NULL,
-          description    MEDIUMTEXT NULL
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-    """)
-
-    rows = []
-    for item in famous:
-        display = (item.get("display") or "").strip()
-        if not display:
-            continue
-        canonical = canonicalize_title(display)
-        rows.append((
-            canonical,
-            display,
-            item.get("siteUrl"),
-            item.get("averageScore"),
-            item.get("popularity"),
-            item.get("favourites"),
-            json.dumps(item.get("genres") or []),
-            item.get("chapters"),
-            item.get("description") or item.get("description_raw") or "",
-        ))
-
-    if rows:
-        cur.executemany("""
-            INSERT INTO tmp_trending_stage
-              (canonical, display, site_url, average_score, popularity, favourites,
-               genres, chapters_total, description)
-            VALUES (%s,%s,%s,%s,%s,%s,CAST(%s AS JSON),%s,%s);
-        """, rows)
-
-        # Insert only those not present locally; upsert with once-per-day guard
+        # Staging table for this batch (dropped first: chunked callers may reuse a session)
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS tmp_trending_stage;")
         cur.execute("""
-            INSERT INTO trending_manhwa (
-              canonical, display, site_url,
-              average_score, popularity, favourites,
-              genres, chapters_total, description,
-              last_trending_at, refreshed_on, source
-            )
-            SELECT
-              t.canonical, t.display, t.site_url,
-              t.average_score, t.popularity, t.favourites,
-              t.genres, t.chapters_total, t.description,
-              NOW(), CURRENT_DATE, 'anilist'
-            FROM tmp_trending_stage AS t
-            LEFT JOIN series s
-              ON s.canonical = t.canonical
-            WHERE s.canonical IS NULL
-            ON DUPLICATE KEY UPDATE
-              updated_at       = IF(trending_manhwa.refreshed_on < CURRENT_DATE, CURRENT_TIMESTAMP, trending_manhwa.updated_at),
-              display          = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(display),          trending_manhwa.display),
-              site_url         = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(site_url),         trending_manhwa.site_url),
-              average_score    = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(average_score),    trending_manhwa.average_score),
-              popularity       = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(popularity),       trending_manhwa.popularity),
-              favourites       = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(favourites),       trending_manhwa.favourites),
-              genres           = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(genres),           trending_manhwa.genres),
-              chapters_total   = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(chapters_total),   trending_manhwa.chapters_total),
-              description      = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(description),      trending_manhwa.description),
-              last_trending_at = IF(trending_manhwa.refreshed_on < CURRENT_DATE, NOW(),                    trending_manhwa.last_trending_at),
-              refreshed_on     = IF(trending_manhwa.refreshed_on < CURRENT_DATE, CURRENT_DATE,             trending_manhwa.refreshed_on);
+            CREATE TEMPORARY TABLE tmp_trending_stage (
+              canonical      VARCHAR(255) NOT NULL,
+              display        VARCHAR(255) NOT NULL,
+              site_url       VARCHAR(512) NULL,
+              average_score  TINYINT UNSIGNED NULL,
+              popularity     INT UNSIGNED NULL,
+              favourites     INT UNSIGNED NULL,
+              genres         JSON NULL,
+              chapters_total INT NULL,
+              description    MEDIUMTEXT NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
         """)
 
-    conn.commit()
-    cur.close()
-    conn.close()
+        rows = []
+        for item in famous:
+            display = (item.get("display") or "").strip()
+            if not display:
+                continue
+            canonical = canonicalize_title(display)
+            rows.append((
+                canonical,
+                display,
+                item.get("siteUrl"),
+                item.get("averageScore"),
+                item.get("popularity"),
+                item.get("favourites"),
+                json.dumps(item.get("genres") or []),
+                item.get("chapters"),
+                item.get("description") or item.get("description_raw") or "",
+            ))
+
+        if rows:
+            cur.executemany("""
+                INSERT INTO tmp_trending_stage
+                  (canonical, display, site_url, average_score, popularity, favourites,
+                   genres, chapters_total, description)
+                VALUES (%s,%s,%s,%s,%s,%s,CAST(%s AS JSON),%s,%s);
+            """, rows)
+
+            # Insert only those not present locally; upsert with once-per-day guard
+            cur.execute("""
+                INSERT INTO trending_manhwa (
+                  canonical, display, site_url,
+                  average_score, popularity, favourites,
+                  genres, chapters_total, description,
+                  last_trending_at, refreshed_on, source
+                )
+                SELECT
+                  t.canonical, t.display, t.site_url,
+                  t.average_score, t.popularity, t.favourites,
+                  t.genres, t.chapters_total, t.description,
+                  NOW(), CURRENT_DATE, 'anilist'
+                FROM tmp_trending_stage AS t
+                LEFT JOIN series s
+                  ON s.canonical = t.canonical
+                LEFT JOIN series_alias a
+                  ON a.alias = t.canonical
+                WHERE s.canonical IS NULL AND a.alias IS NULL
+                ON DUPLICATE KEY UPDATE
+                  updated_at       = IF(trending_manhwa.refreshed_on < CURRENT_DATE, CURRENT_TIMESTAMP, trending_manhwa.updated_at),
+                  display          = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(display),          trending_manhwa.display),
+                  site_url         = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(site_url),         trending_manhwa.site_url),
+                  average_score    = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(average_score),    trending_manhwa.average_score),
+                  popularity       = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(popularity),       trending_manhwa.popularity),
+                  favourites       = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(favourites),       trending_manhwa.favourites),
+                  genres           = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(genres),           trending_manhwa.genres),
+                  chapters_total   = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(chapters_total),   trending_manhwa.chapters_total),
+                  description      = IF(trending_manhwa.refreshed_on < CURRENT_DATE, VALUES(description),      trending_manhwa.description),
+                  last_trending_at = IF(trending_manhwa.refreshed_on < CURRENT_DATE, NOW(),                    trending_manhwa.last_trending_at),
+                  refreshed_on     = IF(trending_manhwa.refreshed_on < CURRENT_DATE, CURRENT_DATE,             trending_manhwa.refreshed_on);
+            """)
+
+        conn.commit()
+        cur.close()
 
 # ======== NEW: persist scan results into `series` ========
 def upsert_series(local: Dict[str, list], tg: Dict[str, tuple]) -> None:
@@ -487,91 +987,448 @@ def upsert_series(local: Dict[str, list], tg: Dict[str, tuple]) -> None:
     """
     if not local:
         return
-    conn = get_connection()
-    if not conn:
+    with connection() as conn:
+        cur = conn.cursor()
+
+        rows = []
+        for title, (last_local, local_channel, local_mtime) in local.items():
+            tg_ch, tg_src, tg_link, tg_dt = tg.get(title, (0.0, None, None, None))
+            rows.append((
+                title.strip(),
+                canonicalize_title(title),
+                float(last_local or 0.0),
+                local_channel,
+                float(tg_ch or 0.0),
+                tg_src,
+                tg_link,
+                (tg_dt.replace(tzinfo=None) if isinstance(tg_dt, datetime) else None)
+            ))
+
+        cur.executemany("""
+            INSERT INTO series
+                (title, canonical,
+                 local_latest_chapter, channel,
+                 telegram_latest_chapter, telegram_source, telegram_link, telegram_seen_at)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+            ON DUPLICATE KEY UPDATE
+                local_latest_chapter    = GREATEST(COALESCE(VALUES(local_latest_chapter),0), COALESCE(series.local_latest_chapter,0)),
+                telegram_latest_chapter = GREATEST(COALESCE(VALUES(telegram_latest_chapter),0), COALESCE(series.telegram_latest_chapter,0)),
+                channel                 = COALESCE(VALUES(channel), series.channel),
+                telegram_source         = COALESCE(VALUES(telegram_source), series.telegram_source),
+                telegram_link           = COALESCE(VALUES(telegram_link), series.telegram_link),
+                telegram_seen_at        = IFNULL(GREATEST(COALESCE(VALUES(telegram_seen_at), series.telegram_seen_at), series.telegram_seen_at), COALESCE(VALUES(telegram_seen_at), series.telegram_seen_at)),
+                updated_at              = CURRENT_TIMESTAMP;
+        """, rows)
+
+        conn.commit()
+        cur.close()
+
+# ======== Telegram watermarks (incremental scans) ========
+def ensure_dialog_watermarks_table():
+    """
+    Creates 'telegram_dialog_state' if missing.
+    One row per dialog: the newest message id/date already scanned, plus its
+    activity profile (see dialog_schedule.py).
+    """
+    ddl = """
+    CREATE TABLE IF NOT EXISTS telegram_dialog_state (
+      dialog_id     BIGINT NOT NULL PRIMARY KEY,
+      last_msg_id   BIGINT NOT NULL DEFAULT 0,
+      last_msg_date DATETIME NULL,
+      updated_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(ddl)
+        for column, col_ddl in _PROFILE_COLUMNS:
+            _add_column_if_missing(cur, "telegram_dialog_state", column, f"{column} {col_ddl}")
+        conn.commit()
+        cur.close()
+
+_PROFILE_COLUMNS = [
+    ("msgs_per_day",   "DOUBLE NULL"),
+    ("match_yield",    "DOUBLE NULL"),
+    ("messages_total", "BIGINT NOT NULL DEFAULT 0"),
+    ("matches_total",  "BIGINT NOT NULL DEFAULT 0"),
+    ("last_match_at",  "DATETIME NULL"),
+    ("release_gap_h",  "DOUBLE NULL"),
+    ("last_scan_at",   "DATETIME NULL"),
+    ("next_scan_at",   "DATETIME NULL"),
+]
+
+def load_dialog_watermarks() -> Dict[int, Tuple[int, Optional[datetime]]]:
+    """Returns: {dialog_id: (last_msg_id, last_msg_date_utc)}"""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT dialog_id, last_msg_id, last_msg_date FROM telegram_dialog_state")
+        marks = {}
+        for dialog_id, last_id, last_dt in cur.fetchall():
+            if isinstance(last_dt, datetime):
+                last_dt = last_dt.replace(tzinfo=timezone.utc)
+            marks[int(dialog_id)] = (int(last_id), last_dt)
+        cur.close()
+    return marks
+
+def save_dialog_watermarks(marks: Dict[int, Tuple[int, Optional[datetime]]]) -> None:
+    """Upserts marks; a mark never moves backwards."""
+    if not marks:
+        return
+    with connection() as conn:
+        cur = conn.cursor()
+        rows = [
+            (int(dialog_id), int(last_id),
+             (last_dt.astimezone(timezone.utc).replace(tzinfo=None) if isinstance(last_dt, datetime) else None))
+            for dialog_id, (last_id, last_dt) in marks.items()
+        ]
+        cur.executemany("""
+            INSERT INTO telegram_dialog_state (dialog_id, last_msg_id, last_msg_date)
+            VALUES (%s,%s,%s)
+            ON DUPLICATE KEY UPDATE
+                last_msg_date = IF(VALUES(last_msg_id) > telegram_dialog_state.last_msg_id, VALUES(last_msg_date), telegram_dialog_state.last_msg_date),
+                last_msg_id   = GREATEST(VALUES(last_msg_id), telegram_dialog_state.last_msg_id);
+        """, rows)
+        conn.commit()
+        cur.close()
+
+def _from_db_utc(dt) -> Optional[datetime]:
+    return dt.replace(tzinfo=timezone.utc) if isinstance(dt, datetime) else None
+
+def _to_db_utc(dt) -> Optional[datetime]:
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if isinstance(dt, datetime) else None
+
+def load_dialog_profiles() -> Dict[int, dict]:
+    """Returns: {dialog_id: activity profile} for dialogs scanned at least once (see dialog_schedule.new_profile)."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT dialog_id, msgs_per_day, match_yield, messages_total, matches_total,
+                   last_match_at, release_gap_h, last_scan_at, next_scan_at
+              FROM telegram_dialog_state
+             WHERE last_scan_at IS NOT NULL
+        """)
+        profiles = {}
+        for dialog_id, rate, match_yield, messages, matches, last_match, gap, last_scan, next_scan in cur.fetchall():
+            profiles[int(dialog_id)] = {
+                "msgs_per_day": rate, "match_yield": match_yield,
+                "messages": int(messages), "matches": int(matches),
+                "last_match_at": _from_db_utc(last_match), "release_gap_h": gap,
+                "last_scan_at": _from_db_utc(last_scan), "next_scan_at": _from_db_utc(next_scan),
+            }
+        cur.close()
+    return profiles
+
+def save_dialog_profiles(profiles: Dict[int, dict]) -> None:
+    """Upserts every profile (watermark columns are left alone)."""
+    if not profiles:
+        return
+    with connection() as conn:
+        cur = conn.cursor()
+        rows = [
+            (int(dialog_id), p["msgs_per_day"], p["match_yield"], int(p["messages"]), int(p["matches"]),
+             _to_db_utc(p["last_match_at"]), p["release_gap_h"], _to_db_utc(p["last_scan_at"]), _to_db_utc(p["next_scan_at"]))
+            for dialog_id, p in profiles.items()
+        ]
+        cur.executemany("""
+            INSERT INTO telegram_dialog_state
+                (dialog_id, msgs_per_day, match_yield, messages_total, matches_total,
+                 last_match_at, release_gap_h, last_scan_at, next_scan_at)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            ON DUPLICATE KEY UPDATE
+                msgs_per_day   = VALUES(msgs_per_day),
+                match_yield    = VALUES(match_yield),
+                messages_total = VALUES(messages_total),
+                matches_total  = VALUES(matches_total),
+                last_match_at  = VALUES(last_match_at),
+                release_gap_h  = VALUES(release_gap_h),
+                last_scan_at   = VALUES(last_scan_at),
+                next_scan_at   = VALUES(next_scan_at);
+        """, rows)
+        conn.commit()
+        cur.close()
+
+def load_telegram_latest(titles: List[str]) -> Dict[str, Tuple[float, Optional[str], Optional[str], Optional[datetime]]]:
+    """
+    Returns what earlier scans stored in `series` for these titles (matched by canonical):
+      {title: (telegram_latest_chapter, telegram_source, telegram_link, telegram_seen_at_utc)}
+    Titles without a `series` row are left out.
+    """
+    if not titles:
+        return {}
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT canonical, telegram_latest_chapter, telegram_source, telegram_link, telegram_seen_at
+              FROM series
+        """)
+        canon_targets = {canonicalize_title(t): t for t in titles}
+        seed = {}
+        for canonical, tg_ch, tg_src, tg_link, tg_dt in cur.fetchall():
+            title = canon_targets.get(canonical)
+            if not title:
+                continue
+            if isinstance(tg_dt, datetime):
+                tg_dt = tg_dt.replace(tzinfo=timezone.utc)
+            seed[title] = (float(tg_ch or 0.0), tg_src, tg_link, tg_dt)
+        cur.close()
+    return seed
+
+# ======== Title aliases (spelling variants -> series) ========
+def ensure_title_aliases_table():
+    """
+    Creates 'series_alias' if missing.
+    One row per resolved spelling variant: alias = canonicalize_title(variant).
+    """
+    ddl = """
+    CREATE TABLE IF NOT EXISTS series_alias (
+      alias      VARCHAR(255) NOT NULL PRIMARY KEY,
+      series_id  BIGINT UNSIGNED NOT NULL,
+      source     VARCHAR(32) NOT NULL,
+      created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      KEY idx_alias_series (series_id),
+      CONSTRAINT fk_alias_series FOREIGN KEY (series_id) REFERENCES series (id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(ddl)
+        conn.commit()
+        cur.close()
+
+def load_title_aliases() -> Dict[str, str]:
+    """Returns: {alias_canonical: series_canonical}"""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT a.alias, s.canonical
+              FROM series_alias AS a
+              JOIN series AS s ON s.id = a.series_id
+        """)
+        aliases = dict(cur.fetchall())
+        cur.close()
+    return aliases
+
+def save_title_aliases(aliases: Dict[str, str], source: str) -> None:
+    """Stores {alias_canonical: series_canonical}; an alias keeps the series it was first given."""
+    aliases = {a: c for a, c in aliases.items() if a and a != c}
+    if not aliases:
         return
-    cur = conn.cursor()
-
-    rows = []
-    for title, (last_local, local_channel, local_mtime) in local.items():
-        tg_ch, tg_src, tg_link, tg_dt = tg.get(title, (0.0, None, None, None))
-        rows.append((
-            title.strip(),
-            canonicalize_title(title),
-            float(last_local or 0.0),
-            local_channel,
-            float(tg_ch or 0.0),
-            tg_src,
-            tg_link,
-            (tg_dt.replace(tzinfo=None) if isinstance(tg_dt, datetime) else None)
-        ))
-
-    cur.executemany("""
-        INSERT INTO series
-            (title, canonical,
-             local_latest_chapter, channel,
-             telegram_latest_chapter, telegram_source, telegram_link, telegram_seen_at)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-        ON DUPLICATE KEY UPDATE
-            local_latest_chapter    = GREATEST(COALESCE(VALUES(local_latest_chapter),0), COALESCE(series.local_latest_chapter,0)),
-            telegram_latest_chapter = GREATEST(COALESCE(VALUES(telegram_latest_chapter),0), COALESCE(series.telegram_latest_chapter,0)),
-            channel                 = COALESCE(VALUES(channel), series.channel),
-            telegram_source         = COALESCE(VALUES(telegram_source), series.telegram_source),
-            telegram_link           = COALESCE(VALUES(telegram_link), series.telegram_link),
-            telegram_seen_at        = IFNULL(GREATEST(COALESCE(VALUES(telegram_seen_at), series.telegram_seen_at), series.telegram_seen_at), COALESCE(VALUES(telegram_seen_at), series.telegram_seen_at)),
-            updated_at              = CURRENT_TIMESTAMP;
-    """, rows)
-
-    conn.commit()
-    cur.close()
-    conn.close()
+    with connection() as conn:
+        cur = conn.cursor()
+        wanted = sorted(set(aliases.values()))
+        cur.execute(f"SELECT canonical, id FROM series WHERE canonical IN ({','.join(['%s'] * len(wanted))})", wanted)
+        ids = {canonical: int(series_id) for canonical, series_id in cur.fetchall()}
+        rows = [(a, ids[c], source) for a, c in aliases.items() if c in ids]
+        if rows:
+            cur.executemany("INSERT IGNORE INTO series_alias (alias, series_id, source) VALUES (%s,%s,%s)", rows)
+        conn.commit()
+        cur.close()
+
+def series_resolver() -> TitleResolver:
+    """TitleResolver over every `series` canonical and `series_alias` row (values = series canonical)."""
+    aliases = load_title_aliases()
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT canonical FROM series")
+        series = {canonical for (canonical,) in cur.fetchall()}
+        cur.close()
+    return TitleResolver({c: c for c in series}, aliases)
+
+def resolve_series_aliases(canonicals, source: str, resolver: Optional[TitleResolver] = None) -> Dict[str, str]:
+    """
+    Resolves canonical titles that match no `series` row (or alias) exactly to a close
+    series title (see TitleResolver) and stores them in `series_alias`.
+    Pass `resolver` (see series_resolver) to reuse one across calls.
+    Returns: {alias_canonical: series_canonical} newly resolved.
+    """
+    resolver = resolver or series_resolver()
+    before = set(resolver.learned)
+    for canon in canonicals:
+        if canon:
+            resolver.resolve(canon)
+    new = {a: c for a, c in resolver.learned.items() if a not in before}
+    save_title_aliases(new, source)
+    return new
 
 # ======== NEW: persist AniList metadata into `manhwa_meta` ========
+def _add_column_if_missing(cur, table: str, column: str, ddl: str) -> None:
+    """MySQL has no ADD COLUMN IF NOT EXISTS; check information_schema first."""
+    cur.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+         WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    if cur.fetchone()[0] == 0:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {ddl}")
+
+def _add_index_if_missing(cur, table: str, index: str, ddl: str) -> None:
+    cur.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+         WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index))
+    if cur.fetchone()[0] == 0:
+        cur.execute(f"ALTER TABLE {table} ADD {ddl}")
+
+def ensure_manhwa_meta_columns():
+    """Adds columns newer code relies on to an existing `manhwa_meta`."""
+    with connection() as conn:
+        cur = conn.cursor()
+        _add_column_if_missing(cur, "manhwa_meta", "anilist_id", "anilist_id INT NULL AFTER search_title")
+        _add_index_if_missing(cur, "manhwa_meta", "idx_meta_anilist_id", "KEY idx_meta_anilist_id (anilist_id)")
+        _add_column_if_missing(cur, "manhwa_meta", "content_hash", "content_hash CHAR(40) NULL AFTER description")
+
+        cur.execute("""
+            SELECT COUNT(*) FROM information_schema.STATISTICS
+             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'manhwa_meta' AND INDEX_NAME = 'uq_meta_search_title'
+        """)
+        if cur.fetchone()[0] == 0:
+            # Older tables may hold several rows per search_title: keep the newest one
+            cur.execute("""
+                DELETE older FROM manhwa_meta AS older
+                JOIN manhwa_meta AS newer
+                  ON newer.search_title = older.search_title
+                 AND (newer.updated_at > older.updated_at
+                      OR (newer.updated_at = older.updated_at AND newer.id > older.id))
+            """)
+            if cur.rowcount:
+                print(f"🧹 Removed {cur.rowcount} duplicate manhwa_meta row(s)")
+            cur.execute("ALTER TABLE manhwa_meta ADD UNIQUE KEY uq_meta_search_title (search_title)")
+
+        # Indexed link to `series` (replaces the LOWER(display) = LOWER(title) join)
+        _add_column_if_missing(cur, "manhwa_meta", "canonical", "canonical VARCHAR(255) NULL AFTER search_title")
+        _add_column_if_missing(cur, "manhwa_meta", "series_id", "series_id BIGINT UNSIGNED NULL AFTER canonical")
+        _add_index_if_missing(cur, "manhwa_meta", "idx_meta_canonical", "KEY idx_meta_canonical (canonical)")
+        _add_index_if_missing(cur, "manhwa_meta", "idx_meta_series_id", "KEY idx_meta_series_id (series_id)")
+
+        # Backfill: canonical needs canonicalize_title(), series_id is then one join
+        cur.execute("SELECT id, search_title FROM manhwa_meta WHERE canonical IS NULL AND search_title IS NOT NULL")
+        missing = [(canonicalize_title(title), meta_id) for meta_id, title in cur.fetchall()]
+        if missing:
+            cur.executemany("UPDATE manhwa_meta SET canonical = %s WHERE id = %s", missing)
+        cur.execute("""
+            UPDATE manhwa_meta AS m
+            JOIN series AS s ON s.canonical = m.canonical
+               SET m.series_id = s.id
+             WHERE m.series_id IS NULL
+        """)
+
+        cur.execute("""
+            SELECT COUNT(*) FROM information_schema.TABLE_CONSTRAINTS
+             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'manhwa_meta' AND CONSTRAINT_NAME = 'fk_meta_series'
+        """)
+        if cur.fetchone()[0] == 0:
+            cur.execute("""
+                ALTER TABLE manhwa_meta
+                  ADD CONSTRAINT fk_meta_series FOREIGN KEY (series_id) REFERENCES series (id) ON DELETE SET NULL
+            """)
+        conn.commit()
+        cur.close()
+
+def load_anilist_ids() -> Dict[str, int]:
+    """Returns: {search_title: anilist_id} for titles already resolved on AniList."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT search_title, anilist_id FROM manhwa_meta WHERE anilist_id IS NOT NULL")
+        ids = {title: int(media_id) for title, media_id in cur.fetchall() if title}
+        cur.close()
+    return ids
+
+def _meta_row(m: dict):
+    """Returns: staging tuple for one anilist_data() row (None if it has no title)."""
+    search_title = (m.get("search") or m.get("display") or "").strip()
+    if not search_title:
+        return None
+    display = (m.get("display") or "")[:255]
+    status = (m.get("status") or "")[:64]
+    chapters_total = m.get("chapters")
+    genres_json = json.dumps(m.get("genres") or [])
+    description = m.get("description") or ""
+    anilist_id = m.get("anilist_id")
+    content_hash = hashlib.sha1(
+        json.dumps([anilist_id, display, status, chapters_total, genres_json, description]).encode("utf-8")
+    ).hexdigest()
+    return (search_title, canonicalize_title(search_title), anilist_id, display, status,
+            chapters_total, genres_json, description, content_hash)
+
 def upsert_manhwa_meta(meta_rows: List[dict]) -> None:
     """
-    Updates or inserts rows in `manhwa_meta` WITHOUT requiring a UNIQUE key.
-    Uses search_title as the natural key via UPDATE-then-INSERT per row.
+    Set-based upsert keyed by UNIQUE(search_title) (see ensure_manhwa_meta_columns):
+    one executemany into a staging table, then one INSERT ... ON DUPLICATE KEY UPDATE
+    that skips rows whose content_hash and series link are unchanged.
+    series_id is resolved by canonical title against `series`.
     """
     if not meta_rows:
         return
-    conn = get_connection()
-    if not conn:
+    staged = {}
+    for m in meta_rows:
+        row = _meta_row(m)
+        if row:
+            staged[row[0].lower()] = row  # last one wins, like the old per-row UPDATE
+    if not staged:
         return
-    cur = conn.cursor()
 
-    for m in meta_rows:
-        search_title = (m.get("search") or m.get("display") or "").strip()
-        if not search_title:
-            continue
-        display = (m.get("display") or "")[:255]
-        status = (m.get("status") or "")[:64]
-        chapters_total = m.get("chapters")
-        genres_json = json.dumps(m.get("genres") or [])
-        description = m.get("description") or ""
+    with connection() as conn:
+        cur = conn.cursor()
 
-        # Try UPDATE first
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS tmp_meta_stage;")
         cur.execute("""
-            UPDATE manhwa_meta
-               SET display = %s,
-                   status = %s,
-                   chapters_total = %s,
-                   genres = CAST(%s AS JSON),
-                   description = %s,
-                   updated_at = CURRENT_TIMESTAMP
-             WHERE search_title = %s
-        """, (display, status, chapters_total, genres_json, description, search_title))
-
-        if cur.rowcount == 0:
-            # No existing row → INSERT
-            cur.execute("""
-                INSERT INTO manhwa_meta
-                    (search_title, display, status, chapters_total, genres, description, updated_at)
-                VALUES (%s,%s,%s,%s,CAST(%s AS JSON),%s, CURRENT_TIMESTAMP)
-            """, (search_title, display, status, chapters_total, genres_json, description))
+            CREATE TEMPORARY TABLE tmp_meta_stage (
+              search_title   VARCHAR(255) NOT NULL,
+              canonical      VARCHAR(255) NOT NULL,
+              anilist_id     INT NULL,
+              display        VARCHAR(255) NULL,
+              status         VARCHAR(64) NULL,
+              chapters_total INT NULL,
+              genres         JSON NULL,
+              description    MEDIUMTEXT NULL,
+              content_hash   CHAR(40) NOT NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """)
+        cur.executemany("""
+            INSERT INTO tmp_meta_stage
+              (search_title, canonical, anilist_id, display, status, chapters_total, genres, description, content_hash)
+            VALUES (%s,%s,%s,%s,%s,%s,CAST(%s AS JSON),%s,%s);
+        """, list(staged.values()))
+
+        cur.execute("""
+            INSERT INTO manhwa_meta
+              (search_title, canonical, series_id, anilist_id, display, status, chapters_total,
+               genres, description, content_hash, updated_at)
+            SELECT
+              t.search_title, t.canonical, s.id, t.anilist_id, t.display, t.status, t.chapters_total,
+              t.genres, t.description, t.content_hash, CURRENT_TIMESTAMP
+            FROM tmp_meta_stage AS t
+            LEFT JOIN series AS s
+              ON s.canonical = t.canonical
+            LEFT JOIN manhwa_meta AS cur_meta
+              ON cur_meta.search_title = t.search_title
+            WHERE cur_meta.id IS NULL
+               OR NOT (cur_meta.content_hash <=> t.content_hash)
+               OR NOT (cur_meta.series_id <=> s.id)
+            ON DUPLICATE KEY UPDATE
+              canonical      = VALUES(canonical),
+              series_id      = VALUES(series_id),
+              anilist_id     = COALESCE(VALUES(anilist_id), manhwa_meta.anilist_id),
+              display        = VALUES(display),
+              status         = VALUES(status),
+              chapters_total = VALUES(chapters_total),
+              genres         = VALUES(genres),
+              description    = VALUES(description),
+              content_hash   = VALUES(content_hash),
+              updated_at     = CURRENT_TIMESTAMP;
+        """)
+
+        conn.commit()
+        cur.close()
+
+# ============== Metrics =====================
+def _cache_counters() -> Dict[str, int]:
+    """Parser memo and AniList response cache totals, folded into the metrics report."""
+    info = extract_title_and_chapter.cache_info()
+    out = {"parse.calls": info.hits + info.misses, "parse.cache_hits": info.hits}
+    out.update({f"http_cache.{name}": n for name, n in cache_stats().items()})
+    return out
 
-    conn.commit()
-    cur.close()
-    conn.close()
+metrics.collector(_cache_counters)
 
 # ================== Main ====================
 if __name__ == "__main__":
@@ -581,71 +1438,117 @@ if __name__ == "__main__":
     if not API_ID or not API_HASH:
         raise SystemExit("Set TG_API_ID and TG_API_HASH in .env")
 
-    # Local scan
-    local = list_titles_with_last_chapter(FOLDER, debug=False)  # {title: [last_local, channel, latest_file_mtime]}
-    titles = list(local.keys())
-
-    # Telegram scan
-    tg = asyncio.run(telegram_latest_all_dialogs(API_ID, API_HASH, titles, recent_scan=600))
-
-    # ===== NEW: persist latest scan results =====
-    upsert_series(local, tg)
-
-    # Optional: fetch AniList info for your local titles and persist to manhwa_meta
-    meta_rows = anilist_data(local)
-    upsert_manhwa_meta(meta_rows)
-
-    # Build rows for console view (unchanged)
-    rows = []
-    for t in sorted(titles, key=str.casefold):
-        last_local, src_local, local_mtime = (local.get(t) or [0.0, None, None])
-        last_tg, src_tg, link, tg_date = tg.get(t, (0.0, None, None, None))
-        status = "UP-TO-DATE" if (last_tg <= (last_local or 0.0)) else "NEW!"
-
-        local_dt = None
-        if local_mtime is not None:
-            local_dt = datetime.fromtimestamp(local_mtime, tz=LOCAL_TZ)
-        tg_dt = tg_date.astimezone(LOCAL_TZ) if tg_date else None
-
-        rows.append((
-            t,
-            fmt_ch(last_local),
-            fmt_ch(last_tg),
-            src_tg or "-",
-            link or "-",
-            status,
-            to_local_iso(local_dt),
-            to_local_iso(tg_dt),
-        ))
-
-    # Fetch currently famous (trending) manhwas from AniList
-    famous = get_currently_famous_manhwas(limit=20)
-
-    # Compare with local
-    have_it, missing = match_famous_with_local(famous, titles)
-
-    # Print (unchanged)
-    print("\n=== Currently Famous Manhwas (AniList • TRENDING) ===")
-    for i, f in enumerate(famous, 1):
-        print(f"{i:>2}. {f['display']}  | score={f['averageScore']}  favs={f['favourites']}  pop={f['popularity']}  -> {f['siteUrl']}")
-        if f.get("description"):
-            print("    └─", snippet(f["description"]))
-
-    print("\n=== You ALREADY HAVE these famous titles locally ===")
-    if not have_it:
-        print("(none)")
-    else:
-        for f in have_it:
-            print(f"- {f['local_title']}  (AniList: {f['display']})")
-
-    print("\n=== You DON'T HAVE these famous titles (consider adding) ===")
-    if not missing:
-        print("(none)")
-    else:
-        for f in missing:
-            print(f"- {f['display']}")
+    # One DB connection for the whole run (see db.session).
+    # METRICS_JSON / METRICS_PROM: per-stage timings and counters are written when the run ends.
+    with metrics.run("mirror"), session():
+        # Local scan
+        with metrics.span("local_scan"):
+            local = list_titles_with_last_chapter(FOLDER, debug=False)  # {title: [last_local, channel, latest_file_mtime]}
+        titles = list(local.keys())
+
+        # Telegram scan (incremental: only messages newer than each dialog's watermark)
+        with metrics.span("telegram_state"):
+            ensure_dialog_watermarks_table()
+            ensure_title_aliases_table()
+            marks = load_dialog_watermarks()
+            profiles = load_dialog_profiles()
+            seed = load_telegram_latest(titles)
+            aliases = load_title_aliases()
+            known_aliases = set(aliases)
+        with metrics.span("telegram_scan"):
+            tg = asyncio.run(telegram_latest_all_dialogs(
+                API_ID, API_HASH, titles, recent_scan=600, watermarks=marks, seed=seed,
+                concurrency=8, requests_per_sec=20, aliases=aliases, profiles=profiles,
+            ))
+
+        # ===== NEW: persist latest scan results =====
+        with metrics.span("upsert_series"):
+            upsert_series(local, tg)
+            save_dialog_watermarks(marks)  # only after the chapters they cover are stored
+            save_dialog_profiles(profiles)
+            save_title_aliases({a: c for a, c in aliases.items() if a not in known_aliases}, source="telegram")
+
+        # Optional: fetch AniList info for your local titles and persist to manhwa_meta
+        with metrics.span("anilist_meta"):
+            ensure_manhwa_meta_columns()
+            meta_rows = anilist_data(local, known_ids=load_anilist_ids())
+        with metrics.span("upsert_meta"):
+            upsert_manhwa_meta(meta_rows)
+
+        # Build rows for console view (unchanged)
+        rows = []
+        for t in sorted(titles, key=str.casefold):
+            last_local, src_local, local_mtime = (local.get(t) or [0.0, None, None])
+            last_tg, src_tg, link, tg_date = tg.get(t, (0.0, None, None, None))
+            status = "UP-TO-DATE" if (last_tg <= (last_local or 0.0)) else "NEW!"
+
+            local_dt = None
+            if local_mtime is not None:
+                local_dt = datetime.fromtimestamp(local_mtime, tz=LOCAL_TZ)
+            tg_dt = tg_date.astimezone(LOCAL_TZ) if tg_date else None
+
+            rows.append((
+                t,
+                fmt_ch(last_local),
+                fmt_ch(last_tg),
+                src_tg or "-",
+                link or "-",
+                status,
+                to_local_iso(local_dt),
+                to_local_iso(tg_dt),
+            ))
+
+        # Fetch currently famous (trending) manhwas from AniList
+        with metrics.span("anilist_trending"):
+            famous = get_currently_famous_manhwas(limit=20)
+
+        # Compare with local
+        have_it, missing = match_famous_with_local(famous, titles)
+
+        # Print (unchanged)
+        print("\n=== Currently Famous Manhwas (AniList • TRENDING) ===")
+        for i, f in enumerate(famous, 1):
+            print(f"{i:>2}. {f['display']}  | score={f['averageScore']}  favs={f['favourites']}  pop={f['popularity']}  -> {f['siteUrl']}")
+            if f.get("description"):
+                print("    └─", snippet(f["description"]))
+
+        print("\n=== You ALREADY HAVE these famous titles locally ===")
+        if not have_it:
+            print("(none)")
+        else:
+            for f in have_it:
+                print(f"- {f['local_title']}  (AniList: {f['display']})")
 
-    # ----- Store trending (not present locally), only once per day -----
-    ensure_trending_table()
-    store_trending_famous(famous)
-    print("\nStored trending manhwas to SQL (excluding locals) with daily refresh guard.")
+        print("\n=== You DON'T HAVE these famous titles (consider adding) ===")
+        if not missing:
+            print("(none)")
+        else:
+            for f in missing:
+                print(f"- {f['display']}")
+
+        # ----- Store trending (not present locally), only once per day -----
+        with metrics.span("store_trending"):
+            ensure_trending_table()
+            store_trending_famous(famous)
+        print("\nStored trending manhwas to SQL (excluding locals) with daily refresh guard.")
+
+        # Optional full-catalog ingestion (ANILIST_CATALOG=RELEASING[,FINISHED])
+        if CATALOG_STATUSES:
+            with metrics.span("catalog_ingest"):
+                n_catalog, partial = ingest_trending_catalog(CATALOG_STATUSES)
+            print(f"Catalog: {n_catalog} AniList titles streamed into trending_manhwa ({', '.join(CATALOG_STATUSES)}).")
+            if partial:
+                print(f"Catalog ingestion was PARTIAL for: {', '.join(partial)} (see errors above).")
+
+        # ----- Embeddings: only rows whose prepared text changed are re-encoded -----
+        with metrics.span("embeddings"):
+            from manhwa_rec import Recommender  # heavy (pandas); only needed here
+            ensure_embeddings_table()
+            rec = Recommender()
+            n_embedded = sync_embeddings(rec.cache_name, rec.entity_texts(), rec.encode, rec.entity_types)
+        print(f"Embeddings: {n_embedded} text(s) re-encoded, {len(rec.entity_texts())} stored.")
+
+        wait_for_revalidation()
+        st = cache_stats()
+        print(f"AniList cache: hit={st['hit']} stale={st['stale']} miss={st['miss']} "
+              f"revalidated={st['revalidated']} errors={st['error']}")
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from manhwa_rec import Recommender
+
+# ================== Config ==================
+HOST = os.getenv("REC_SERVICE_HOST", "127.0.0.1")
+PORT = int(os.getenv("REC_SERVICE_PORT", "8765"))
+REFRESH_SEC = float(os.getenv("REC_SERVICE_REFRESH_SEC", "30"))
+MAX_K = 100
+
+# One warm Recommender; pandas state is not thread-safe, so queries and refreshes take turns.
+rec = Recommender()
+rec_lock = threading.Lock()
+
+# ============== Handlers ====================
+def _records(df):
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+def _k(qs) -> int:
+    try:
+        return max(1, min(MAX_K, int((qs.get("k") or ["0"])[0]) or rec.top_k))
+    except ValueError:
+        return rec.top_k
+
+class RecHandler(BaseHTTPRequestHandler):
+    """
+    GET /recommend?series_id=12&k=5   per-title recommendations
+    GET /pooled?k=30                  best across the whole library
+    GET /search?q=<description>&k=10  "more like this description"
+    GET /health
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        qs = parse_qs(url.query)
+        started = time.perf_counter()
+        try:
+            if url.path == "/recommend":
+                series_id = int((qs.get("series_id") or [""])[0])
+                with rec_lock:
+                    body = _records(rec.recommend_for(series_id, _k(qs)))
+            elif url.path == "/pooled":
+                with rec_lock:
+                    body = _records(rec.pooled(_k(qs)).head(_k(qs)))
+            elif url.path == "/search":
+                q = (qs.get("q") or [""])[0].strip()
+                if not q:
+                    return self._send(400, {"error": "missing q"})
+                with rec_lock:
+                    body = _records(rec.similar_to_text(q, _k(qs)))
+            elif url.path == "/health":
+                body = {"ok": True}
+            else:
+                return self._send(404, {"error": "not found"})
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        except Exception as e:
+            return self._send(500, {"error": str(e)})
+
+        self._send(200, {"results": body, "ms": round((time.perf_counter() - started) * 1000, 2)})
+
+    def _send(self, status: int, payload: dict):
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, fmt, *args):
+        pass  # keep the console for refresh messages
+
+# ============== Refresh =====================
+def _refresh_loop():
+    while True:
+        time.sleep(REFRESH_SEC)
+        try:
+            with rec_lock:
+                if rec.refresh():
+                    rec.pooled()  # re-score now rather than on the next query
+                    print("↻ recommender state refreshed")
+        except Exception as e:
+            print("⚠️ refresh failed:", e)
+
+def serve(host: str = HOST, port: int = PORT) -> None:
+    # Warm everything up front so the first query is as fast as the rest
+    with rec_lock:
+        rec.pooled()
+        rec.encode(["warm-up"])  # model loaded before the first /search
+    threading.Thread(target=_refresh_loop, name="rec-refresh", daemon=True).start()
+    server = ThreadingHTTPServer((host, port), RecHandler)
+    print(f"🚀 Recommendation service on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+# ================== Main ====================
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Warm recommendation service.")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    args = ap.parse_args()
+    serve(args.host, args.port)
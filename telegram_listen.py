@@ -0,0 +1,270 @@
+import os
+import time
+import asyncio
+import argparse
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from telethon import TelegramClient, events
+
+from db import connection
+from mirror_mysql import (
+    canonicalize_title, _build_msg_link, _match_message,
+    telegram_latest_all_dialogs, tracked_dialogs,
+    ensure_dialog_watermarks_table, load_dialog_watermarks, save_dialog_watermarks,
+    ensure_title_aliases_table, load_title_aliases, save_title_aliases, load_telegram_latest, upsert_series,
+)
+from title_match import TitleMatcher, TitleResolver
+
+# ================== Config ==================
+SESSION = "manhwa_listen"   # own session file, so the nightly mirror_mysql.py run can use "manhwa_session" meanwhile
+DEBOUNCE_SEC = 2.0          # flush once no new chapter arrived for this long...
+MAX_DELAY_SEC = 10.0        # ...or once the oldest pending bump is this old
+TICK_SEC = 1.0
+SWEEP_SEC = 1800.0          # safety catch-up even without a detected disconnect
+CATCH_UP_SCAN = 3000        # messages read from a dialog that has no watermark yet (others: down to the mark)
+RECONNECT_DELAY_SEC = 5.0
+
+Hit = Tuple[float, Optional[str], Optional[str], Optional[object]]  # (chapter, dialog_name, link, date_utc)
+
+# ============== Batching ====================
+class _Bumps:
+    """
+    Coalesces chapter bumps into one pending {title: hit} per flush, plus the
+    watermarks a catch-up advanced. Only chapters above what `series` already
+    holds are queued; a dialog's watermark is saved with (never before) its bumps.
+
+    Live messages never move a watermark: one that arrives right after a reconnect
+    would otherwise put the mark past messages posted while disconnected, which the
+    catch-up (and every later scan) would then skip. Marks move only once a catch-up
+    has read everything down to them.
+    """
+
+    def __init__(self, known: Dict[str, Hit], marks: Dict[int, tuple]):
+        self.known = known
+        self.marks = marks
+        self.pending: Dict[str, Hit] = {}
+        self.pending_marks: Dict[int, tuple] = {}
+        self.first_at: Optional[float] = None
+        self.last_at: Optional[float] = None
+
+    def add(self, title: str, hit: Hit) -> None:
+        best = self.pending.get(title) or self.known.get(title)
+        if best is None or hit[0] > best[0]:
+            self.pending[title] = hit
+            self._touch()
+
+    def add_scan(self, tg: Dict[str, Hit]) -> None:
+        for title, hit in tg.items():
+            if hit[0]:
+                self.add(title, hit)
+
+    def advance(self, marks: Dict[int, tuple]) -> None:
+        """Moves watermarks forward to what a completed catch-up read."""
+        for dialog_id, mark in marks.items():
+            if mark[0] > (self.marks.get(dialog_id) or (0, None))[0]:
+                self.marks[dialog_id] = self.pending_marks[dialog_id] = mark
+                self._touch()
+
+    def _touch(self) -> None:
+        now = time.monotonic()
+        self.first_at = self.first_at or now
+        self.last_at = now
+
+    def due(self) -> bool:
+        if not self.pending and not self.pending_marks:
+            return False
+        now = time.monotonic()
+        return (now - self.last_at) >= DEBOUNCE_SEC or (now - self.first_at) >= MAX_DELAY_SEC
+
+    def take(self) -> Tuple[Dict[str, Hit], Dict[int, tuple]]:
+        batch, marks = self.pending, self.pending_marks
+        self.pending, self.pending_marks = {}, {}
+        self.first_at = self.last_at = None
+        return batch, marks
+
+    def restore(self, batch: Dict[str, Hit], marks: Dict[int, tuple]) -> None:
+        for title, hit in batch.items():
+            self.add(title, hit)
+        for dialog_id, mark in marks.items():
+            if dialog_id not in self.pending_marks:
+                self.pending_marks[dialog_id] = mark
+        self._touch()
+
+def _store(batch: Dict[str, Hit], marks: Dict[int, tuple]) -> None:
+    # A [0, None, None] local entry leaves local_latest_chapter/channel as they are (GREATEST/COALESCE)
+    upsert_series({t: [0.0, None, None] for t in batch}, batch)
+    save_dialog_watermarks(marks)
+
+def _load_tracked() -> Dict[str, float]:
+    """Returns: {title: local_latest_chapter} for every row of `series`."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT title, local_latest_chapter FROM series")
+        tracked = {title: float(local or 0.0) for title, local in cur.fetchall()}
+        cur.close()
+    return tracked
+
+# ============== Listener ====================
+class _Listener:
+    """One connected client: NewMessage events plus watermark catch-ups, both feeding `bumps`."""
+
+    def __init__(self, client: TelegramClient, bumps: _Bumps, sweep_sec: float):
+        self.client = client
+        self.bumps = bumps
+        self.sweep_sec = sweep_sec
+        self.dialogs: Dict[int, object] = {}
+        self.local: Dict[str, float] = {}
+        self.aliases: Dict[str, str] = {}
+        self.learned: Dict[str, str] = {}  # {alias_canonical: series_canonical} not saved yet
+        self.targets: Optional[TitleResolver] = None
+        self.matcher: Optional[TitleMatcher] = None
+        self.resync = asyncio.Event()
+
+    async def reload(self) -> None:
+        """Picks up titles and aliases added to the DB since the last load."""
+        local, aliases = await asyncio.gather(asyncio.to_thread(_load_tracked),
+                                              asyncio.to_thread(load_title_aliases))
+        if local.keys() == self.local.keys() and aliases == self.aliases and self.targets:
+            self.local = local
+            return
+        new = [t for t in local if t not in self.bumps.known]
+        if new:
+            self.bumps.known.update(await asyncio.to_thread(load_telegram_latest, new))
+        canon_targets = {canonicalize_title(t): t for t in local}
+        alias_targets = {a: canon_targets[c] for a, c in aliases.items() if c in canon_targets}
+        self.local, self.aliases = local, aliases
+        if self.targets is not None:
+            # Variants the old resolver learned are not saved yet: keep them for _save_learned
+            self.learned.update({a: canonicalize_title(t) for a, t in self.targets.learned.items()})
+        self.targets = TitleResolver(canon_targets, alias_targets)
+        self.matcher = TitleMatcher(canon_targets)
+
+    async def on_message(self, event) -> None:
+        d = self.dialogs.get(event.chat_id)
+        if d is None:
+            return
+        msg = event.message
+        for title, chno in _match_message(msg, self.targets, self.matcher):
+            self.bumps.add(title, (chno, (d.name or "").strip(), _build_msg_link(d.entity, msg), msg.date))
+
+    async def catch_up(self) -> None:
+        """Reads every dialog from its watermark to now (the usual incremental scan, on this client)."""
+        await self.reload()
+        titles = list(self.local)
+        seed = {t: self.bumps.known.get(t, (0.0, None, None, None)) for t in titles}
+        marks, aliases = dict(self.bumps.marks), dict(self.aliases)
+        # Empty profiles: every dialog is due and read all the way down to its mark (plan_scan)
+        tg = await telegram_latest_all_dialogs(
+            0, "", titles, recent_scan=CATCH_UP_SCAN, watermarks=marks, seed=seed,
+            aliases=aliases, profiles={}, client=self.client,
+        )
+        self.bumps.add_scan(tg)
+        self.bumps.advance(marks)
+        self.learned.update({a: c for a, c in aliases.items() if a not in self.aliases})
+        self.dialogs = {d.id: d for d in await tracked_dialogs(self.client)}
+
+    async def flush(self) -> None:
+        batch, marks = self.bumps.take()
+        if not batch and not marks:
+            return
+        try:
+            await asyncio.to_thread(_store, batch, marks)
+        except Exception as e:
+            print(f"⚠️ Store failed ({e}); retrying with the next flush")
+            self.bumps.restore(batch, marks)
+            return
+        self.bumps.known.update(batch)
+        await self._save_learned()
+        for title, (chno, src, link, _) in sorted(batch.items(), key=lambda kv: kv[0].casefold()):
+            tag = "NEW! " if chno > self.local.get(title, 0.0) else ""
+            print(f"📣 {tag}{title} ch {chno:g} ({src}) {link or ''}".rstrip())
+
+    async def _save_learned(self) -> None:
+        """Stores spelling variants resolved by live messages or catch-ups, as mirror_mysql.py does."""
+        self.learned.update({a: canonicalize_title(t) for a, t in self.targets.learned.items()})
+        new = {a: c for a, c in self.learned.items() if a not in self.aliases}
+        self.learned.clear()
+        if not new:
+            return
+        try:
+            await asyncio.to_thread(save_title_aliases, new, "telegram")
+        except Exception as e:
+            print(f"⚠️ Alias save failed ({e})")
+            self.learned.update(new)
+            return
+        self.aliases.update(new)
+
+    async def flush_loop(self) -> None:
+        connected = True
+        while True:
+            await asyncio.sleep(TICK_SEC)
+            now_connected = self.client.is_connected()
+            if now_connected and not connected:
+                self.resync.set()  # Telethon reconnected on its own: read the gap
+            connected = now_connected
+            if self.bumps.due():
+                await self.flush()
+
+    async def sweep_loop(self) -> None:
+        while True:
+            try:
+                await self.catch_up()
+            except Exception as e:
+                print(f"⚠️ Catch-up failed ({e}); live messages are still recorded")
+            await self.flush()
+            try:
+                await asyncio.wait_for(self.resync.wait(), timeout=self.sweep_sec)
+            except asyncio.TimeoutError:
+                pass
+            self.resync.clear()
+
+    async def run(self) -> None:
+        await self.reload()
+        self.dialogs = {d.id: d for d in await tracked_dialogs(self.client)}
+        # Subscribe before catching up, so nothing posted during the catch-up falls in between.
+        # No chats= filter: on_message checks self.dialogs, which each catch-up refreshes.
+        self.client.add_event_handler(self.on_message, events.NewMessage())
+        print(f"👂 Listening to {len(self.dialogs)} dialogs for {len(self.local)} titles")
+        tasks = [asyncio.create_task(self.flush_loop()), asyncio.create_task(self.sweep_loop())]
+        try:
+            await self.client.run_until_disconnected()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.client.remove_event_handler(self.on_message)
+            await self.flush()
+
+async def listen(api_id: int, api_hash: str, sweep_sec: float = SWEEP_SEC) -> None:
+    """
+    Streams chapter bumps from every tracked dialog into `series` as they are posted.
+    Each (re)connect first reads the gap since the stored watermarks, so a listener
+    that was down or disconnected misses nothing.
+    """
+    ensure_dialog_watermarks_table()
+    ensure_title_aliases_table()
+    bumps = _Bumps({}, load_dialog_watermarks())
+    while True:
+        try:
+            async with TelegramClient(SESSION, api_id, api_hash) as client:
+                await _Listener(client, bumps, sweep_sec).run()
+        except (ConnectionError, OSError) as e:
+            print(f"⚠️ Disconnected ({e})")
+        print(f"🔌 Reconnecting in {RECONNECT_DELAY_SEC:g}s")
+        await asyncio.sleep(RECONNECT_DELAY_SEC)
+
+# ================== Main ====================
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Stream new Telegram chapters into `series`.")
+    ap.add_argument("--sweep", type=float, default=SWEEP_SEC, help="seconds between safety catch-ups")
+    args = ap.parse_args()
+
+    load_dotenv()
+    API_ID = int(os.getenv("TG_API_ID", "0"))
+    API_HASH = os.getenv("TG_API_HASH", "")
+    if not API_ID or not API_HASH:
+        raise SystemExit("Set TG_API_ID and TG_API_HASH in .env")
+    try:
+        asyncio.run(listen(API_ID, API_HASH, args.sweep))
+    except KeyboardInterrupt:
+        pass
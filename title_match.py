@@ -0,0 +1,295 @@
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# ================== Config ==================
+MIN_TITLE_CHARS = 4   # shorter titles ("Ore", "S") would match ordinary words in any caption
+CHAPTER_WINDOW = 4    # tokens searched on each side of a title for its chapter number
+CHAPTER_WORDS = {"ch", "chap", "chapter", "ep"}  # same keywords as EXPL_CH
+# Caption words that are never part of a title: "🔥 NEW: <title> is out!" still counts as <title>
+CAPTION_FILLER = {"new", "is", "out", "now", "just", "dropped", "released", "update", "updated",
+                  "raw", "raws", "eng", "here", "enjoy", "also", "and", "read", "free", "latest"}
+
+# Words and numbers after casefold. "-", "_", ":" and emoji separate tokens, so
+# "Solo_Leveling - Ch.45 🔥" -> ["solo", "leveling", "ch", "45"]
+TOKEN = re.compile(r"\d+(?:\.\d+)?|[^\W\d_]+")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.casefold())
+
+def _is_num(tok: str) -> bool:
+    return tok[0].isdigit()
+
+# ============== Matcher =====================
+class TitleMatcher:
+    """
+    Aho-Corasick automaton over the tokens of every tracked title.
+    find() reads a caption in one pass over its tokens, whatever the number of
+    titles, and returns each title found anywhere in it with the chapter next to it.
+    """
+
+    def __init__(self, titles: Dict[str, str]):
+        """titles = {canonical_title: value returned on a match}"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]  # per node: (title length in tokens, value)
+
+        for canon, value in titles.items():
+            toks = tokenize(canon)
+            if len(" ".join(toks)) < MIN_TITLE_CHARS:
+                continue
+            node = 0
+            for tok in toks:
+                nxt = self._goto[node].get(tok)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][tok] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((len(toks), value))
+
+        # Failure links, breadth-first; each node also inherits the titles ending at its suffix
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for tok, child in self._goto[node].items():
+                f = self._fail[node]
+                while f and tok not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(tok, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+
+    def __len__(self) -> int:
+        return sum(1 for out in self._out if out)
+
+    def spans(self, tokens: List[str]) -> List[Tuple[int, int, str]]:
+        """Returns: [(start, end, value)] token spans, leftmost-longest and non-overlapping."""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = []
+        node = 0
+        for i, tok in enumerate(tokens):
+            while node and tok not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(tok, 0)
+            for n, value in out[node]:
+                hits.append((i + 1 - n, i + 1, value))
+
+        hits.sort(key=lambda h: (h[0], h[0] - h[1]))
+        kept, end = [], 0
+        for hit in hits:
+            if hit[0] >= end:
+                kept.append(hit)
+                end = hit[1]
+        return kept
+
+    def covers(self, title: str) -> bool:
+        """
+        True when tracked titles account for every word of `title` (a parsed title) apart
+        from CAPTION_FILLER. "Solo Leveling: Ragnarok" is not covered by "Solo Leveling":
+        it is a different (sequel / side-story) title that merely contains a tracked one.
+        """
+        tokens = tokenize(title)
+        covered = [False] * len(tokens)
+        for start, end, _ in self.spans(tokens):
+            covered[start:end] = [True] * (end - start)
+        return all(c or tok in CAPTION_FILLER or tok in CHAPTER_WORDS for c, tok in zip(covered, tokens))
+
+    def find(self, text: str, bare_numbers: bool = False) -> List[Tuple[str, float]]:
+        """
+        Returns: [(value, chapter)] for every title in `text` that has a chapter number near it.
+        A bare number right after a title ("<title> 45") only counts with bare_numbers=True:
+        in a free caption it is as often a year, a season or a count ("Eleceed 2024 recap",
+        "Tower of God 600+ chapters!"), so pass it only when the caption is known to carry a chapter.
+        """
+        tokens = tokenize(text)
+        spans = self.spans(tokens)
+        found = []
+        for i, (start, end, value) in enumerate(spans):
+            lo = spans[i - 1][1] if i else 0
+            hi = spans[i + 1][0] if i + 1 < len(spans) else len(tokens)
+            chapter = _chapter_near(tokens, start, end, lo, hi, bare_numbers)
+            if chapter is not None:
+                found.append((value, chapter))
+        return found
+
+def _chapter_near(tokens: List[str], start: int, end: int, lo: int, hi: int,
+                  bare_numbers: bool = False) -> Optional[float]:
+    """
+    Chapter for the title at tokens[start:end], never reading into a neighbouring
+    title (tokens outside [lo, hi)). Tried in order:
+      "<title> ... ch 45", "<title> 45" (bare_numbers only), "ch 45 ... <title>",
+      "[45] <title>" (caption start)
+    """
+    stop = min(hi, end + CHAPTER_WINDOW)
+    for j in range(end, stop - 1):
+        if tokens[j] in CHAPTER_WORDS and _is_num(tokens[j + 1]):
+            return float(tokens[j + 1])
+    if bare_numbers and end < hi and _is_num(tokens[end]):
+        return float(tokens[end])
+    for j in range(max(lo, start - CHAPTER_WINDOW), start - 1):
+        if tokens[j] in CHAPTER_WORDS and _is_num(tokens[j + 1]):
+            return float(tokens[j + 1])
+    if start == 1 and lo == 0 and _is_num(tokens[0]):
+        return float(tokens[0])
+    return None
+
+# ============== Fuzzy resolution ============
+NGRAM = 3
+MEMO_SIZE = 65536
+_AMBIGUOUS = object()
+
+def title_key(canon: str) -> str:
+    """Tokens joined by one space: punctuation, "-", "_" and case no longer matter."""
+    return " ".join(tokenize(canon))
+
+def _token_set_key(key: str) -> str:
+    return " ".join(sorted(set(key.split())))
+
+def _numbers(key: str) -> Tuple[str, ...]:
+    # "Hunter 2" and "Hunter 3" are different series, however close the strings are
+    return tuple(tok for tok in key.split() if _is_num(tok))
+
+def _max_edits(n: int) -> int:
+    # Short keys get no edits: "hunted" / "hunter", "the boxed" / "the boxer" are different series
+    return 0 if n < 10 else 1 if n <= 16 else 2 if n <= 28 else 3
+
+def _tokens_agree(a: str, b: str) -> bool:
+    """Same words in the same order, each at most one typo away (words under 3 chars exact)."""
+    ta, tb = a.split(), b.split()
+    if len(ta) != len(tb):
+        return False
+    for x, y in zip(ta, tb):
+        if x == y:
+            continue
+        if _is_num(x) or _is_num(y) or min(len(x), len(y)) < 3 or bounded_edit_distance(x, y, 1) > 1:
+            return False
+    return True
+
+def ngrams(key: str) -> set:
+    padded = f" {key} "
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+def bounded_edit_distance(a: str, b: str, k: int) -> int:
+    """Levenshtein distance when it is <= k, else k + 1 (stops as soon as a whole row is past k)."""
+    if abs(len(a) - len(b)) > k:
+        return k + 1
+    if a == b:
+        return 0
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > k:
+            return k + 1
+        prev = cur
+    return min(prev[-1], k + 1)
+
+def _put(index: dict, key: str, value) -> None:
+    old = index.get(key)
+    index[key] = value if old is None or old == value else _AMBIGUOUS
+
+class TitleResolver:
+    """
+    Resolves spelling variants of tracked titles without comparing against every title:
+      1. exact: same tokens (see title_key) or a known alias
+      2. token set: the same words in another order
+      3. fuzzy: candidates sharing enough character trigrams with the query (inverted index,
+         probed through its rarest grams only), verified by edit distance: none under
+         10 characters, then at most 1 / 2 / 3 edits, and word by word (one typo per word,
+         one- and two-letter words and numbers exact)
+    A variant that is equally close to two different values resolves to None.
+    Canonicals resolved by steps 1-2 that are not themselves a title or alias are collected
+    in `learned` ({canonical: value}), so callers can persist them as aliases. Fuzzy matches
+    are used but never learned: a typo-level match is not strong enough to store for good.
+    """
+
+    def __init__(self, titles: Dict[str, str], aliases: Optional[Dict[str, str]] = None):
+        """titles / aliases = {canonical_title: value}"""
+        self._exact: Dict[str, object] = {}
+        self._token_sets: Dict[str, object] = {}
+        self._keys: List[str] = []
+        self._values: List[str] = []
+        self._grams: List[set] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._memo: Dict[str, Tuple[Optional[str], bool]] = {}
+        self._known = set(aliases or ())
+        self.learned: Dict[str, str] = {}
+        for canon, value in titles.items():
+            self.add(canon, value)
+        for canon, value in (aliases or {}).items():
+            key = title_key(canon)
+            if key and key not in self._exact:
+                self._exact[key] = value
+
+    def add(self, canon: str, value: str) -> None:
+        key = title_key(canon)
+        if not key:
+            return
+        self._known.add(canon)
+        _put(self._exact, key, value)
+        _put(self._token_sets, _token_set_key(key), value)
+        row = len(self._keys)
+        grams = ngrams(key)
+        self._keys.append(key)
+        self._values.append(value)
+        self._grams.append(grams)
+        for g in grams:
+            self._postings.setdefault(g, []).append(row)
+        self._memo.clear()
+
+    def resolve(self, canon: str) -> Optional[str]:
+        key = title_key(canon)
+        if not key:
+            return None
+        if key in self._memo:
+            value, fuzzy = self._memo[key]
+        else:
+            value, fuzzy = self._lookup(key)
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[key] = (value, fuzzy)
+        if value is not None and not fuzzy and canon not in self._known:
+            self.learned[canon] = value
+        return value
+
+    def _lookup(self, key: str) -> Tuple[Optional[str], bool]:
+        """Returns: (value, found by the fuzzy step)"""
+        value = self._exact.get(key)
+        if value is None:
+            value = self._token_sets.get(_token_set_key(key))
+        if value is not None:
+            return (None if value is _AMBIGUOUS else value), False
+        value = self._fuzzy(key)
+        return (None if value is _AMBIGUOUS else value), True
+
+    def _fuzzy(self, key: str) -> Optional[str]:
+        k = _max_edits(len(key))
+        grams = ngrams(key)
+        need = len(grams) - NGRAM * k  # one edit changes at most NGRAM of the query's grams
+        if k == 0 or need <= 0:
+            return None
+
+        # Any string sharing `need` grams shares one of the (len - need + 1) rarest
+        rarest = sorted(grams, key=lambda g: len(self._postings.get(g, ())))[:len(grams) - need + 1]
+        candidates = set()
+        for g in rarest:
+            candidates.update(self._postings.get(g, ()))
+
+        numbers = _numbers(key)
+        best, best_d = None, k + 1
+        for row in candidates:
+            other = self._keys[row]
+            if abs(len(other) - len(key)) > k or len(grams & self._grams[row]) < need:
+                continue
+            if _numbers(other) != numbers or not _tokens_agree(key, other):
+                continue
+            d = bounded_edit_distance(key, other, k)
+            if d < best_d:
+                best, best_d = self._values[row], d
+            elif d == best_d and d <= k and self._values[row] != best:
+                best = _AMBIGUOUS
+        return best if best_d <= k else None
@@ -0,0 +1,344 @@
+import os
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# ================== Config ==================
+INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", ".vector_index")
+BLOCK_SIZE = 4096  # candidates scored per block; memory is L x (BLOCK_SIZE + k) instead of L x N
+
+# ============== Exact top-K =================
+def blocked_topk(lib_emb, cand_emb, k, exclude_mask=None, row_scale=None, block=BLOCK_SIZE):
+    """
+    Streams candidate blocks and keeps a running top-k per library row.
+    Scores are row_scale * (lib_emb @ cand_emb.T) with excluded columns set to -1e9
+    (they never get recommended), exactly as the full matrix would give.
+    Returns: (idx, sims), both L x min(k, N), best first.
+    """
+    n_lib, n_cand = lib_emb.shape[0], cand_emb.shape[0]
+    k = min(k, n_cand)
+    best_idx = np.empty((n_lib, 0), dtype=np.int64)
+    best_sim = np.empty((n_lib, 0))
+    if k <= 0:
+        return best_idx, best_sim
+
+    for start in range(0, n_cand, block):
+        sims = lib_emb @ cand_emb[start:start + block].T  # Dot Product == cosine on normalized embeddings
+        if exclude_mask is not None:
+            sims[:, exclude_mask[start:start + block]] = -1e9
+        if row_scale is not None:
+            sims = row_scale * sims
+
+        cols = np.broadcast_to(np.arange(start, start + sims.shape[1]), sims.shape)
+        sims = np.concatenate([best_sim, sims], axis=1)
+        cols = np.concatenate([best_idx, cols], axis=1)
+        if sims.shape[1] > k:
+            keep = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            sims = np.take_along_axis(sims, keep, axis=1)
+            cols = np.take_along_axis(cols, keep, axis=1)
+        best_sim, best_idx = sims, cols
+
+    order = np.argsort(-best_sim, axis=1, kind="stable")
+    return np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_sim, order, axis=1)
+
+def recall_at_k(approx_ids: np.ndarray, exact_ids: np.ndarray) -> float:
+    """Mean fraction of each row's exact top-k (ids >= 0) that the approximate search also returned."""
+    hits, total = 0, 0
+    for a, e in zip(approx_ids, exact_ids):
+        e = set(int(x) for x in e if x >= 0)
+        total += len(e)
+        hits += len(e.intersection(int(x) for x in a if x >= 0))
+    return hits / total if total else 1.0
+
+# ============== Indexes =====================
+class ExactIndex:
+    """
+    Brute-force inner-product index over (id, vector) rows; the reference for the others.
+    search() returns (ids, sims) padded with id -1 / sim -inf when fewer than k rows qualify.
+    """
+    kind = "exact"
+
+    def __init__(self, dim: int):
+        self.dim = int(dim)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vecs = np.empty((0, self.dim), dtype=np.float32)
+        self.hashes: Dict[int, str] = {}
+
+    def __len__(self):
+        return int(self.ids.size)
+
+    # ----- mutation -----
+    def add(self, ids: Iterable[int], vecs: np.ndarray, hashes: Optional[List[str]] = None) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        self.remove(ids)
+        self._append(ids, vecs, hashes)
+
+    def _append(self, ids: np.ndarray, vecs: np.ndarray, hashes: Optional[List[str]]) -> None:
+        self.ids = np.concatenate([self.ids, ids])
+        self.vecs = np.concatenate([self.vecs, np.asarray(vecs, dtype=np.float32).reshape(-1, self.dim)])
+        for i, h in zip(ids.tolist(), hashes or [None] * len(ids)):
+            self.hashes[i] = h
+
+    def remove(self, ids: Iterable[int]) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not ids.size or not self.ids.size:
+            return
+        keep = ~np.isin(self.ids, ids)
+        self.ids, self.vecs = self.ids[keep], self.vecs[keep]
+        for i in ids.tolist():
+            self.hashes.pop(i, None)
+
+    def sync(self, ids: Iterable[int], hashes: List[str], vecs: np.ndarray) -> Tuple[int, int]:
+        """
+        Makes the index hold exactly `ids`: rows whose id is new or whose text hash
+        changed are (re-)added, ids that disappeared are removed.
+        Returns: (added, removed)
+        """
+        ids = [int(i) for i in ids]
+        wanted = set(ids)
+        gone = [i for i in self.hashes if i not in wanted]
+        changed = [p for p, (i, h) in enumerate(zip(ids, hashes)) if self.hashes.get(i, "") != h]
+        self.remove(gone)
+        if changed:
+            self.add([ids[p] for p in changed], np.asarray(vecs)[changed], [hashes[p] for p in changed])
+        return len(changed), len(gone)
+
+    # ----- query -----
+    def search(self, queries: np.ndarray, k: int, exclude: Optional[Iterable[int]] = None):
+        mask = np.isin(self.ids, list(exclude)) if exclude else None
+        pos, sims = blocked_topk(queries, self.vecs, k, exclude_mask=mask)
+        return self._finish(pos, sims, k)
+
+    def _finish(self, pos: np.ndarray, sims: np.ndarray, k: int):
+        ids = np.full((pos.shape[0], k), -1, dtype=np.int64)
+        out = np.full((pos.shape[0], k), -np.inf)
+        valid = sims > -1e8  # excluded rows carry -1e9
+        ids[:, :pos.shape[1]] = np.where(valid, self.ids[pos] if pos.size else pos, -1)
+        out[:, :pos.shape[1]] = np.where(valid, sims, -np.inf)
+        return ids, out
+
+    # ----- persistence -----
+    def _meta(self) -> dict:
+        return {"kind": self.kind, "dim": self.dim, "hashes": {str(i): h for i, h in self.hashes.items()}}
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path + ".tmp.npz", ids=self.ids, vecs=self.vecs, **self._arrays())
+        with open(path + ".tmp.json", "w", encoding="utf-8") as f:
+            json.dump(self._meta(), f)
+        os.replace(path + ".tmp.npz", path + ".npz")
+        os.replace(path + ".tmp.json", path + ".json")
+
+    def _arrays(self) -> dict:
+        return {}
+
+    def _restore(self, meta: dict, arrays) -> None:
+        self.ids = arrays["ids"].astype(np.int64)
+        self.vecs = arrays["vecs"].astype(np.float32)
+        self.hashes = {int(i): h for i, h in (meta.get("hashes") or {}).items()}
+
+class IVFIndex(ExactIndex):
+    """
+    Inverted-file index: k-means coarse centroids, each query scores only the rows
+    of its `nprobe` closest lists. Retrains itself when the data grows 4x.
+    """
+    kind = "ivf"
+    MIN_ROWS = 256  # below this, lists are pointless: search exactly
+
+    def __init__(self, dim: int, nlist: Optional[int] = None, nprobe: int = 8):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self.assign = np.empty(0, dtype=np.int64)
+        self.trained_on = 0
+
+    def train(self, niter: int = 10, seed: int = 0) -> None:
+        n = len(self)
+        if n < self.MIN_ROWS:
+            self.centroids, self.assign, self.trained_on = None, np.empty(0, dtype=np.int64), 0
+            return
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        cent = self.vecs[rng.choice(n, size=nlist, replace=False)].copy()
+        for _ in range(niter):
+            assign = np.argmax(self.vecs @ cent.T, axis=1)
+            for c in range(nlist):
+                members = self.vecs[assign == c]
+                if len(members):
+                    v = members.mean(axis=0)
+                    cent[c] = v / (np.linalg.norm(v) or 1.0)
+        self.centroids = cent
+        self.assign = np.argmax(self.vecs @ cent.T, axis=1).astype(np.int64)
+        self.trained_on = n
+
+    def add(self, ids, vecs, hashes=None) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        self.remove(ids)
+        before = len(self)
+        self._append(ids, vecs, hashes)
+        if self.centroids is None or len(self) > 4 * max(self.trained_on, 1):
+            self.train()
+        else:
+            new = self.vecs[before:]
+            self.assign = np.concatenate([self.assign, np.argmax(new @ self.centroids.T, axis=1)])
+
+    def remove(self, ids) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if ids.size and self.ids.size and self.centroids is not None:
+            self.assign = self.assign[~np.isin(self.ids, ids)]
+        super().remove(ids)
+
+    def search(self, queries, k, exclude=None):
+        if self.centroids is None:
+            return super().search(queries, k, exclude)
+        excluded = np.isin(self.ids, list(exclude)) if exclude else np.zeros(len(self), dtype=bool)
+        order = np.argsort(self.assign, kind="stable")
+        bounds = np.searchsorted(self.assign[order], np.arange(len(self.centroids) + 1))
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        out = np.full((len(queries), k), -np.inf)
+        for qi, q in enumerate(queries):
+            rows = np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probes[qi]])
+            rows = rows[~excluded[rows]]
+            if not rows.size:
+                continue
+            sims = self.vecs[rows] @ q
+            top = np.argsort(-sims, kind="stable")[:k]
+            ids[qi, :len(top)] = self.ids[rows[top]]
+            out[qi, :len(top)] = sims[top]
+        return ids, out
+
+    def _meta(self):
+        return {**super()._meta(), "nlist": self.nlist, "nprobe": self.nprobe, "trained_on": self.trained_on}
+
+    def _arrays(self):
+        if self.centroids is None:
+            return {}
+        return {"centroids": self.centroids, "assign": self.assign}
+
+    def _restore(self, meta, arrays):
+        super()._restore(meta, arrays)
+        self.nlist, self.nprobe = meta.get("nlist"), meta.get("nprobe", self.nprobe)
+        self.trained_on = meta.get("trained_on", 0)
+        if "centroids" in arrays:
+            self.centroids = arrays["centroids"].astype(np.float32)
+            self.assign = arrays["assign"].astype(np.int64)
+
+class HNSWIndex(ExactIndex):
+    """
+    Graph index backed by the optional `hnswlib` package (pip install hnswlib).
+    Removed ids are marked deleted; re-adding an id updates its node in place, and
+    the graph is rebuilt once deleted nodes outnumber live ones.
+    """
+    kind = "hnsw"
+
+    def __init__(self, dim: int, M: int = 16, ef_construction: int = 200, ef: int = 64):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("HNSW mode needs the 'hnswlib' package (pip install hnswlib)") from e
+        super().__init__(dim)
+        self.M, self.ef_construction, self.ef = M, ef_construction, ef
+        self._hnswlib = hnswlib
+        self._graph = self._new_graph(1024)
+
+    def _new_graph(self, capacity: int):
+        g = self._hnswlib.Index(space="ip", dim=self.dim)
+        g.init_index(max_elements=capacity, M=self.M, ef_construction=self.ef_construction)
+        return g
+
+    def _rebuild(self) -> None:
+        self._graph = self._new_graph(max(1024, 2 * len(self)))
+        if len(self):
+            self._graph.add_items(self.vecs, self.ids)
+
+    def add(self, ids, vecs, hashes=None) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        vecs = np.asarray(vecs, dtype=np.float32).reshape(-1, self.dim)
+        # Bookkeeping only: existing labels (live or deleted) are updated in place by add_items
+        ExactIndex.remove(self, ids)
+        self._append(ids, vecs, hashes)
+        if not ids.size:
+            return
+        needed = self._graph.get_current_count() + len(ids)
+        if needed > self._graph.get_max_elements():
+            self._graph.resize_index(max(needed, 2 * self._graph.get_max_elements()))
+        self._graph.add_items(vecs, ids)
+
+    def remove(self, ids) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        for i in ids[np.isin(ids, self.ids)].tolist():
+            self._graph.mark_deleted(i)
+        super().remove(ids)
+        if self._graph.get_current_count() > 2 * len(self) + 1024:
+            self._rebuild()
+
+    def search(self, queries, k, exclude=None):
+        n = len(self)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        out = np.full((len(queries), k), -np.inf)
+        if not n:
+            return ids, out
+        exclude = set(int(i) for i in (exclude or ())) & set(self.hashes)
+        fetch = min(n, k + len(exclude))  # over-fetch so k survive the exclusion filter
+        queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        while True:
+            # hnswlib raises when it can't return `fetch` results (deleted nodes, a sparse graph)
+            self._graph.set_ef(max(self.ef, fetch))
+            try:
+                labels, dist = self._graph.knn_query(queries, k=fetch)
+                break
+            except RuntimeError:
+                if fetch <= k:
+                    return super().search(queries, k, exclude)  # exact scan over the same rows
+                fetch = max(k, fetch // 2)
+        for qi in range(len(queries)):
+            kept = [(int(l), 1.0 - float(d)) for l, d in zip(labels[qi], dist[qi]) if int(l) not in exclude][:k]
+            for r, (l, s) in enumerate(kept):
+                ids[qi, r], out[qi, r] = l, s
+        return ids, out
+
+    def _meta(self):
+        return {**super()._meta(), "M": self.M, "ef_construction": self.ef_construction, "ef": self.ef}
+
+    def save(self, path: str) -> None:
+        super().save(path)
+        self._graph.save_index(path + ".tmp.bin")
+        os.replace(path + ".tmp.bin", path + ".bin")
+
+    def _restore(self, meta, arrays):
+        super()._restore(meta, arrays)
+        self.M, self.ef_construction, self.ef = meta["M"], meta["ef_construction"], meta["ef"]
+
+INDEX_TYPES = {cls.kind: cls for cls in (ExactIndex, IVFIndex, HNSWIndex)}
+
+def index_path(kind: str, name: str = "trending") -> str:
+    return os.path.join(INDEX_DIR, f"{name}.{kind}")
+
+def open_index(kind: str, dim: int, name: str = "trending"):
+    """Loads the persisted index for (kind, name) or starts an empty one."""
+    cls = INDEX_TYPES[kind]
+    path = index_path(kind, name)
+    try:
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with np.load(path + ".npz") as z:
+            arrays = {name: z[name] for name in z.files}
+    except (OSError, ValueError):
+        return cls(dim)
+    if meta.get("kind") != kind or meta.get("dim") != dim:
+        return cls(dim)
+
+    index = cls(dim)
+    index._restore(meta, arrays)
+    if kind == "hnsw":
+        try:
+            index._graph = index._hnswlib.Index(space="ip", dim=dim)
+            index._graph.load_index(path + ".bin", max_elements=max(1024, 2 * len(index)))
+        except RuntimeError:
+            index._rebuild()  # graph file missing/corrupt: rebuild from the saved vectors
+    return index
@@ -0,0 +1,152 @@
+import os
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, Optional
+
+from mirror_mysql import (
+    EXTS, FOLDER,
+    extract_title_and_chapter, list_titles_with_last_chapter,
+    _fold_local_file, upsert_series,
+)
+
+# inotify is Linux-only; everywhere else (or without the package) we poll.
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+# ================== Config ==================
+DEBOUNCE_SEC = 2.0      # flush once no new file arrived for this long...
+MAX_DELAY_SEC = 10.0    # ...or once the oldest pending update is this old
+POLL_INTERVAL_SEC = 5.0
+
+# ============== Batching ====================
+class _Batch:
+    """Coalesces parsed files into one pending {title: [last, channel, mtime]} per flush."""
+
+    def __init__(self, canon_to_display: Dict[str, str]):
+        self.canon_to_display = canon_to_display
+        self.pending: Dict[str, list] = {}
+        self.first_at: Optional[float] = None
+        self.last_at: Optional[float] = None
+
+    def add_file(self, path: str) -> None:
+        name = os.path.basename(path)
+        if os.path.splitext(name)[1].lower() not in EXTS:
+            return
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return  # gone again (temp file renamed/deleted)
+        title, ch, channel = extract_title_and_chapter(Path(name).stem, filename=name)
+        if not title:
+            return
+        _fold_local_file(self.pending, self.canon_to_display, title, ch, channel, mtime)
+        self._touch()
+
+    def add_titles(self, local: Dict[str, list]) -> None:
+        for title, (ch, channel, mtime) in local.items():
+            _fold_local_file(self.pending, self.canon_to_display, title, ch, channel, mtime)
+        if local:
+            self._touch()
+
+    def _touch(self) -> None:
+        now = time.monotonic()
+        self.first_at = self.first_at or now
+        self.last_at = now
+
+    def due(self) -> bool:
+        if not self.pending:
+            return False
+        now = time.monotonic()
+        return (now - self.last_at) >= DEBOUNCE_SEC or (now - self.first_at) >= MAX_DELAY_SEC
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        self.first_at = self.last_at = None
+        # GREATEST(...) in upsert_series keeps DB maxima; telegram columns are left alone
+        upsert_series(batch, {})
+        print(f"↑ {len(batch)} title(s): " + ", ".join(sorted(batch, key=str.casefold)[:5])
+              + (" …" if len(batch) > 5 else ""))
+
+# ============== Watchers ====================
+def _changed_titles(before: Dict[str, list], after: Dict[str, list]) -> Dict[str, list]:
+    return {t: v for t, v in after.items() if before.get(t) != v}
+
+def watch_inotify(folder: str, batch: _Batch, snapshot: Dict[str, list]) -> None:
+    inotify = INotify()
+    mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+    wd_to_dir: Dict[int, str] = {}
+
+    def add_tree(top: str, enqueue: bool) -> None:
+        for dirpath, _, filenames in os.walk(top):
+            try:
+                wd_to_dir[inotify.add_watch(dirpath, mask)] = dirpath
+            except OSError:
+                continue
+            if enqueue:  # a whole directory moved in: its files raise no events of their own
+                for name in filenames:
+                    batch.add_file(os.path.join(dirpath, name))
+
+    add_tree(folder, enqueue=False)
+    print(f"👀 Watching {folder} (inotify, {len(wd_to_dir)} dirs)")
+
+    while True:
+        for ev in inotify.read(timeout=int(DEBOUNCE_SEC * 1000 / 2)):
+            if ev.mask & flags.Q_OVERFLOW:
+                # The kernel queue overflowed and events were dropped: rescan from the
+                # manifest, and watch any directory created in the meantime.
+                print("⚠️ inotify queue overflow, rescanning")
+                add_tree(folder, enqueue=False)
+                current = list_titles_with_last_chapter(folder)
+                batch.add_titles(_changed_titles(snapshot, current))
+                snapshot = current
+                continue
+            parent = wd_to_dir.get(ev.wd)
+            if not parent or not ev.name:
+                continue
+            path = os.path.join(parent, ev.name)
+            if ev.mask & flags.ISDIR:
+                if ev.mask & (flags.CREATE | flags.MOVED_TO):
+                    add_tree(path, enqueue=True)
+            elif ev.mask & (flags.CLOSE_WRITE | flags.MOVED_TO):
+                batch.add_file(path)
+        if batch.due():
+            batch.flush()
+
+def watch_polling(folder: str, batch: _Batch, snapshot: Dict[str, list]) -> None:
+    # Each poll is the manifest-backed incremental scan: unchanged directories are not listed.
+    print(f"👀 Watching {folder} (polling every {POLL_INTERVAL_SEC:g}s)")
+    while True:
+        time.sleep(POLL_INTERVAL_SEC)
+        current = list_titles_with_last_chapter(folder)
+        batch.add_titles(_changed_titles(snapshot, current))
+        snapshot = current
+        if batch.pending:
+            batch.flush()
+
+def watch(folder: str = FOLDER, force_polling: bool = False) -> None:
+    """Catches up once from the scan manifest, then streams new downloads into `series`."""
+    snapshot = list_titles_with_last_chapter(folder)
+    batch = _Batch({})
+    batch.add_titles(snapshot)
+    batch.flush()
+
+    try:
+        if INotify is not None and not force_polling:
+            watch_inotify(folder, batch, snapshot)
+        else:
+            watch_polling(folder, batch, snapshot)
+    except KeyboardInterrupt:
+        batch.flush()
+
+# ================== Main ====================
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Stream new local downloads into `series`.")
+    ap.add_argument("--folder", default=FOLDER)
+    ap.add_argument("--poll", action="store_true", help="force the polling watcher")
+    args = ap.parse_args()
+    watch(args.folder, force_polling=args.poll)